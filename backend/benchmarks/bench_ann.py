@@ -0,0 +1,76 @@
+"""Recall and latency of the IVF index (`VECTOR_BACKEND=ann`) against the exact scan.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_ann [--rows 1000000] [--dim 384] [--nprobe 4 8 16 32]
+
+Vectors are synthetic clustered unit vectors (a stand-in for sentence
+embeddings) written through the store's segment writer; training happens on
+the commit that crosses `ANN_TRAIN_MIN`. Recall@k is measured against the
+exact matrix-vector scan over the same segments.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from config import settings
+from services.embedding_service import _IVFMemoryStore
+
+
+def _clustered(n: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    out = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 100_000):
+        m = min(100_000, n - start)
+        out[start:start + m] = centers[rng.integers(0, clusters, m)] + 0.35 * rng.normal(size=(m, dim)).astype(np.float32)
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vecs = _clustered(args.rows, args.dim, args.clusters, rng)
+    queries = _clustered(args.queries, args.dim, args.clusters, np.random.default_rng(1))
+    settings.ANN_TRAIN_MIN = args.rows  # train once, on the full set
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = _IVFMemoryStore(os.path.join(tmp, "memory.jsonl"))
+        store._load()
+        t0 = time.perf_counter()
+        batch = 100_000
+        for start in range(0, args.rows, batch):
+            part = vecs[start:start + batch]
+            store._append_rows([(f"m{start + i}", "", []) for i in range(len(part))], part)
+        store.wait_for_builds()
+        build_s = time.perf_counter() - t0
+        print(f"{args.rows} rows x {args.dim} dims, nlist={len(store.index.centroids)}, write+train {build_s:.1f} s")
+
+        unit = [store._unit(q) for q in queries]
+        t0 = time.perf_counter()
+        exact = [store._score_rows(q, args.top_k) for q in unit]
+        exact_ms = (time.perf_counter() - t0) / len(unit) * 1000.0
+        print(f"{'exact scan':>12}: {exact_ms:8.3f} ms/query  recall@{args.top_k} 1.000")
+
+        for nprobe in args.nprobe:
+            store.index.nprobe = nprobe
+            t0 = time.perf_counter()
+            approx = [store._top_k(q, args.top_k) for q in queries]
+            ms = (time.perf_counter() - t0) / len(unit) * 1000.0
+            recall = np.mean([len(set(a.tolist()) & set(e.tolist())) / args.top_k for a, e in zip(approx, exact)])
+            print(f"{'nprobe ' + str(nprobe):>12}: {ms:8.3f} ms/query  recall@{args.top_k} {recall:.3f}")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Throughput of the toy character-frequency embedding: per-text loop vs `embed_many`.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_embed [--chunks 100000] [--chars 800]
+
+Chunks are synthesized from a small vocabulary (plus a few non-ASCII words) at
+roughly the size `chunk_text` produces. Both paths are checked to return
+identical vectors before timing.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from utils.text_utils import embed_many, simple_embed
+
+WORDS = "we walked along the beach at sunset and talked about Zoë's café plans for next summer".split()
+
+
+def _chunks(n: int, chars: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    words_per_chunk = max(1, chars // 6)
+    picks = rng.integers(0, len(WORDS), size=(n, words_per_chunk))
+    return [" ".join(WORDS[i] for i in row)[:chars] for row in picks]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--chars", type=int, default=800)
+    args = parser.parse_args()
+
+    texts = _chunks(args.chunks, args.chars)
+    sample = texts[:1000]
+    assert np.array_equal(embed_many(sample), np.asarray([simple_embed(t) for t in sample], dtype=np.float32))
+
+    t0 = time.perf_counter()
+    loop = np.asarray([simple_embed(t) for t in texts], dtype=np.float32)
+    loop_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    batch = embed_many(texts)
+    batch_s = time.perf_counter() - t0
+
+    assert np.array_equal(loop, batch)
+    mb = sum(len(t) for t in texts) / 1e6
+    print(f"{args.chunks} chunks, {mb:.1f}M chars")
+    print(f"{'simple_embed loop':>18}: {loop_s * 1000:9.1f} ms  {args.chunks / loop_s:12,.0f} chunks/s")
+    print(f"{'embed_many':>18}: {batch_s * 1000:9.1f} ms  {args.chunks / batch_s:12,.0f} chunks/s")
+    print(f"{'speedup':>18}: {loop_s / batch_s:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Open and retrieval latency of the file memory store at increasing corpus sizes.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_file_store [--sizes 1000 100000 1000000]
+
+Memories are synthesized directly as random 27-dim vectors and written through
+the store's segment writer, so the numbers measure cold open (manifest read and
+`np.memmap`) and `retrieve` (query embedding, scoring and top-k text reads).
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+from services.embedding_service import _FileMemoryStore
+from utils.text_utils import simple_embed
+
+QUERY = "I still think about the trip we took to the mountains last summer."
+
+
+def _legacy_scan(q: List[float], vecs: np.ndarray, top_k: int) -> List[int]:
+    """The previous per-row Python loop, kept for comparison."""
+    qa = np.array(q, dtype=np.float32)
+    scored = []
+    for i, vec in enumerate(vecs):
+        v = np.array(vec, dtype=np.float32)
+        denom = (np.linalg.norm(qa) * np.linalg.norm(v)) + 1e-8
+        scored.append((float(np.dot(qa, v) / denom), i))
+    scored.sort(reverse=True, key=lambda x: x[0])
+    return [i for _s, i in scored[:top_k]]
+
+
+def _time(fn, repeat: int) -> float:
+    fn()  # warm-up
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1000.0
+
+
+def _populate(path: str, vecs: np.ndarray, batch: int = 50_000) -> None:
+    store = _FileMemoryStore(path)
+    store._load()
+    for start in range(0, len(vecs), batch):
+        part = vecs[start : start + batch]
+        records = [(f"mem_{start + i}", f"memory {start + i}", []) for i in range(len(part))]
+        store._append_rows(records, part)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--legacy-max", type=int, default=100_000, help="skip the legacy loop above this size")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    q = simple_embed(QUERY)
+    print(f"{'memories':>10}  {'open ms':>10}  {'retrieve ms':>12}  {'legacy ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            vecs = rng.random((n, len(q)), dtype=np.float32)
+            path = os.path.join(tmp, f"memory_{n}.jsonl")
+            _populate(path, vecs)
+
+            t0 = time.perf_counter()
+            store = _FileMemoryStore(path)
+            store._load()
+            store._vectors()
+            open_ms = (time.perf_counter() - t0) * 1000.0
+
+            retrieve_ms = _time(lambda: store.retrieve(QUERY, top_k=args.top_k), args.repeat)
+            if n <= args.legacy_max:
+                legacy_ms = f"{_time(lambda: _legacy_scan(q, vecs, args.top_k), 1):10.2f}"
+            else:
+                legacy_ms = f"{'skipped':>10}"
+            print(f"{n:>10}  {open_ms:10.3f}  {retrieve_ms:12.3f}  {legacy_ms}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Recall@k versus vector memory for int8 and product quantization in the file store.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_quant [--rows 200000] [--dim 128] [--pq 8 16 32] [--rerank 64 256]
+
+One float32 store is written, then each quantizer is trained on it and
+attached in turn. Queries scan the codes with asymmetric distances and re-rank
+the best `rerank` candidates exactly; recall@k is measured against the exact
+float32 scan.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_ann import _clustered
+from config import settings
+from services.embedding_service import _FileMemoryStore
+from services.quantization import QuantizedCodes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--pq", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--rerank", type=int, nargs="+", default=[64, 256])
+    args = parser.parse_args()
+
+    vecs = _clustered(args.rows, args.dim, args.clusters, np.random.default_rng(0))
+    queries = _clustered(args.queries, args.dim, args.clusters, np.random.default_rng(1))
+    settings.MEMORY_QUANTIZATION = "none"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "memory.jsonl")
+        store = _FileMemoryStore(path)
+        store._load()
+        for start in range(0, args.rows, 100_000):
+            part = vecs[start:start + 100_000]
+            store._append_rows([(f"m{start + i}", "", []) for i in range(len(part))], part)
+        unit = [store._unit(q) for q in queries]
+
+        t0 = time.perf_counter()
+        exact = [store._score_rows(q, args.top_k) for q in unit]
+        exact_ms = (time.perf_counter() - t0) / len(unit) * 1000.0
+        f32_mb = args.rows * args.dim * 4 / 1e6
+        print(f"{args.rows} rows x {args.dim} dims, top-{args.top_k}")
+        print(f"{'codes':>10} {'B/vec':>6} {'MB':>8} {'rerank':>7} {'recall':>7} {'ms/query':>9}")
+        print(f"{'float32':>10} {args.dim * 4:>6} {f32_mb:8.1f} {'-':>7} {1.0:7.3f} {exact_ms:9.3f}")
+
+        base = os.path.splitext(path)[0]
+        configs = [("int8", 0)] + [("pq", m) for m in args.pq]
+        for kind, m in configs:
+            codes = QuantizedCodes(base, kind, pq_m=m or 8, train_min=0, train_sample=65536)
+            codes.train(store._vectors())
+            store.quant = codes
+            label = "int8" if kind == "int8" else f"pq{m}"
+            for rerank in args.rerank:
+                settings.QUANT_RERANK = rerank
+                t0 = time.perf_counter()
+                approx = [store._score_rows(q, args.top_k) for q in unit]
+                ms = (time.perf_counter() - t0) / len(unit) * 1000.0
+                recall = np.mean([len(set(a.tolist()) & set(e.tolist())) / args.top_k for a, e in zip(approx, exact)])
+                size = codes.bytes_per_row()
+                print(f"{label:>10} {size:>6} {args.rows * size / 1e6:8.1f} {rerank:>7} {recall:7.3f} {ms:9.3f}")
+            codes.close()
+        store.quant = None
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""In-process load test for POST /chat with many concurrent clients.
+
+Run from the backend directory:
+
+    python -m benchmarks.load_chat [--clients 100] [--requests 10] [--store-latency-ms 20]
+
+Storage calls (retrieval, history read, message appends) are slowed by
+`--store-latency-ms` to mimic a remote Milvus/Chroma or a busy disk. Each run
+is measured twice: `inline` runs the storage calls on the event loop, as the
+handler did before, and `executor` uses the dedicated store executor.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import Executor, Future
+from typing import List
+
+import httpx
+
+from config import settings
+
+
+class _InlineExecutor(Executor):
+    """Runs submitted calls immediately on the calling thread (the event loop)."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        fut: Future = Future()
+        try:
+            fut.set_result(fn(*args, **kwargs))
+        except BaseException as e:  # pragma: no cover - surfaced to the caller
+            fut.set_exception(e)
+        return fut
+
+
+def _slow(fn, delay: float):
+    def wrapper(*args, **kwargs):
+        time.sleep(delay)
+        return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, int(round(pct / 100.0 * len(values) + 0.5)) - 1))
+    return values[idx]
+
+
+async def _client(http: httpx.AsyncClient, n: int, latencies: List[float]) -> None:
+    for i in range(n):
+        t0 = time.perf_counter()
+        r = await http.post("/chat", json={"message": f"do you remember the beach? ({i})"})
+        r.raise_for_status()
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+
+
+async def _run(app, clients: int, per_client: int) -> List[float]:
+    latencies: List[float] = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as http:
+        await asyncio.gather(*(_client(http, per_client, latencies) for _ in range(clients)))
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=10, help="requests per client")
+    parser.add_argument("--store-latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    from main import app
+    from services import embedding_service
+    from utils import async_utils, text_utils
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.MEMORY_FILE = os.path.join(tmp, "memory.jsonl")
+        settings.MESSAGES_FILE = os.path.join(tmp, "messages.jsonl")
+        settings.RETRIEVAL_ENABLED = True
+        store = embedding_service._FileMemoryStore(settings.MEMORY_FILE)
+        store.add_many([f"memory {i} about the beach and the city" for i in range(1000)], tags=[])
+        delay = args.store_latency_ms / 1000.0
+        store.retrieve = _slow(store.retrieve, delay)
+        embedding_service.memory_store = store
+        text_utils.append_message = _slow(text_utils.append_message, delay)
+        text_utils.get_recent_messages = _slow(text_utils.get_recent_messages, delay)
+
+        print(f"{args.clients} clients x {args.requests} requests, store latency {args.store_latency_ms:.0f} ms")
+        print(f"{'mode':>10}  {'p50 ms':>9}  {'p99 ms':>9}  {'req/s':>8}")
+        for mode, executor in (("inline", _InlineExecutor()), ("executor", None)):
+            async_utils._executor = executor
+            t0 = time.perf_counter()
+            latencies = asyncio.run(_run(app, args.clients, args.requests))
+            wall = time.perf_counter() - t0
+            print(
+                f"{mode:>10}  {_percentile(latencies, 50):9.1f}  {_percentile(latencies, 99):9.1f}  "
+                f"{len(latencies) / wall:8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
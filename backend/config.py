@@ -13,6 +13,11 @@ class Settings(BaseSettings):
     # Model backends
     MODEL_BASE_URL: str | None = os.getenv("MODEL_BASE_URL")  # generic /infer style
     MODEL_PATH: str | None = os.getenv("MODEL_PATH", "/model/infer")
+    # optional dynamic batching for the generic endpoint
+    MODEL_BATCH_ENABLED: bool = os.getenv("MODEL_BATCH_ENABLED", "false").lower() in {"1", "true", "yes", "on"}
+    MODEL_BATCH_PATH: str = os.getenv("MODEL_BATCH_PATH", "/model/infer_batch")
+    MODEL_BATCH_MAX_SIZE: int = int(os.getenv("MODEL_BATCH_MAX_SIZE", "16"))
+    MODEL_BATCH_WINDOW_MS: float = float(os.getenv("MODEL_BATCH_WINDOW_MS", "10"))
 
     # Ollama
     OLLAMA_BASE_URL: str | None = os.getenv("OLLAMA_BASE_URL")  # e.g., http://localhost:11434
@@ -31,19 +36,75 @@ class Settings(BaseSettings):
     ELEVEN_VOICE_ID: str | None = os.getenv("ELEVEN_VOICE_ID")
     ELEVEN_BASE_URL: str = os.getenv("ELEVEN_BASE_URL", "https://api.elevenlabs.io/v1")
 
+    # Outbound HTTP (shared async client for model and TTS backends)
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "200"))
+    HTTP_MAX_KEEPALIVE: int = int(os.getenv("HTTP_MAX_KEEPALIVE", "50"))
+    HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+    HTTP_HTTP2: bool = os.getenv("HTTP_HTTP2", "true").lower() in {"1", "true", "yes", "on"}
+    HTTP_CONNECT_TIMEOUT: float = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+    OPENAI_TIMEOUT: float = float(os.getenv("OPENAI_TIMEOUT", "60"))
+    OLLAMA_TIMEOUT: float = float(os.getenv("OLLAMA_TIMEOUT", "60"))
+    MODEL_TIMEOUT: float = float(os.getenv("MODEL_TIMEOUT", "60"))
+    ELEVEN_TIMEOUT: float = float(os.getenv("ELEVEN_TIMEOUT", "60"))
+
+    # Model backend circuit breaker
+    BACKEND_FAILURE_THRESHOLD: int = int(os.getenv("BACKEND_FAILURE_THRESHOLD", "3"))
+    BACKEND_BACKOFF_BASE: float = float(os.getenv("BACKEND_BACKOFF_BASE", "1"))
+    BACKEND_BACKOFF_MAX: float = float(os.getenv("BACKEND_BACKOFF_MAX", "60"))
+
+    # Model response cache
+    RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in {"1", "true", "yes", "on"}
+    RESPONSE_CACHE_SIZE: int = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+    RESPONSE_CACHE_TTL: float = float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+    RESPONSE_CACHE_DISK: bool = os.getenv("RESPONSE_CACHE_DISK", "false").lower() in {"1", "true", "yes", "on"}
+    RESPONSE_CACHE_DISK_MAX: int = int(os.getenv("RESPONSE_CACHE_DISK_MAX", "100000"))
+    COALESCE_ENABLED: bool = os.getenv("COALESCE_ENABLED", "true").lower() in {"1", "true", "yes", "on"}
+
     # Storage
     DATA_DIR: str = os.path.join(os.path.dirname(__file__), "data", "storage")
     AUDIO_DIR: str = os.path.join(DATA_DIR, "audio")
     EXPORT_DIR: str = os.path.join(DATA_DIR, "exports")
     MEMORY_FILE: str = os.path.join(DATA_DIR, "memory.jsonl")
     MESSAGES_FILE: str = os.path.join(DATA_DIR, "messages.jsonl")
+    RESPONSE_CACHE_PATH: str = os.getenv("RESPONSE_CACHE_PATH", os.path.join(DATA_DIR, "response_cache.sqlite"))
 
     # Retrieval and Vector Store
     RETRIEVAL_ENABLED: bool = os.getenv("RETRIEVAL_ENABLED", "true").lower() in {"1", "true", "yes", "on"}
-    VECTOR_BACKEND: str = os.getenv("VECTOR_BACKEND", "file")  # file | chroma | milvus
+    VECTOR_BACKEND: str = os.getenv("VECTOR_BACKEND", "file")  # file | ann | chroma | milvus
+    # in-process IVF index for VECTOR_BACKEND=ann
+    ANN_NLIST: int = int(os.getenv("ANN_NLIST", "0"))  # 0 = about 4 * sqrt(rows) at training time
+    ANN_NPROBE: int = int(os.getenv("ANN_NPROBE", "8"))
+    ANN_TRAIN_MIN: int = int(os.getenv("ANN_TRAIN_MIN", "4096"))
+    ANN_TRAIN_SAMPLE: int = int(os.getenv("ANN_TRAIN_SAMPLE", "65536"))
+    ANN_TRAIN_ITERS: int = int(os.getenv("ANN_TRAIN_ITERS", "10"))
+    # compressed vector codes for the file/ann stores, re-ranked exactly
+    MEMORY_QUANTIZATION: str = os.getenv("MEMORY_QUANTIZATION", "none")  # none | int8 | pq
+    PQ_SUBVECTORS: int = int(os.getenv("PQ_SUBVECTORS", "8"))
+    QUANT_RERANK: int = int(os.getenv("QUANT_RERANK", "64"))
+    QUANT_TRAIN_MIN: int = int(os.getenv("QUANT_TRAIN_MIN", "1024"))
+    QUANT_TRAIN_SAMPLE: int = int(os.getenv("QUANT_TRAIN_SAMPLE", "65536"))
     CHROMA_DIR: str = os.getenv("CHROMA_DIR", os.path.join(os.path.dirname(__file__), "data", "chroma"))
     EMBEDDING_MODEL_NAME: str = os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+    MODEL_WARMUP: bool = os.getenv("MODEL_WARMUP", "false").lower() in {"1", "true", "yes", "on"}
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+    EMBEDDING_CACHE_DISK: bool = os.getenv("EMBEDDING_CACHE_DISK", "false").lower() in {"1", "true", "yes", "on"}
+    EMBEDDING_CACHE_DIR: str = os.getenv("EMBEDDING_CACHE_DIR", os.path.join(os.path.dirname(__file__), "data", "embedding_cache"))
+    EMBEDDING_CACHE_DISK_MAX: int = int(os.getenv("EMBEDDING_CACHE_DISK_MAX", "1000000"))
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+    INGEST_READ_CHUNK_BYTES: int = int(os.getenv("INGEST_READ_CHUNK_BYTES", str(1 << 20)))
+    INGEST_WORKERS: int = int(os.getenv("INGEST_WORKERS", "2"))
+    DEDUP_ENABLED: bool = os.getenv("DEDUP_ENABLED", "true").lower() in {"1", "true", "yes", "on"}
+    DEDUP_NEAR_DISTANCE: int = int(os.getenv("DEDUP_NEAR_DISTANCE", "5"))  # SimHash bits; 0 = exact only
+    MEMORY_FSYNC: str = os.getenv("MEMORY_FSYNC", "interval")  # always | interval | never
+    MEMORY_FSYNC_INTERVAL: float = float(os.getenv("MEMORY_FSYNC_INTERVAL", "1.0"))
     HISTORY_MESSAGES: int = int(os.getenv("HISTORY_MESSAGES", "6"))
+    HISTORY_CACHE_SIZE: int = int(os.getenv("HISTORY_CACHE_SIZE", "256"))
+    MESSAGES_FSYNC: str = os.getenv("MESSAGES_FSYNC", "interval")  # always | interval | never
+    MESSAGES_FSYNC_INTERVAL: float = float(os.getenv("MESSAGES_FSYNC_INTERVAL", "1.0"))
+    SESSION_CACHE_SIZE: int = int(os.getenv("SESSION_CACHE_SIZE", "32"))
+    SESSION_MAX_OPEN: int = int(os.getenv("SESSION_MAX_OPEN", "1024"))
+    TENANT_MAX_OPEN: int = int(os.getenv("TENANT_MAX_OPEN", "64"))  # per-user memory stores kept open
+    STORE_EXECUTOR_WORKERS: int = int(os.getenv("STORE_EXECUTOR_WORKERS", "8"))
 
     # Milvus
     MILVUS_HOST: str = os.getenv("MILVUS_HOST", "localhost")
@@ -1,4 +1,6 @@
 import os
+from contextlib import asynccontextmanager
+from typing import List
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -6,8 +8,41 @@ from starlette.responses import JSONResponse
 from routers import chat, stt, tts, memory
 from routers import ingest, finetune
 from config import settings
+from services.http_client import http_pool
+from utils.text_utils import close_message_log
+from utils.append_writer import append_writer
+from services.embedding_cache import embedding_cache
+from services import embedding_service
+from services.model_registry import model_registry, sentence_transformer_key
+from services.whisper_service import whisper_service
+from services.ai_service import ai_service
 
-app = FastAPI(title="helloEx Backend", version="0.1.0")
+
+def _warmup_models() -> List[str]:
+    names = []
+    model_name = getattr(embedding_service.memory_store, "model_name", None)
+    if model_name:
+        names.append(sentence_transformer_key(model_name))
+    if settings.WHISPER_MODE == "local":
+        names.append(whisper_service.MODEL_KEY)
+    return names
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.MODEL_WARMUP:
+        # load models in the background; /health/ready reports when they are in
+        model_registry.warm_up(_warmup_models())
+    yield
+    # release pooled backend connections
+    await http_pool.aclose()
+    # flush and fsync the message log
+    close_message_log()
+    # close per-user memory stores
+    embedding_service.tenant_stores.close()
+
+
+app = FastAPI(title="helloEx Backend", version="0.1.0", lifespan=lifespan)
 
 # CORS via settings
 allowed_origins = [o.strip() for o in (settings.CORS_ALLOW_ORIGINS or "*").split(",") if o.strip()]
@@ -33,7 +68,28 @@ app.mount("/static", StaticFiles(directory=settings.DATA_DIR), name="static")
 
 @app.get("/health")
 async def health():
-    return JSONResponse({"status": "ok"})
+    cache = ai_service.cache.snapshot() if ai_service.cache is not None else None
+    return JSONResponse(
+        {
+            "status": "ok",
+            "backends": ai_service.health.snapshot(),
+            "response_cache": cache,
+            "coalescing": ai_service.coalescer.snapshot(),
+            "append_writer": append_writer.snapshot(),
+            "embedding_cache": embedding_cache.snapshot(),
+            "memory_tenants_open": embedding_service.tenant_stores.open_tenants(),
+            "model_batching": ai_service.batcher.snapshot() if settings.MODEL_BATCH_ENABLED else None,
+            "models": model_registry.snapshot(),
+            "ready": model_registry.ready(),
+        }
+    )
+
+
+@app.get("/health/ready")
+async def ready():
+    # 503 until warm-up models are loaded, so load balancers can hold traffic
+    ok = model_registry.ready()
+    return JSONResponse({"ready": ok, "models": model_registry.snapshot()}, status_code=200 if ok else 503)
 
 
 # Uvicorn entrypoint helper
@@ -1,45 +1,86 @@
-from typing import Optional, List
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Awaitable, Dict, Optional, List, TypeVar
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 
 from services.ai_service import ai_service
-from services.embedding_service import memory_store
+from services import embedding_service
 from services.eleven_service import tts_service
-from utils.text_utils import sanitize_text, build_prompt, append_message, get_recent_messages
+from utils.text_utils import sanitize_text, build_prompt, append_message_async, get_recent_messages_async
+from utils.session_store import DEFAULT_SESSION
 from config import settings
 
 router = APIRouter()
 
+T = TypeVar("T")
+
 
 class ChatRequest(BaseModel):
     message: str
     persona: Optional[str] = "default"
     mode: Optional[str] = "text"
     tts: Optional[bool] = False
+    cache: Optional[bool] = True  # set false to bypass the model response cache
+    session_id: Optional[str] = Field(default=None, max_length=256)  # conversation key for history
+    user_id: Optional[str] = Field(default=None, max_length=256)  # retrieve from this user's memories only
 
 
 class ChatResponse(BaseModel):
     reply_text: str
     audio_url: Optional[str] = None
     sentiment: Optional[str] = None
+    timings: Optional[Dict[str, float]] = None
 
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat(req: ChatRequest):
-    if not req.message or not req.message.strip():
-        raise HTTPException(status_code=400, detail="message is required")
+async def _timed(name: str, aw: Awaitable[T], timings: Dict[str, float]) -> T:
+    """Await `aw` and record its wall time in milliseconds under `name`."""
+    t0 = time.perf_counter()
+    try:
+        return await aw
+    finally:
+        timings[name] = round((time.perf_counter() - t0) * 1000.0, 2)
+
+
+async def _retrieve_memories(user_text: str, user_id: Optional[str] = None) -> List[str]:
+    if not settings.RETRIEVAL_ENABLED:
+        return []
+    try:
+        async with embedding_service.use_memory_store(user_id) as store:
+            return await store.retrieve_async(user_text, top_k=5)
+    except Exception:
+        # models load lazily, so a broken embedding model or vector backend shows up
+        # here; answer without memories rather than failing every chat
+        return []
+
+
+def _session_id(req: ChatRequest) -> str:
+    return req.session_id or DEFAULT_SESSION
 
-    user_text = sanitize_text(req.message)
-    # persist user message
-    append_message("user", user_text)
 
-    # retrieval toggle
-    memories: List[str] = []
-    if settings.RETRIEVAL_ENABLED:
-        memories = memory_store.retrieve(user_text, top_k=5)
+async def _persist_and_load_history(session_id: str, user_text: str) -> List[dict]:
+    # history must include the message being answered, so load it after the append
+    await append_message_async("user", user_text, session_id)
+    return await get_recent_messages_async(settings.HISTORY_MESSAGES, session_id)
 
-    # recent conversation history
-    history_items = get_recent_messages(settings.HISTORY_MESSAGES)
+
+async def _speak(reply_text: str) -> Optional[str]:
+    try:
+        return await tts_service.speak(reply_text, voice_id=None)
+    except Exception:
+        return None
+
+
+async def _build_chat_prompt(req: ChatRequest, user_text: str, timings: Dict[str, float]) -> str:
+    # retrieval and history are independent, so run them side by side
+    memories, history_items = await asyncio.gather(
+        _timed("retrieval", _retrieve_memories(user_text, req.user_id), timings),
+        _timed("history", _persist_and_load_history(_session_id(req), user_text), timings),
+    )
+
+    t0 = time.perf_counter()
     history_lines: List[str] = [f"{m['role']}: {m['content']}" for m in history_items]
     context: List[str] = []
     if history_lines:
@@ -49,16 +90,89 @@ async def chat(req: ChatRequest):
     context.extend(memories)
 
     prompt = build_prompt(persona=req.persona or "default", context_memories=context, user_input=user_text)
+    timings["prompt"] = round((time.perf_counter() - t0) * 1000.0, 2)
+    return prompt
+
+
+def _server_timing(timings: Dict[str, float]) -> str:
+    return ", ".join(f"{name};dur={ms}" for name, ms in timings.items())
+
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat(req: ChatRequest, response: Response):
+    if not req.message or not req.message.strip():
+        raise HTTPException(status_code=400, detail="message is required")
+
+    started = time.perf_counter()
+    timings: Dict[str, float] = {}
+    user_text = sanitize_text(req.message)
+    prompt = await _build_chat_prompt(req, user_text, timings)
 
-    reply_text, sentiment = await ai_service.generate_reply(prompt)
-    # persist assistant reply
-    append_message("assistant", reply_text)
+    reply_text, sentiment = await _timed("generate", ai_service.generate_reply(prompt, use_cache=req.cache is not False), timings)
 
-    audio_url = None
+    # persisting the reply and synthesizing audio do not depend on each other
+    tasks: List[Awaitable[Any]] = [_timed("persist_reply", append_message_async("assistant", reply_text, _session_id(req)), timings)]
     if req.tts:
+        tasks.append(_timed("tts", _speak(reply_text), timings))
+    results = await asyncio.gather(*tasks)
+    audio_url = results[1] if req.tts else None
+
+    timings["total"] = round((time.perf_counter() - started) * 1000.0, 2)
+    response.headers["Server-Timing"] = _server_timing(timings)
+    return ChatResponse(reply_text=reply_text, audio_url=audio_url, sentiment=sentiment, timings=timings)
+
+
+def _sse(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(data)}\n\n"
+
+
+@router.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """Server-sent events variant of /chat.
+
+    Emits one ``data: {"token": ...}`` event per text delta as the model
+    produces it, then a final ``event: done`` carrying the same fields as
+    ChatResponse. The reply is persisted once the stream completes. If the
+    backend fails mid-reply the stream ends with ``event: error`` instead;
+    the partial reply is persisted (so history matches what the client saw)
+    and ``persisted`` says whether anything was written.
+    """
+    if not req.message or not req.message.strip():
+        raise HTTPException(status_code=400, detail="message is required")
+
+    async def events() -> AsyncIterator[str]:
+        started = time.perf_counter()
+        timings: Dict[str, float] = {}
+        user_text = sanitize_text(req.message)
+        prompt = await _build_chat_prompt(req, user_text, timings)
+
+        parts: List[str] = []
+        sentiment: Optional[str] = None
+        t0 = time.perf_counter()
         try:
-            audio_url = await tts_service.speak(reply_text, voice_id=None)
+            async for delta, sentiment in ai_service.stream_reply(prompt, use_cache=req.cache is not False):
+                if not parts:
+                    timings["first_token"] = round((time.perf_counter() - t0) * 1000.0, 2)
+                parts.append(delta)
+                yield _sse({"token": delta})
         except Exception:
-            audio_url = None
+            partial = "".join(parts)
+            if partial:
+                await append_message_async("assistant", partial, _session_id(req))
+            yield _sse({"detail": "reply generation failed", "reply_text": partial, "persisted": bool(partial)}, event="error")
+            return
+        timings["generate"] = round((time.perf_counter() - t0) * 1000.0, 2)
+        reply_text = "".join(parts)
+
+        tasks: List[Awaitable[Any]] = [_timed("persist_reply", append_message_async("assistant", reply_text, _session_id(req)), timings)]
+        if req.tts:
+            tasks.append(_timed("tts", _speak(reply_text), timings))
+        results = await asyncio.gather(*tasks)
+        audio_url = results[1] if req.tts else None
+
+        timings["total"] = round((time.perf_counter() - started) * 1000.0, 2)
+        done = ChatResponse(reply_text=reply_text, audio_url=audio_url, sentiment=sentiment, timings=timings)
+        yield _sse(done.model_dump(), event="done")
 
-    return ChatResponse(reply_text=reply_text, audio_url=audio_url, sentiment=sentiment)
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
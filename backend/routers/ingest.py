@@ -1,8 +1,10 @@
 from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
-from services.ingestion_service import ingest_any
+from services.ingestion_service import ingest_stream, iter_file_chunks, flush_memory_store
+from services.ingest_job_service import ingest_job_service
 
 router = APIRouter()
 
@@ -19,18 +21,76 @@ class IngestResponse(BaseModel):
     items: List[IngestSummary]
 
 
+class IngestJobStartResponse(BaseModel):
+    job_id: str
+    status: str
+    total_files: int
+    bytes_total: int
+
+
+class IngestJobFile(BaseModel):
+    filename: str
+    kind: Optional[str] = None
+    status: str
+    size: int
+    chunks: int
+
+
+class IngestJobStatusResponse(BaseModel):
+    job_id: str
+    status: str
+    files: List[IngestJobFile]
+    files_done: int
+    chunks_done: int
+    bytes_done: int
+    bytes_total: int
+    elapsed_sec: float
+    chunks_per_sec: float
+    eta_sec: Optional[float] = None
+
+
+def _parse_tags(tags: Optional[str]) -> List[str]:
+    return [t.strip() for t in (tags or "").split(",") if t.strip()]
+
+
 @router.post("/ingest/upload", response_model=IngestResponse)
 async def ingest_upload(
     files: List[UploadFile] = File(...),
     source: Optional[str] = Form(None, description="e.g., whatsapp, telegram, instagram"),
     tags: Optional[str] = Form(None, description="comma-separated tags"),
+    user_id: Optional[str] = Form(None, max_length=256, description="store into this user's memories"),
 ):
-    tag_list: List[str] = [t.strip() for t in (tags or "").split(",") if t.strip()]
+    tag_list = _parse_tags(tags)
     items: List[IngestSummary] = []
     total = 0
     for f in files:
-        data = await f.read()
-        kind, ids = ingest_any(data, f.filename, source, tag_list)
+        # read the spooled upload in chunks so large exports never sit in memory whole;
+        # embedding is synchronous, so keep it off the event loop
+        kind, ids = await run_in_threadpool(ingest_stream, iter_file_chunks(f.file), f.filename, source, tag_list, None, user_id)
         total += len(ids)
         items.append(IngestSummary(filename=f.filename, kind=kind, embedding_ids=ids))
+    await run_in_threadpool(flush_memory_store, user_id)
     return IngestResponse(total_files=len(files), total_embeddings=total, items=items)
+
+
+@router.post("/ingest/jobs", response_model=IngestJobStartResponse)
+async def ingest_job_start(
+    files: List[UploadFile] = File(...),
+    source: Optional[str] = Form(None, description="e.g., whatsapp, telegram, instagram"),
+    tags: Optional[str] = Form(None, description="comma-separated tags"),
+    user_id: Optional[str] = Form(None, max_length=256, description="store into this user's memories"),
+):
+    job_id = ingest_job_service.create_job(source, _parse_tags(tags), user_id)
+    for f in files:
+        await run_in_threadpool(ingest_job_service.stage_file, job_id, f.file, f.filename)
+    ingest_job_service.submit(job_id)
+    st = ingest_job_service.status(job_id)
+    return IngestJobStartResponse(job_id=job_id, status=st["status"], total_files=len(files), bytes_total=st["bytes_total"])
+
+
+@router.get("/ingest/jobs/{job_id}", response_model=IngestJobStatusResponse)
+async def ingest_job_status(job_id: str):
+    st = ingest_job_service.status(job_id)
+    if st.get("status") == "not_found":
+        raise HTTPException(status_code=404, detail="job not found")
+    return IngestJobStatusResponse(job_id=job_id, **st)
@@ -7,10 +7,10 @@ from typing import List, Optional
 
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from config import settings
-from services.embedding_service import memory_store
+from services import embedding_service
 
 router = APIRouter()
 
@@ -18,6 +18,7 @@ router = APIRouter()
 class MemoryUpload(BaseModel):
     text: str
     tags: Optional[List[str]] = None
+    user_id: Optional[str] = Field(default=None, max_length=256)  # per-user memory partition
 
 
 class MemoryUploadResponse(BaseModel):
@@ -25,14 +26,36 @@ class MemoryUploadResponse(BaseModel):
     embedding_id: str
 
 
+class MemorySearch(BaseModel):
+    query: str
+    top_k: int = Field(default=5, ge=1, le=100)
+    tags: Optional[List[str]] = None  # memories must carry every tag
+    source: Optional[str] = None  # the `source` given to /ingest/upload
+    user_id: Optional[str] = Field(default=None, max_length=256)
+
+
+class MemorySearchResponse(BaseModel):
+    results: List[str]
+
+
 @router.post("/memory/upload", response_model=MemoryUploadResponse)
 async def memory_upload(req: MemoryUpload):
     if not req.text or not req.text.strip():
         raise HTTPException(status_code=400, detail="text is required")
-    mem_id = memory_store.add(req.text, tags=req.tags or [])
+    async with embedding_service.use_memory_store(req.user_id) as store:
+        mem_id = await store.add_async(req.text, tags=req.tags or [])
     return MemoryUploadResponse(status="stored", embedding_id=mem_id)
 
 
+@router.post("/memory/search", response_model=MemorySearchResponse)
+async def memory_search(req: MemorySearch):
+    if not req.query or not req.query.strip():
+        raise HTTPException(status_code=400, detail="query is required")
+    async with embedding_service.use_memory_store(req.user_id) as store:
+        results = await store.retrieve_async(req.query, req.top_k, req.tags, req.source)
+    return MemorySearchResponse(results=results)
+
+
 @router.get("/export")
 async def export_data():
     # Aggregate files into zip in-memory
@@ -42,6 +65,20 @@ async def export_data():
         for name in [settings.MESSAGES_FILE, settings.MEMORY_FILE]:
             if os.path.exists(name):
                 zf.write(name, arcname=os.path.basename(name))
+        # per-user memory texts
+        tenants_dir = os.path.join(os.path.dirname(settings.MEMORY_FILE), "tenants")
+        if os.path.isdir(tenants_dir):
+            for root, _, files in os.walk(tenants_dir):
+                if os.path.basename(settings.MEMORY_FILE) in files:
+                    full = os.path.join(root, os.path.basename(settings.MEMORY_FILE))
+                    zf.write(full, arcname=os.path.join("tenants", os.path.relpath(full, start=tenants_dir)))
+        # per-session message segments
+        sessions_dir = os.path.join(os.path.dirname(settings.MESSAGES_FILE), "sessions")
+        if os.path.isdir(sessions_dir):
+            for root, _, files in os.walk(sessions_dir):
+                for f in files:
+                    full = os.path.join(root, f)
+                    zf.write(full, arcname=os.path.join("sessions", os.path.relpath(full, start=sessions_dir)))
         # audio folder
         if os.path.isdir(settings.AUDIO_DIR):
             for root, _, files in os.walk(settings.AUDIO_DIR):
@@ -1,46 +1,209 @@
 import os
 import json
 import uuid
-import asyncio
-from typing import Tuple, Optional
-
-import requests
+import time
+from typing import Any, AsyncIterator, Dict, List, Tuple, Optional
 
 from config import settings
+from services.backend_health import BackendRegistry
+from services.http_client import http_pool, backend_timeout
+from services.response_cache import ResponseCache, cache_key
+from services.micro_batcher import MicroBatcher
+from services.single_flight import SingleFlight
+from utils.async_utils import run_blocking
 
 
 class AIService:
-    """Proxy to model backends (vLLM OpenAI-compatible, Ollama, or generic), with a mock fallback."""
+    """Proxy to model backends (vLLM OpenAI-compatible, Ollama, or generic), with a mock fallback.
 
-    def __init__(self):
-        self.session = requests.Session()
+    All backend calls go through the shared pooled async HTTP client, so
+    in-flight generations cost a socket each rather than a thread. Each
+    backend has a circuit breaker (see `services/backend_health.py`): dead
+    backends are skipped until an exponential back-off probe succeeds, and
+    healthy ones are tried fastest first. Replies from real backends are
+    cached (see `services/response_cache.py`) and concurrent identical
+    requests share one in-flight generation, unless a caller opts out.
+    """
 
-    async def generate_reply(self, prompt: str) -> Tuple[str, Optional[str]]:
-        # Try vLLM/OpenAI-compatible first
-        if settings.OPENAI_BASE_URL and settings.OPENAI_MODEL and settings.OPENAI_API_KEY:
-            try:
-                return await asyncio.to_thread(self._openai_chat, prompt)
-            except Exception:
-                pass
+    OPENAI_TEMPERATURE = 0.8
+    GENERIC_MAX_TOKENS = 200
 
-        # Try Ollama chat
-        if settings.OLLAMA_BASE_URL and settings.OLLAMA_MODEL:
-            try:
-                return await asyncio.to_thread(self._ollama_chat, prompt)
-            except Exception:
-                pass
+    def __init__(self, pool=None, cache: Optional[ResponseCache] = None):
+        self.pool = pool or http_pool
+        self.health = BackendRegistry(
+            failure_threshold=settings.BACKEND_FAILURE_THRESHOLD,
+            backoff_base=settings.BACKEND_BACKOFF_BASE,
+            backoff_max=settings.BACKEND_BACKOFF_MAX,
+        )
+        if cache is None and settings.RESPONSE_CACHE_ENABLED:
+            cache = ResponseCache(
+                max_entries=settings.RESPONSE_CACHE_SIZE,
+                ttl=settings.RESPONSE_CACHE_TTL,
+                disk_path=settings.RESPONSE_CACHE_PATH if settings.RESPONSE_CACHE_DISK else None,
+                disk_max_entries=settings.RESPONSE_CACHE_DISK_MAX,
+            )
+        self.cache = cache
+        self.coalescer = SingleFlight()
+        self.batcher: MicroBatcher[str, Tuple[str, Optional[str]]] = MicroBatcher(
+            self._generic_infer_batch,
+            max_batch=settings.MODEL_BATCH_MAX_SIZE,
+            window_ms=settings.MODEL_BATCH_WINDOW_MS,
+        )
 
-        # Try generic model endpoint
+    def _configured_backends(self) -> List[str]:
+        # configured priority: vLLM/OpenAI-compatible, then Ollama, then the generic endpoint
+        names: List[str] = []
+        if settings.OPENAI_BASE_URL and settings.OPENAI_MODEL and settings.OPENAI_API_KEY:
+            names.append("openai")
+        if settings.OLLAMA_BASE_URL and settings.OLLAMA_MODEL:
+            names.append("ollama")
         if settings.MODEL_BASE_URL:
+            names.append("generic")
+        return names
+
+    def _model_id(self, name: str) -> str:
+        if name == "openai":
+            return f"{settings.OPENAI_BASE_URL}|{settings.OPENAI_MODEL}"
+        if name == "ollama":
+            return f"{settings.OLLAMA_BASE_URL}|{settings.OLLAMA_MODEL}"
+        return f"{settings.MODEL_BASE_URL}|{settings.MODEL_PATH}"
+
+    def _sampling_params(self, name: str) -> Dict[str, Any]:
+        if name == "openai":
+            return {"temperature": self.OPENAI_TEMPERATURE}
+        if name == "generic":
+            return {"max_tokens": self.GENERIC_MAX_TOKENS}
+        return {}
+
+    def _cache_keys(self, prompt: str, use_cache: bool) -> Dict[str, str]:
+        if not use_cache or self.cache is None:
+            return {}
+        return {
+            name: cache_key(name, self._model_id(name), prompt, self._sampling_params(name))
+            for name in self._configured_backends()
+        }
+
+    async def _cache_lookup(self, keys: Dict[str, str]) -> Optional[Tuple[str, Optional[str]]]:
+        if not keys:
+            return None
+        for key in keys.values():
+            hit = self.cache.get(key)
+            if hit is not None:
+                return hit
+        if self.cache.disk_path:
+            for key in keys.values():
+                hit = await run_blocking(self.cache.disk_get, key)
+                if hit is not None:
+                    return hit
+        self.cache.record_miss()
+        return None
+
+    async def _cache_store(self, key: Optional[str], entry: Tuple[str, Optional[str]]) -> None:
+        if key is None:
+            return
+        self.cache.put(key, entry)
+        if self.cache.disk_path:
+            await run_blocking(self.cache.disk_put, key, entry)
+
+    def _fingerprint(self, prompt: str) -> str:
+        backends = self._configured_backends()
+        models = "|".join(f"{name}={self._model_id(name)}" for name in backends)
+        params = {name: self._sampling_params(name) for name in backends}
+        return cache_key("*", models, prompt, params)
+
+    async def generate_reply(self, prompt: str, use_cache: bool = True) -> Tuple[str, Optional[str]]:
+        """Reply to `prompt`, reusing cached and in-flight identical generations.
+
+        With `use_cache=False` the reply is always generated afresh: the cache
+        is bypassed and the call is not coalesced with concurrent duplicates.
+        """
+        if use_cache and settings.COALESCE_ENABLED:
+            return await self.coalescer.do(self._fingerprint(prompt), lambda: self._generate(prompt, use_cache))
+        return await self._generate(prompt, use_cache)
+
+    async def _generate(self, prompt: str, use_cache: bool) -> Tuple[str, Optional[str]]:
+        keys = self._cache_keys(prompt, use_cache)
+        cached = await self._cache_lookup(keys)
+        if cached is not None:
+            return cached
+
+        calls = {"openai": self._openai_chat, "ollama": self._ollama_chat, "generic": self._generic_infer}
+        # fastest healthy backend first; open circuits are skipped without a request
+        for name in self.health.order(self._configured_backends()):
+            health = self.health.get(name)
+            if not health.allow():
+                continue
+            t0 = time.perf_counter()
             try:
-                return await asyncio.to_thread(self._generic_infer, prompt)
+                result = await calls[name](prompt)
             except Exception:
-                pass
+                health.record_failure()
+                continue
+            except BaseException:
+                # cancelled: no verdict on the backend, but free the half-open probe slot
+                health.release()
+                raise
+            health.record_success((time.perf_counter() - t0) * 1000.0)
+            await self._cache_store(keys.get(name), result)
+            return result
 
         # Fallback mock
         return self._mock_reply(prompt)
 
-    def _openai_chat(self, prompt: str) -> Tuple[str, Optional[str]]:
+    async def stream_reply(self, prompt: str, use_cache: bool = True) -> AsyncIterator[Tuple[str, Optional[str]]]:
+        """Yield `(text_delta, sentiment)` pairs as the backend produces tokens.
+
+        Backends are tried in the same health-aware order as `generate_reply`; a
+        backend that fails before its first token falls through to the next one.
+        The generic endpoint, the mock and cache hits have no token stream and
+        emit the whole reply at once.
+        """
+        keys = self._cache_keys(prompt, use_cache)
+        cached = await self._cache_lookup(keys)
+        if cached is not None:
+            yield cached
+            return
+
+        streams = {"openai": self._openai_stream, "ollama": self._ollama_stream}
+        for name in self.health.order(self._configured_backends()):
+            health = self.health.get(name)
+            if not health.allow():
+                continue
+            started = False
+            try:
+                if name in streams:
+                    parts: List[str] = []
+                    async for delta in streams[name](prompt):
+                        if not started:
+                            started = True
+                            # time to first token is not comparable with full replies; don't record it
+                            health.record_success()
+                        parts.append(delta)
+                        yield delta, "neutral"
+                    if not started:
+                        health.record_success()
+                    await self._cache_store(keys.get(name), ("".join(parts), "neutral"))
+                else:
+                    t0 = time.perf_counter()
+                    text, sentiment = await self._generic_infer(prompt)
+                    health.record_success((time.perf_counter() - t0) * 1000.0)
+                    await self._cache_store(keys.get(name), (text, sentiment))
+                    yield text, sentiment
+                return
+            except Exception:
+                if started:
+                    raise
+                health.record_failure()
+            except BaseException:
+                # cancelled or closed by a disconnecting client: free the probe slot
+                health.release()
+                raise
+
+        text, sentiment = self._mock_reply(prompt)
+        for i, word in enumerate(text.split(" ")):
+            yield (word if i == 0 else " " + word), sentiment
+
+    def _openai_request(self, prompt: str, stream: bool = False) -> Tuple[str, dict, dict]:
         url = f"{settings.OPENAI_BASE_URL.rstrip('/')}/chat/completions"
         headers = {
             "Authorization": f"Bearer {settings.OPENAI_API_KEY}",
@@ -52,15 +215,13 @@ class AIService:
                 {"role": "system", "content": "You are a compassionate persona for helloEx."},
                 {"role": "user", "content": prompt},
             ],
-            "temperature": 0.8,
+            **self._sampling_params("openai"),
         }
-        resp = self.session.post(url, headers=headers, json=payload, timeout=60)
-        resp.raise_for_status()
-        data = resp.json()
-        text = data.get("choices", [{}])[0].get("message", {}).get("content", "...")
-        return text, "neutral"
+        if stream:
+            payload["stream"] = True
+        return url, headers, payload
 
-    def _ollama_chat(self, prompt: str) -> Tuple[str, Optional[str]]:
+    def _ollama_request(self, prompt: str, stream: bool = False) -> Tuple[str, dict]:
         url = f"{settings.OLLAMA_BASE_URL.rstrip('/')}/api/chat"
         payload = {
             "model": settings.OLLAMA_MODEL,
@@ -68,9 +229,54 @@ class AIService:
                 {"role": "system", "content": "You are a compassionate persona for helloEx."},
                 {"role": "user", "content": prompt},
             ],
-            "stream": False,
+            "stream": stream,
         }
-        resp = self.session.post(url, json=payload, timeout=60)
+        return url, payload
+
+    async def _openai_stream(self, prompt: str) -> AsyncIterator[str]:
+        url, headers, payload = self._openai_request(prompt, stream=True)
+        client = self.pool.client()
+        async with client.stream("POST", url, headers=headers, json=payload, timeout=backend_timeout(settings.OPENAI_TIMEOUT)) as resp:
+            resp.raise_for_status()
+            # server-sent events: "data: {chunk}" lines, terminated by "data: [DONE]"
+            async for line in resp.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choice = (json.loads(data).get("choices") or [{}])[0]
+                delta = choice.get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
+    async def _ollama_stream(self, prompt: str) -> AsyncIterator[str]:
+        url, payload = self._ollama_request(prompt, stream=True)
+        client = self.pool.client()
+        async with client.stream("POST", url, json=payload, timeout=backend_timeout(settings.OLLAMA_TIMEOUT)) as resp:
+            resp.raise_for_status()
+            # newline-delimited JSON: {message:{content:"..."}, done:false}
+            async for line in resp.aiter_lines():
+                if not line.strip():
+                    continue
+                obj = json.loads(line)
+                delta = obj.get("message", {}).get("content")
+                if delta:
+                    yield delta
+                if obj.get("done"):
+                    break
+
+    async def _openai_chat(self, prompt: str) -> Tuple[str, Optional[str]]:
+        url, headers, payload = self._openai_request(prompt)
+        resp = await self.pool.client().post(url, headers=headers, json=payload, timeout=backend_timeout(settings.OPENAI_TIMEOUT))
+        resp.raise_for_status()
+        data = resp.json()
+        text = data.get("choices", [{}])[0].get("message", {}).get("content", "...")
+        return text, "neutral"
+
+    async def _ollama_chat(self, prompt: str) -> Tuple[str, Optional[str]]:
+        url, payload = self._ollama_request(prompt)
+        resp = await self.pool.client().post(url, json=payload, timeout=backend_timeout(settings.OLLAMA_TIMEOUT))
         resp.raise_for_status()
         data = resp.json()
         # ollama returns {message:{content:"..."}}
@@ -78,16 +284,39 @@ class AIService:
         text = msg.get("content", "...")
         return text, "neutral"
 
-    def _generic_infer(self, prompt: str) -> Tuple[str, Optional[str]]:
+    async def _generic_infer(self, prompt: str) -> Tuple[str, Optional[str]]:
+        if settings.MODEL_BATCH_ENABLED:
+            # concurrent calls are gathered into one batched request
+            return await self.batcher.submit(prompt)
         path = settings.MODEL_PATH or "/model/infer"
         url = f"{settings.MODEL_BASE_URL.rstrip('/')}{path}"
-        payload = {"prompt": prompt, "max_tokens": 200}
-        resp = self.session.post(url, json=payload, timeout=60)
+        payload = {"prompt": prompt, **self._sampling_params("generic")}
+        resp = await self.pool.client().post(url, json=payload, timeout=backend_timeout(settings.MODEL_TIMEOUT))
         resp.raise_for_status()
         data = resp.json()
         text = data.get("text") or data.get("reply") or json.dumps(data)[:200]
         return text, "neutral"
 
+    async def _generic_infer_batch(self, prompts: List[str]) -> List[Tuple[str, Optional[str]]]:
+        path = settings.MODEL_BATCH_PATH or "/model/infer_batch"
+        url = f"{settings.MODEL_BASE_URL.rstrip('/')}{path}"
+        payload = {"prompts": prompts, **self._sampling_params("generic")}
+        resp = await self.pool.client().post(url, json=payload, timeout=backend_timeout(settings.MODEL_TIMEOUT))
+        resp.raise_for_status()
+        data = resp.json()
+        # {results:[{text:...}]} or {texts:[...]}, one entry per prompt in order
+        results = data.get("results") if isinstance(data, dict) else data
+        if results is None:
+            results = data.get("texts") or []
+        replies: List[Tuple[str, Optional[str]]] = []
+        for item in results:
+            if isinstance(item, dict):
+                text = item.get("text") or item.get("reply") or json.dumps(item)[:200]
+            else:
+                text = str(item)
+            replies.append((text, "neutral"))
+        return replies
+
     def _mock_reply(self, prompt: str) -> Tuple[str, Optional[str]]:
         # simple echo-based mock
         reply = "I hear you. It’s okay to feel this way. "
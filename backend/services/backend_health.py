@@ -0,0 +1,135 @@
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+class BackendHealth:
+    """Circuit breaker and latency tracker for a single model backend.
+
+    closed     -> requests flow; `failure_threshold` consecutive failures open it
+    open       -> requests skip the backend until the back-off expires
+    half_open  -> exactly one probe request is let through; success closes the
+                  circuit, failure re-opens it with the back-off doubled
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        latency_alpha: float = 0.2,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.latency_alpha = latency_alpha
+        self._clock = clock
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.backoff = backoff_base
+        self.open_until = 0.0
+        self.probe_in_flight = False
+        self.latency_ms: Optional[float] = None
+        self.successes = 0
+        self.failures = 0
+        self.skipped = 0
+
+    def available(self) -> bool:
+        """Whether a request could be sent now, without claiming the probe slot."""
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            return self._clock() >= self.open_until
+        return not self.probe_in_flight
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now; claims the probe slot when half-open."""
+        if self.state == "closed":
+            return True
+        if self.state == "open" and self._clock() >= self.open_until:
+            self.state = "half_open"
+            self.probe_in_flight = False
+        if self.state == "half_open" and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        self.skipped += 1
+        return False
+
+    def release(self) -> None:
+        """Give back a claimed probe slot without a verdict (the request was cancelled)."""
+        if self.state == "half_open":
+            self.probe_in_flight = False
+
+    def record_success(self, latency_ms: Optional[float] = None) -> None:
+        self.successes += 1
+        self.consecutive_failures = 0
+        self.state = "closed"
+        self.probe_in_flight = False
+        self.backoff = self.backoff_base
+        if latency_ms is not None:
+            if self.latency_ms is None:
+                self.latency_ms = latency_ms
+            else:
+                self.latency_ms += self.latency_alpha * (latency_ms - self.latency_ms)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.state == "half_open":
+            # failed probe: back off exponentially
+            self.backoff = min(self.backoff * 2, self.backoff_max)
+            self._open()
+        elif self.consecutive_failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self) -> None:
+        self.state = "open"
+        self.probe_in_flight = False
+        self.open_until = self._clock() + self.backoff
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "latency_ms": round(self.latency_ms, 2) if self.latency_ms is not None else None,
+            "consecutive_failures": self.consecutive_failures,
+            "retry_in_sec": round(max(0.0, self.open_until - self._clock()), 2) if self.state == "open" else 0.0,
+            "successes": self.successes,
+            "failures": self.failures,
+            "skipped": self.skipped,
+        }
+
+
+class BackendRegistry:
+    """Health state for every backend, plus latency-aware ordering."""
+
+    def __init__(self, **health_kwargs: Any):
+        self._health_kwargs = health_kwargs
+        self._backends: Dict[str, BackendHealth] = {}
+
+    def get(self, name: str) -> BackendHealth:
+        health = self._backends.get(name)
+        if health is None:
+            health = self._backends[name] = BackendHealth(name, **self._health_kwargs)
+        return health
+
+    def order(self, names: Iterable[str]) -> List[str]:
+        """Healthy backends first, fastest first; untried ones keep their configured priority.
+
+        Open circuits are left out entirely, so a dead backend costs nothing
+        until its back-off expires and one probe is allowed through.
+        """
+        ranked = []
+        for priority, name in enumerate(names):
+            health = self.get(name)
+            if not health.available():
+                health.skipped += 1
+                continue
+            # unknown latency sorts first so every backend gets measured
+            ranked.append((health.latency_ms if health.latency_ms is not None else -1.0, priority, name))
+        ranked.sort()
+        return [name for _lat, _prio, name in ranked]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: h.snapshot() for name, h in self._backends.items()}
@@ -1,29 +1,29 @@
 import os
 import uuid
 import asyncio
-import requests
 
 from config import settings
+from services.http_client import http_pool, backend_timeout
 from utils.audio_utils import generate_dummy_wav
 
 
 class ElevenService:
     """ElevenLabs TTS with mock fallback that generates a local WAV file."""
 
-    def __init__(self):
-        self.session = requests.Session()
+    def __init__(self, pool=None):
+        self.pool = pool or http_pool
 
     async def speak(self, text: str, voice_id: str | None = None) -> str | None:
         # If API key and voice present, try ElevenLabs
         if settings.ELEVEN_API_KEY and (voice_id or settings.ELEVEN_VOICE_ID):
             try:
-                return await asyncio.to_thread(self._elevenlabs_speak, text, voice_id)
+                return await self._elevenlabs_speak(text, voice_id)
             except Exception:
                 pass
         # Fallback: generate a dummy wav so the pipeline works
         return await asyncio.to_thread(self._mock_speak, text)
 
-    def _elevenlabs_speak(self, text: str, voice_id: str | None) -> str | None:
+    async def _elevenlabs_speak(self, text: str, voice_id: str | None) -> str | None:
         vid = voice_id or settings.ELEVEN_VOICE_ID
         url = f"{settings.ELEVEN_BASE_URL.rstrip('/')}/text-to-speech/{vid}"
         headers = {
@@ -35,15 +35,19 @@ class ElevenService:
             "text": text,
             "model_id": "eleven_monolingual_v1",
         }
-        resp = self.session.post(url, headers=headers, json=payload, timeout=60)
+        resp = await self.pool.client().post(url, headers=headers, json=payload, timeout=backend_timeout(settings.ELEVEN_TIMEOUT))
         resp.raise_for_status()
         audio_bytes = resp.content
         fname = f"tts_{uuid.uuid4().hex}.mp3"
         out_path = os.path.join(settings.AUDIO_DIR, fname)
-        with open(out_path, "wb") as f:
-            f.write(audio_bytes)
+        await asyncio.to_thread(self._write_audio, out_path, audio_bytes)
         return f"/static/audio/{fname}"
 
+    @staticmethod
+    def _write_audio(path: str, audio_bytes: bytes) -> None:
+        with open(path, "wb") as f:
+            f.write(audio_bytes)
+
     def _mock_speak(self, text: str) -> str | None:
         fname = f"tts_{uuid.uuid4().hex}.wav"
         out_path = os.path.join(settings.AUDIO_DIR, fname)
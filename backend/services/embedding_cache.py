@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from config import settings
+
+EncodeFn = Callable[[List[str]], Any]
+
+_DIGEST_SIZE = 20
+
+
+def content_key(model_name: str, text: str) -> bytes:
+    """Cache key for one embedding: SHA-1 over the model name and the text."""
+    return hashlib.sha1(f"{model_name}\0{text}".encode("utf-8")).digest()
+
+
+class _DiskTier:
+    """Append-only on-disk embeddings for one model, memory-mapped for reads.
+
+    ``<slug>.keys`` holds fixed-width digests, ``<slug>.f32`` the float32 rows
+    in the same order and ``<slug>.json`` the model name and dimension. Vectors
+    are written before keys, so a torn append only ever leaves an unreferenced
+    row, which is dropped on the next open. Once `max_rows` is reached new
+    entries stay in the memory tier only.
+    """
+
+    def __init__(self, directory: str, model_name: str, max_rows: int):
+        os.makedirs(directory, exist_ok=True)
+        slug = hashlib.sha1(model_name.encode("utf-8")).hexdigest()[:16]
+        self.keys_path = os.path.join(directory, slug + ".keys")
+        self.vectors_path = os.path.join(directory, slug + ".f32")
+        self.meta_path = os.path.join(directory, slug + ".json")
+        self.model_name = model_name
+        self.max_rows = max_rows
+        self.dim: Optional[int] = None
+        self.rows: Dict[bytes, int] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self.dim = int(json.load(f)["dim"])
+            with open(self.keys_path, "rb") as f:
+                raw = f.read()
+            vec_bytes = os.path.getsize(self.vectors_path)
+        except Exception:
+            return
+        # never trust keys beyond the rows that actually made it to disk
+        count = min(len(raw) // _DIGEST_SIZE, vec_bytes // (self.dim * 4))
+        self.rows = {raw[i * _DIGEST_SIZE:(i + 1) * _DIGEST_SIZE]: i for i in range(count)}
+        with open(self.keys_path, "r+b") as f:
+            f.truncate(count * _DIGEST_SIZE)
+        with open(self.vectors_path, "r+b") as f:
+            f.truncate(count * self.dim * 4)
+
+    def _vectors(self) -> np.ndarray:
+        count = len(self.rows)
+        if self._matrix is None or self._matrix.shape[0] != count:
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(count, self.dim))
+        return self._matrix
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        row = self.rows.get(key)
+        if row is None:
+            return None
+        return np.array(self._vectors()[row])
+
+    def put_many(self, keys: List[bytes], vecs: np.ndarray) -> None:
+        if self.dim is None:
+            self.dim = int(vecs.shape[1])
+            with open(self.meta_path, "w", encoding="utf-8") as f:
+                json.dump({"model": self.model_name, "dim": self.dim}, f)
+        elif vecs.shape[1] != self.dim:
+            return
+        room = self.max_rows - len(self.rows)
+        fresh = [i for i, k in enumerate(keys) if k not in self.rows][: max(0, room)]
+        if not fresh:
+            return
+        with open(self.vectors_path, "ab") as f:
+            f.write(np.ascontiguousarray(vecs[fresh], dtype=np.float32).tobytes())
+        with open(self.keys_path, "ab") as f:
+            f.write(b"".join(keys[i] for i in fresh))
+        start = len(self.rows)
+        for n, i in enumerate(fresh):
+            self.rows[keys[i]] = start + n
+
+
+class EmbeddingCache:
+    """Content-addressed embedding cache shared by the model-backed stores.
+
+    Lookups go LRU memory tier first, then the optional disk tier; only the
+    misses of a batch are sent to the model, in one call. Keys cover both the
+    model name and the text, so switching models never returns stale vectors.
+    """
+
+    def __init__(self, size: int = 10000, disk_dir: Optional[str] = None, disk_max: int = 1000000):
+        self.size = size
+        self.disk_dir = disk_dir
+        self.disk_max = disk_max
+        self._lock = threading.Lock()
+        self._lru: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._disk: Dict[str, _DiskTier] = {}
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _disk_tier(self, model_name: str) -> Optional[_DiskTier]:
+        if not self.disk_dir:
+            return None
+        tier = self._disk.get(model_name)
+        if tier is None:
+            tier = self._disk[model_name] = _DiskTier(self.disk_dir, model_name, self.disk_max)
+        return tier
+
+    def _remember(self, key: bytes, vec: np.ndarray) -> None:
+        if self.size <= 0:
+            return
+        self._lru[key] = vec
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.size:
+            self._lru.popitem(last=False)
+
+    def encode(self, model_name: str, texts: List[str], encode_fn: EncodeFn) -> np.ndarray:
+        """Return one float32 row per text, calling `encode_fn` only for misses."""
+        keys = [content_key(model_name, t) for t in texts]
+        found: List[Optional[np.ndarray]] = [None] * len(texts)
+        with self._lock:
+            disk = self._disk_tier(model_name)
+            for i, key in enumerate(keys):
+                vec = self._lru.get(key)
+                if vec is not None:
+                    self._lru.move_to_end(key)
+                    self.hits += 1
+                elif disk is not None:
+                    vec = disk.get(key)
+                    if vec is not None:
+                        self.disk_hits += 1
+                        self._remember(key, vec)
+                found[i] = vec
+        # duplicates inside one batch are encoded once
+        missing: Dict[bytes, int] = {}
+        for i, vec in enumerate(found):
+            if vec is None and keys[i] not in missing:
+                missing[keys[i]] = i
+        if missing:
+            order = list(missing.values())
+            computed = np.asarray(encode_fn([texts[i] for i in order]), dtype=np.float32)
+            with self._lock:
+                self.misses += len(order)
+                miss_keys = [keys[i] for i in order]
+                for key, vec in zip(miss_keys, computed):
+                    self._remember(key, vec.copy())
+                disk = self._disk_tier(model_name)
+                if disk is not None:
+                    disk.put_many(miss_keys, computed)
+            by_key = dict(zip(miss_keys, computed))
+            found = [vec if vec is not None else by_key[keys[i]] for i, vec in enumerate(found)]
+        if not found:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.vstack(found).astype(np.float32, copy=False)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "entries": len(self._lru),
+            "disk_entries": sum(len(t.rows) for t in self._disk.values()),
+        }
+
+
+embedding_cache = EmbeddingCache(
+    size=settings.EMBEDDING_CACHE_SIZE,
+    disk_dir=settings.EMBEDDING_CACHE_DIR if settings.EMBEDDING_CACHE_DISK else None,
+    disk_max=settings.EMBEDDING_CACHE_DISK_MAX,
+)
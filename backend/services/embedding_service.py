@@ -1,20 +1,36 @@
+import copy
+import hashlib
+import importlib.util
 import os
 import json
 import uuid
-from typing import List, Tuple
+import threading
+from concurrent.futures import Future
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
 
 import numpy as np
 
 from config import settings
-from utils.text_utils import simple_embed
+from utils.append_writer import SyncPolicy, append_writer, open_append, write_all
+from services.embedding_cache import embedding_cache
+from services.ivf_index import IVFIndex
+from services.quantization import QuantizedCodes
+from services.tag_index import TagIndex
+from services.model_registry import get_sentence_transformer, register_sentence_transformer
+from utils.async_utils import get_build_executor, run_blocking
+from utils.lru_pool import RefCountedLRU
+from utils.text_utils import embed_many, simple_embed
 
 # Optional imports for Chroma, Milvus and sentence-transformers
 try:
     import chromadb  # type: ignore
-    from sentence_transformers import SentenceTransformer  # type: ignore
 except Exception:
     chromadb = None  # type: ignore
-    SentenceTransformer = None  # type: ignore
+
+# sentence-transformers pulls in torch; only check it is installed, the model
+# registry imports it on first use
+HAVE_SENTENCE_TRANSFORMERS = importlib.util.find_spec("sentence_transformers") is not None
 
 try:
     from pymilvus import (
@@ -30,70 +46,482 @@ except Exception:
     FieldSchema = CollectionSchema = DataType = Collection = utility = None  # type: ignore
 
 
-class _FileMemoryStore:
-    """Very simple on-disk JSONL memory store with naive vector search."""
+def _batches(items: List[str], size: int) -> Iterator[List[str]]:
+    size = max(1, size)
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _cached_encode(model_name: str, texts: List[str]) -> List[List[float]]:
+    """Embed through the shared content-hash cache; the model is only loaded and run for misses."""
+    return embedding_cache.encode(
+        model_name,
+        texts,
+        lambda miss: get_sentence_transformer(model_name).encode(miss, batch_size=settings.EMBEDDING_BATCH_SIZE, normalize_embeddings=True),
+    ).tolist()
+
+
+class _AsyncStoreMixin:
+    """Awaitable wrappers that run the blocking store calls on the store executor."""
+
+    async def add_async(self, text: str, tags: List[str]) -> str:
+        return await run_blocking(self.add, text, tags)
+
+    async def add_many_async(self, texts: List[str], tags: List[str]) -> List[str]:
+        return await run_blocking(self.add_many, texts, tags)
+
+    async def retrieve_async(
+        self, query: str, top_k: int = 5, tags: Optional[List[str]] = None, source: Optional[str] = None
+    ) -> List[str]:
+        if tags or source:
+            return await run_blocking(self.retrieve, query, top_k, tags, source)
+        return await run_blocking(self.retrieve, query, top_k)
+
+
+def _filter_tags(tags: Optional[List[str]], source: Optional[str]) -> List[str]:
+    """Tags a memory must carry to match a filtered retrieve.
+
+    Ingestion records an upload's `source` as one of its tags, so a source
+    filter is one more required tag.
+    """
+    required = [t for t in (tags or []) if t]
+    if source:
+        required.append(source)
+    return sorted(set(required))
+
+
+def _milvus_quote(value: str, like: bool = False) -> str:
+    value = value.replace("\\", "\\\\").replace('"', '\\"')
+    if like:
+        value = value.replace("%", "\\%").replace("_", "\\_")
+    return value
+
+
+def _milvus_tag_expr(tags: List[str]) -> str:
+    """Boolean expression matching rows whose comma-joined `tags` field holds every tag."""
+    clauses = []
+    for tag in tags:
+        exact, pattern = _milvus_quote(tag), _milvus_quote(tag, like=True)
+        clauses.append(
+            f'(tags == "{exact}" or tags like "{pattern},%" or tags like "%,{pattern}" or tags like "%,{pattern},%")'
+        )
+    return " and ".join(clauses)
+
+
+def _chroma_where(tags: List[str]) -> Optional[dict]:
+    """Metadata filter on the per-tag ``tag:<name>`` flags written by `add_many`."""
+    clauses = [{f"tag:{t}": True} for t in tags]
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+class _FileMemoryStore(_AsyncStoreMixin):
+    """Columnar on-disk memory store with a memory-mapped cosine index.
+
+    Segments stored next to `path`:
+
+    - ``memory.jsonl``: one ``{id, text, tags}`` record per line (text segment)
+    - ``memory.offsets.u64``: byte offset of every record in the text segment
+    - ``memory.vectors.f32``: L2-normalized float32 rows, memory-mapped on open
+    - ``memory.manifest.json``: format version and vector dimension
+    - ``memory.tags.jsonl``: tag runs behind the inverted tag index
+
+    Opening maps the vector segment without parsing anything, a query is one
+    matrix-vector product, and only the top-k text records are read back.
+    Tag/source filtered queries score only the rows the tag index returns.
+    Legacy JSONL files with inline vectors are migrated once on first open.
+    """
+
+    FORMAT_VERSION = 1
+    _MIGRATE_BATCH = 4096
 
     def __init__(self, path: str):
         self.path = path
         os.makedirs(os.path.dirname(self.path), exist_ok=True)
-        self._cache: List[Tuple[str, List[float], List[str]]] = []  # (id, vec, tags)
+        base = os.path.splitext(self.path)[0]
+        self.vectors_path = base + ".vectors.f32"
+        self.offsets_path = base + ".offsets.u64"
+        self.manifest_path = base + ".manifest.json"
+        self._lock = threading.Lock()
+        self._dim: Optional[int] = None
+        self._count = 0
+        self._matrix: Optional[np.ndarray] = None
         self._loaded = False
+        self._fds: Optional[Tuple[int, int, int]] = None
+        self._sync = SyncPolicy(settings.MEMORY_FSYNC, settings.MEMORY_FSYNC_INTERVAL)
+        self.tag_index = TagIndex(base)
+        self._builds: Dict[str, Future] = {}
+        quant = (settings.MEMORY_QUANTIZATION or "none").lower()
+        self.quant: Optional[QuantizedCodes] = None
+        if quant in ("int8", "pq"):
+            self.quant = QuantizedCodes(
+                base,
+                quant,
+                pq_m=settings.PQ_SUBVECTORS,
+                train_min=settings.QUANT_TRAIN_MIN,
+                train_sample=settings.QUANT_TRAIN_SAMPLE,
+            )
 
     def _load(self):
         if self._loaded:
             return
-        self._cache = []
-        if os.path.exists(self.path):
-            with open(self.path, "r", encoding="utf-8") as f:
-                for line in f:
-                    try:
-                        obj = json.loads(line)
-                        self._cache.append((obj["id"], obj["vector"], obj.get("tags", [])))
-                    except Exception:
-                        continue
+        with self._lock:
+            if not self._loaded:
+                self._open_segments()
+
+    def _open_segments(self) -> None:
+        if not os.path.exists(self.manifest_path) and os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            self._migrate_jsonl()
+        manifest = self._read_manifest()
+        self._dim = manifest.get("dim")
+        self._count = 0
+        if self._dim:
+            rows = os.path.getsize(self.vectors_path) // (self._dim * 4) if os.path.exists(self.vectors_path) else 0
+            offsets = os.path.getsize(self.offsets_path) // 8 if os.path.exists(self.offsets_path) else 0
+            # a torn append leaves one segment longer than the other; drop the partial row
+            self._count = min(rows, offsets)
+            self._truncate(self.vectors_path, self._count * self._dim * 4)
+            self._truncate(self.offsets_path, self._count * 8)
+            self.tag_index.open(self._count, self._read_tags)
+            if self.quant is not None and self._count:
+                self.quant.open(self._count, self._dim, self._vectors)
+        self._matrix = None
         self._loaded = True
 
+    def _read_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _write_manifest(self, dim: Optional[int]) -> None:
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": self.FORMAT_VERSION, "dim": dim, "dtype": "float32", "normalized": True}, f)
+        os.replace(tmp, self.manifest_path)
+
+    @staticmethod
+    def _truncate(path: str, size: int) -> None:
+        if os.path.exists(path) and os.path.getsize(path) > size:
+            with open(path, "r+b") as f:
+                f.truncate(size)
+
+    @staticmethod
+    def _encode_record(mem_id: str, text: str, tags: List[str]) -> bytes:
+        return (json.dumps({"id": mem_id, "text": text, "tags": tags}) + "\n").encode("utf-8")
+
+    @staticmethod
+    def _normalize(vecs: np.ndarray) -> np.ndarray:
+        vecs = np.asarray(vecs, dtype=np.float32)
+        return (vecs / (np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-8)).astype(np.float32)
+
+    def _migrate_jsonl(self) -> None:
+        """Convert a legacy JSONL file with inline vectors into the columnar layout."""
+        tmp_text = self.path + ".migrating"
+        dim: Optional[int] = None
+        with open(self.path, "r", encoding="utf-8") as src, open(tmp_text, "wb") as txt, open(
+            self.offsets_path, "wb"
+        ) as offs, open(self.vectors_path, "wb") as vecs:
+            batch_offsets: List[int] = []
+            batch_vecs: List[List[float]] = []
+
+            def flush():
+                if batch_vecs:
+                    offs.write(np.asarray(batch_offsets, dtype=np.uint64).tobytes())
+                    vecs.write(self._normalize(np.asarray(batch_vecs, dtype=np.float32)).tobytes())
+                batch_offsets.clear()
+                batch_vecs.clear()
+
+            for line in src:
+                try:
+                    obj = json.loads(line)
+                    mem_id = obj["id"]
+                except Exception:
+                    continue
+                text = obj.get("text", "")
+                vec = obj.get("vector") or simple_embed(text)
+                if dim is None:
+                    dim = len(vec)
+                elif len(vec) != dim:
+                    continue
+                batch_offsets.append(txt.tell())
+                batch_vecs.append(vec)
+                txt.write(self._encode_record(mem_id, text, obj.get("tags", [])))
+                if len(batch_vecs) >= self._MIGRATE_BATCH:
+                    flush()
+            flush()
+        os.replace(tmp_text, self.path)
+        self._write_manifest(dim)
+
+    def _append_rows(self, records: List[Tuple[str, str, List[str]]], vecs: np.ndarray) -> None:
+        """Append `(id, text, tags)` records and their raw vectors to all segments.
+
+        Rows are handed to the shared append writer, which merges rows from
+        concurrent callers into one write per segment (see `commit`).
+        """
+        if not records:
+            return
+        append_writer.submit(self, (records, self._normalize(vecs)))
+
+    def commit(self, payloads: List[Tuple[List[Tuple[str, str, List[str]]], np.ndarray]]) -> None:
+        """Write a group of row batches; runs on the append writer thread only."""
+        records = [rec for recs, _vecs in payloads for rec in recs]
+        normalized = np.vstack([vecs for _recs, vecs in payloads])
+        with self._lock:
+            if self._dim is None:
+                self._dim = int(normalized.shape[1])
+                self._write_manifest(self._dim)
+            if self._fds is None:
+                self._fds = (open_append(self.path), open_append(self.offsets_path), open_append(self.vectors_path))
+            text_fd, offsets_fd, vectors_fd = self._fds
+            start = os.lseek(text_fd, 0, os.SEEK_END)
+            payload = [self._encode_record(mem_id, text, tags) for mem_id, text, tags in records]
+            sizes = np.fromiter((len(p) for p in payload), dtype=np.int64, count=len(payload))
+            offsets = start + np.cumsum(sizes) - sizes
+            # text first: a row only counts once its offset and vector exist
+            write_all(text_fd, b"".join(payload))
+            write_all(offsets_fd, offsets.astype(np.uint64).tobytes())
+            write_all(vectors_fd, normalized.tobytes())
+            self._sync.after_write(*self._fds)
+            start_row = self._count
+            self._count += len(records)
+            if self.tag_index.rows == start_row:
+                self.tag_index.add(start_row, [tags for _id, _text, tags in records])
+            if self.quant is not None:
+                if self.quant.rows == start_row:
+                    self.quant.add(normalized)
+                if self.quant.needs_training(self._count):
+                    # queries scan exactly until the codes are installed
+                    self._build_in_background("quant", self.quant.build, self.quant.install)
+
+    def _build_in_background(self, name: str, build: Callable[[np.ndarray], Any], install: Callable[[Any, np.ndarray], None]) -> None:
+        """Train an index off the append writer, then install it back on the writer.
+
+        Called from `commit` (writer thread). `build` gets a snapshot of the
+        rows committed so far and runs on the index-build thread, so chat and
+        memory appends keep flowing while it trains; `install` runs on the
+        writer thread with every row committed by then, catches up the rows
+        added meanwhile and publishes the result. One build per index at a time.
+        """
+        pending = self._builds.get(name)
+        if pending is not None and not pending.done():
+            return
+        snapshot = self._vectors()
+
+        def run() -> None:
+            result = build(snapshot)
+
+            def publish() -> None:
+                with self._lock:
+                    install(result, self._vectors())
+
+            append_writer.call(publish)
+
+        self._builds[name] = get_build_executor().submit(run)
+
+    def wait_for_builds(self) -> None:
+        """Block until background index builds have been installed (tests, tools)."""
+        for future in list(self._builds.values()):
+            future.result()
+
+    def close(self) -> None:
+        # a build installing after the close would write behind a reopened store's back
+        self.wait_for_builds()
+        append_writer.call(self._close_fds)
+
+    def _close_fds(self) -> None:
+        fds, self._fds = self._fds, None
+        for fd in fds or ():
+            if self._sync.fsync != "never":
+                os.fsync(fd)
+            os.close(fd)
+        self.tag_index.close()
+        if self.quant is not None:
+            self.quant.close()
+
+    def _vectors(self) -> np.ndarray:
+        """Memory-map the vector segment, remapping after appends."""
+        if self._matrix is None or self._matrix.shape[0] != self._count:
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(self._count, self._dim))
+        return self._matrix
+
+    @staticmethod
+    def _unit(query_vec) -> np.ndarray:
+        q = np.array(query_vec, dtype=np.float32)
+        q /= np.linalg.norm(q) + 1e-8
+        return q
+
+    def _top_k(self, query_vec: List[float], top_k: int, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Return row indices of the `top_k` most similar memories (among `rows`, if given), best first."""
+        if self._count == 0 or top_k <= 0 or (rows is not None and len(rows) == 0):
+            return np.zeros(0, dtype=np.int64)
+        return self._score_rows(self._unit(query_vec), top_k, rows)
+
+    def _score_rows(self, q: np.ndarray, top_k: int, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Exact top-k over all rows, or only over the candidate `rows` when given."""
+        if self.quant is not None and self.quant.trained:
+            rows = self._shortlist(q, top_k, rows)
+        vectors = self._vectors()
+        scores = vectors @ q if rows is None else vectors[rows] @ q
+        n = len(scores)
+        k = min(top_k, n)
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64)
+        idx = np.argpartition(scores, -k)[-k:] if k < n else np.arange(n)
+        idx = idx[np.argsort(scores[idx])[::-1]]
+        return idx if rows is None else rows[idx]
+
+    def _shortlist(self, q: np.ndarray, top_k: int, rows: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        """Pick re-rank candidates by asymmetric distance over the quantized codes.
+
+        Rows committed after the codes (not yet encoded) are always kept.
+        """
+        keep = max(top_k, settings.QUANT_RERANK)
+        coded = self.quant.rows
+        if rows is None:
+            if self._count <= keep:
+                return None
+            approx_rows, tail = None, np.arange(coded, self._count, dtype=np.int64)
+        else:
+            if len(rows) <= keep:
+                return rows
+            approx_rows, tail = rows[rows < coded], rows[rows >= coded]
+        scores = self.quant.scores(q, approx_rows)
+        n = len(scores)
+        best = np.argpartition(scores, -keep)[-keep:] if keep < n else np.arange(n)
+        picked = best if approx_rows is None else approx_rows[best]
+        return np.sort(np.concatenate([picked.astype(np.int64), tail]))
+
+    def _read_tags(self, start: int, end: int) -> List[List[str]]:
+        """Tags of rows `start .. end`, read sequentially from the text segment."""
+        if end <= start:
+            return []
+        offsets = np.memmap(self.offsets_path, dtype=np.uint64, mode="r", shape=(self._count,))
+        tags: List[List[str]] = []
+        with open(self.path, "rb") as f:
+            f.seek(int(offsets[start]))
+            for _ in range(end - start):
+                try:
+                    tags.append(list(json.loads(f.readline()).get("tags") or []))
+                except Exception:
+                    tags.append([])
+        return tags
+
+    def _read_texts(self, rows: np.ndarray) -> List[str]:
+        """Read only the text records at `rows` using the offset segment."""
+        if len(rows) == 0:
+            return []
+        offsets = np.memmap(self.offsets_path, dtype=np.uint64, mode="r", shape=(self._count,))
+        texts: List[str] = []
+        with open(self.path, "rb") as f:
+            for row in rows:
+                f.seek(int(offsets[row]))
+                try:
+                    texts.append(json.loads(f.readline()).get("text", ""))
+                except Exception:
+                    texts.append("")
+        return texts
+
     def add(self, text: str, tags: List[str]) -> str:
+        return self.add_many([text], tags)[0]
+
+    def add_many(self, texts: List[str], tags: List[str]) -> List[str]:
         self._load()
-        vec = simple_embed(text)
-        mem_id = f"mem_{uuid.uuid4().hex}"
-        rec = {"id": mem_id, "text": text, "vector": vec, "tags": tags}
-        with open(self.path, "a", encoding="utf-8") as f:
-            f.write(json.dumps(rec) + "\n")
-        self._cache.append((mem_id, vec, tags))
-        return mem_id
+        ids: List[str] = []
+        for batch in _batches(texts, settings.EMBEDDING_BATCH_SIZE):
+            records = [(f"mem_{uuid.uuid4().hex}", text, tags) for text in batch]
+            self._append_rows(records, embed_many(batch))
+            ids.extend(mem_id for mem_id, _text, _tags in records)
+        return ids
+
+    def flush(self) -> None:
+        # every append is written through to the segment files
+        pass
 
-    def retrieve(self, query: str, top_k: int = 5) -> List[str]:
+    def retrieve(
+        self, query: str, top_k: int = 5, tags: Optional[List[str]] = None, source: Optional[str] = None
+    ) -> List[str]:
+        """Top-k memories for `query`, optionally only those carrying all `tags` and `source`."""
         self._load()
-        if not self._cache:
+        if not self._count:
             return []
-        q = np.array(simple_embed(query), dtype=np.float32)
-        scored: List[Tuple[float, str]] = []
-        for mem_id, vec, _tags in self._cache:
-            v = np.array(vec, dtype=np.float32)
-            denom = (np.linalg.norm(q) * np.linalg.norm(v)) + 1e-8
-            sim = float(np.dot(q, v) / denom)
-            scored.append((sim, mem_id))
-        scored.sort(reverse=True, key=lambda x: x[0])
-        id_to_text: dict[str, str] = {}
-        try:
-            with open(self.path, "r", encoding="utf-8") as f:
-                for line in f:
-                    obj = json.loads(line)
-                    id_to_text[obj["id"]] = obj.get("text", "")
-        except Exception:
-            pass
-        results: List[str] = []
-        for _sim, mid in scored[:top_k]:
-            results.append(id_to_text.get(mid, ""))
-        return results
+        required = _filter_tags(tags, source)
+        rows = self.tag_index.candidates(required) if required else None
+        return self._read_texts(self._top_k(embed_many([query])[0], top_k, rows))
+
+
+class _IVFMemoryStore(_FileMemoryStore):
+    """File store with an in-process IVF-flat index (`VECTOR_BACKEND=ann`).
 
+    Segments are the file store's; the index adds centroid and assignment
+    files next to them (see `services/ivf_index.py`). Queries score only the
+    rows of the `ANN_NPROBE` closest lists, exactly, so recall and latency are
+    traded with `ANN_NPROBE` / `ANN_NLIST`. Inserts are assigned to lists as
+    they are committed; small stores are scanned exactly until the index has
+    `ANN_TRAIN_MIN` rows to train on. Training and retraining run on the
+    index-build thread and are swapped in when done.
+    """
 
-class _MilvusMemoryStore:
-    """Milvus-backed vector store using sentence-transformers embeddings."""
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.index = IVFIndex(
+            os.path.splitext(self.path)[0],
+            nlist=settings.ANN_NLIST,
+            nprobe=settings.ANN_NPROBE,
+            train_min=settings.ANN_TRAIN_MIN,
+            train_sample=settings.ANN_TRAIN_SAMPLE,
+            train_iters=settings.ANN_TRAIN_ITERS,
+        )
+
+    def _open_segments(self) -> None:
+        super()._open_segments()
+        if self._dim:
+            self.index.open(self._count, self._vectors)
+
+    def commit(self, payloads) -> None:
+        start = self._count
+        super().commit(payloads)
+        if self.index.rows == start:
+            # assigned with the current centroids, even while a retrain is running
+            self.index.add(np.vstack([vecs for _recs, vecs in payloads]))
+        if self.index.needs_training(self._count):
+            self._build_in_background("ivf", self.index.build, self.index.install)
+
+    def _top_k(self, query_vec: List[float], top_k: int, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        if self._count == 0 or top_k <= 0 or (rows is not None and len(rows) == 0):
+            return np.zeros(0, dtype=np.int64)
+        q = self._unit(query_vec)
+        # small filtered subsets are cheaper (and exact) to scan directly
+        if not self.index.trained or (rows is not None and len(rows) <= self.index.train_min):
+            return self._score_rows(q, top_k, rows)
+        probed = self.index.candidates(q)
+        # rows committed but not yet assigned are scored too
+        if self.index.rows < self._count:
+            probed = np.concatenate([probed, np.arange(self.index.rows, self._count, dtype=np.int64)])
+        probed = np.sort(probed)
+        if rows is not None:
+            probed = np.intersect1d(probed, rows, assume_unique=True)
+            if len(probed) < top_k:
+                probed = rows  # the filter and the probed lists barely overlap
+        return self._score_rows(q, top_k, probed)
+
+    def _close_fds(self) -> None:
+        super()._close_fds()
+        self.index.close()
+
+
+class _MilvusMemoryStore(_AsyncStoreMixin):
+    """Milvus-backed vector store using sentence-transformers embeddings.
+
+    With `partition_key=True` the collection gets a ``tenant`` partition-key
+    field: `scoped(tenant)` returns a view that inserts into and searches only
+    that tenant's partition, sharing the connection and collection handle.
+    """
 
-    def __init__(self):
-        if connections is None or SentenceTransformer is None:
+    def __init__(self, collection_name: Optional[str] = None, partition_key: bool = False):
+        if connections is None or not HAVE_SENTENCE_TRANSFORMERS:
             raise RuntimeError("Milvus or sentence-transformers not installed.")
         # connect
         conn_kwargs = {
@@ -107,24 +535,30 @@ class _MilvusMemoryStore:
             conn_kwargs.update({"db_name": settings.MILVUS_DB})
         connections.connect(**conn_kwargs)
 
-        self.collection_name = settings.MILVUS_COLLECTION
+        self.collection_name = collection_name or settings.MILVUS_COLLECTION
+        self.partition_key = partition_key
+        self.tenant: Optional[str] = None
         self.metric_type = settings.MILVUS_METRIC_TYPE
         self.index_type = settings.MILVUS_INDEX_TYPE
         # embedder
-        self.embedder = SentenceTransformer(settings.EMBEDDING_MODEL_NAME)
-        dim = getattr(self.embedder, "get_sentence_embedding_dimension", lambda: None)()
-        if not dim:
-            # compute once
-            dim = len(self.embedder.encode(["dim_probe"])[0])
+        self.model_name = settings.EMBEDDING_MODEL_NAME
+        register_sentence_transformer(self.model_name)
 
-        # create collection if needed
+        # create collection if needed; only then is the model loaded up front, for its dimension
         if not utility.has_collection(self.collection_name):
+            dim = getattr(self.embedder, "get_sentence_embedding_dimension", lambda: None)()
+            if not dim:
+                # compute once
+                dim = len(self.embedder.encode(["dim_probe"])[0])
             fields = [
                 FieldSchema(name="id", dtype=DataType.VARCHAR, is_primary=True, max_length=64),
                 FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=int(dim)),
                 FieldSchema(name="tags", dtype=DataType.VARCHAR, max_length=512),
                 FieldSchema(name="text", dtype=DataType.VARCHAR, max_length=65535),
             ]
+            if partition_key:
+                # Milvus hashes tenants onto physical partitions and prunes searches by them
+                fields.append(FieldSchema(name="tenant", dtype=DataType.VARCHAR, max_length=64, is_partition_key=True))
             schema = CollectionSchema(fields=fields, description="memory embeddings")
             self.collection = Collection(name=self.collection_name, schema=schema)
             # index
@@ -137,24 +571,57 @@ class _MilvusMemoryStore:
             self.collection = Collection(self.collection_name)
         self.collection.load()
 
+    @property
+    def embedder(self):
+        # loaded on first use and shared with every other store using the same model
+        return get_sentence_transformer(self.model_name)
+
+    def scoped(self, tenant: str) -> "_MilvusMemoryStore":
+        view = copy.copy(self)
+        view.tenant = tenant
+        return view
+
     def _embed(self, texts: List[str]) -> List[List[float]]:
-        return self.embedder.encode(texts, normalize_embeddings=True).tolist()
+        return _cached_encode(self.model_name, texts)
 
     def add(self, text: str, tags: List[str]) -> str:
-        mem_id = f"mem_{uuid.uuid4().hex}"
-        emb = self._embed([text])[0]
-        tags_str = ",".join(tags or [])
-        self.collection.insert([[mem_id], [emb], [tags_str], [text]])
+        mem_id = self.add_many([text], tags)[0]
         # flush is optional in newer versions; keep for durability
-        self.collection.flush()
+        self.flush()
         return mem_id
 
-    def retrieve(self, query: str, top_k: int = 5) -> List[str]:
+    def add_many(self, texts: List[str], tags: List[str]) -> List[str]:
+        """Embed and insert `texts` in batches; call `flush()` once the whole ingest is done."""
+        tags_str = ",".join(tags or [])
+        ids: List[str] = []
+        for batch in _batches(texts, settings.EMBEDDING_BATCH_SIZE):
+            batch_ids = [f"mem_{uuid.uuid4().hex}" for _ in batch]
+            columns = [batch_ids, self._embed(batch), [tags_str] * len(batch), batch]
+            if self.partition_key:
+                columns.append([self.tenant or ""] * len(batch))
+            self.collection.insert(columns)
+            ids.extend(batch_ids)
+        return ids
+
+    def flush(self) -> None:
+        self.collection.flush()
+
+    def retrieve(
+        self, query: str, top_k: int = 5, tags: Optional[List[str]] = None, source: Optional[str] = None
+    ) -> List[str]:
         if not query:
             return []
         qvec = self._embed([query])[0]
         search_params = {"metric_type": self.metric_type, "params": {"ef": 128}} if self.index_type.upper() == "HNSW" else {"metric_type": self.metric_type, "params": {}}
-        hits = self.collection.search(data=[qvec], anns_field="embedding", param=search_params, limit=top_k, output_fields=["text"])
+        required = _filter_tags(tags, source)
+        # filtered in Milvus, before the vector search ranks candidates
+        clauses = [_milvus_tag_expr(required)] if required else []
+        if self.partition_key:
+            clauses.insert(0, f'tenant == "{_milvus_quote(self.tenant or "")}"')
+        expr = " and ".join(clauses) or None
+        hits = self.collection.search(
+            data=[qvec], anns_field="embedding", param=search_params, limit=top_k, expr=expr, output_fields=["text"]
+        )
         results: List[str] = []
         if hits and len(hits) > 0:
             for hit in hits[0]:
@@ -166,29 +633,59 @@ class _MilvusMemoryStore:
         return results
 
 
-class _ChromaMemoryStore:
+class _ChromaMemoryStore(_AsyncStoreMixin):
     """Chroma-backed vector store using sentence-transformers embeddings."""
 
-    def __init__(self, persist_dir: str, model_name: str):
-        if chromadb is None or SentenceTransformer is None:
+    def __init__(self, persist_dir: str, model_name: str, collection: str = "memories", client=None):
+        if chromadb is None or not HAVE_SENTENCE_TRANSFORMERS:
             raise RuntimeError("ChromaDB or sentence-transformers not installed. Install extras in requirements.txt")
-        self.client = chromadb.PersistentClient(path=persist_dir)
-        self.collection = self.client.get_or_create_collection(name="memories")
-        self.embedder = SentenceTransformer(model_name)
+        self.client = client or chromadb.PersistentClient(path=persist_dir)
+        self.collection = self.client.get_or_create_collection(name=collection)
+        self.model_name = model_name
+        register_sentence_transformer(model_name)
+
+    @property
+    def embedder(self):
+        # loaded on first use and shared with every other store using the same model
+        return get_sentence_transformer(self.model_name)
 
     def _embed(self, texts: List[str]) -> List[List[float]]:
-        vecs = self.embedder.encode(texts, normalize_embeddings=True).tolist()
-        return vecs
+        return _cached_encode(self.model_name, texts)
 
     def add(self, text: str, tags: List[str]) -> str:
-        mem_id = f"mem_{uuid.uuid4().hex}"
-        embeddings = self._embed([text])
-        self.collection.add(ids=[mem_id], documents=[text], embeddings=embeddings, metadatas=[{"tags": tags}])
-        return mem_id
+        return self.add_many([text], tags)[0]
+
+    def add_many(self, texts: List[str], tags: List[str]) -> List[str]:
+        ids: List[str] = []
+        for batch in _batches(texts, settings.EMBEDDING_BATCH_SIZE):
+            batch_ids = [f"mem_{uuid.uuid4().hex}" for _ in batch]
+            self.collection.add(
+                ids=batch_ids,
+                documents=batch,
+                embeddings=self._embed(batch),
+                metadatas=[self._metadata(tags) for _ in batch],
+            )
+            ids.extend(batch_ids)
+        return ids
 
-    def retrieve(self, query: str, top_k: int = 5) -> List[str]:
+    @staticmethod
+    def _metadata(tags: List[str]) -> dict:
+        # Chroma metadata values are scalars: keep the joined list for display
+        # and one boolean flag per tag for `where` filters
+        meta = {f"tag:{t}": True for t in tags or [] if t}
+        meta["tags"] = ",".join(tags or [])
+        return meta
+
+    def flush(self) -> None:
+        # PersistentClient writes through on every add
+        pass
+
+    def retrieve(
+        self, query: str, top_k: int = 5, tags: Optional[List[str]] = None, source: Optional[str] = None
+    ) -> List[str]:
         qvec = self._embed([query])[0]
-        res = self.collection.query(query_embeddings=[qvec], n_results=top_k)
+        where = _chroma_where(_filter_tags(tags, source))
+        res = self.collection.query(query_embeddings=[qvec], n_results=top_k, where=where)
         docs = (res.get("documents") or [[]])[0]
         return [d for d in docs if isinstance(d, str)]
 
@@ -200,6 +697,8 @@ def _make_store():
             return _ChromaMemoryStore(settings.CHROMA_DIR, settings.EMBEDDING_MODEL_NAME)
         except Exception:
             return _FileMemoryStore(settings.MEMORY_FILE)
+    if backend == "ann":
+        return _IVFMemoryStore(settings.MEMORY_FILE)
     if backend == "milvus":
         try:
             return _MilvusMemoryStore()
@@ -209,3 +708,101 @@ def _make_store():
 
 
 memory_store = _make_store()
+
+
+def tenant_key(user_id: str) -> str:
+    """Fixed-width, path- and collection-name-safe key for a user id."""
+    return hashlib.sha1(user_id.encode("utf-8")).hexdigest()
+
+
+def tenant_memory_path(user_id: str) -> str:
+    """File-store segments of one user: tenants/<2 hex>/<sha1>/memory.jsonl next to MEMORY_FILE."""
+    key = tenant_key(user_id)
+    return os.path.join(os.path.dirname(settings.MEMORY_FILE), "tenants", key[:2], key, os.path.basename(settings.MEMORY_FILE))
+
+
+def _close_store(store) -> None:
+    close = getattr(store, "close", None)
+    if close is not None:
+        close()
+
+
+class _TenantStores:
+    """Per-user memory stores, opened on demand and kept in a bounded LRU.
+
+    Each user's memories live in their own store (file segments, Chroma
+    collection or Milvus partition), so a query only touches that user's
+    data. Callers `acquire` a store and `release` it when done. Stores are
+    opened outside the registry lock, so a slow open (collection I/O, a
+    Milvus connection) only delays that user. Only idle stores are evicted,
+    so there is never more than one open instance per user. At most
+    `max_open` idle stores stay open; an evicted file store closes its
+    descriptors and is reopened from its segments on next use.
+    """
+
+    def __init__(self, factory: Callable[[str], object], max_open: int = 64):
+        self.factory = factory
+        self.max_open = max(1, max_open)
+        self._pool: RefCountedLRU[Any] = RefCountedLRU(factory, _close_store, self.max_open)
+
+    def acquire(self, user_id: str):
+        return self._pool.acquire(user_id)
+
+    def release(self, user_id: str) -> None:
+        self._pool.release(user_id)
+
+    def open_tenants(self) -> int:
+        return len(self._pool)
+
+    def close(self) -> None:
+        self._pool.close()
+
+
+_milvus_tenants: Optional[_MilvusMemoryStore] = None
+
+
+def _make_tenant_store(user_id: str):
+    """A store for one user on the same kind of backend as `memory_store`."""
+    global _milvus_tenants
+    default = memory_store
+    if isinstance(default, _ChromaMemoryStore):
+        return _ChromaMemoryStore(
+            settings.CHROMA_DIR, default.model_name, collection=f"memories_{tenant_key(user_id)}", client=default.client
+        )
+    if isinstance(default, _MilvusMemoryStore):
+        # every tenant shares one partition-keyed collection; the default one is left as is
+        if _milvus_tenants is None:
+            _milvus_tenants = _MilvusMemoryStore(f"{settings.MILVUS_COLLECTION}_tenants", partition_key=True)
+        return _milvus_tenants.scoped(tenant_key(user_id))
+    if isinstance(default, _IVFMemoryStore):
+        return _IVFMemoryStore(tenant_memory_path(user_id))
+    return _FileMemoryStore(tenant_memory_path(user_id))
+
+
+tenant_stores = _TenantStores(_make_tenant_store, settings.TENANT_MAX_OPEN)
+
+
+@contextmanager
+def memory_store_for(user_id: Optional[str] = None) -> Iterator[Any]:
+    """The memory store for `user_id`, held open for the block; the shared `memory_store` without a user."""
+    if not user_id:
+        yield memory_store
+        return
+    store = tenant_stores.acquire(user_id)
+    try:
+        yield store
+    finally:
+        tenant_stores.release(user_id)
+
+
+@asynccontextmanager
+async def use_memory_store(user_id: Optional[str] = None) -> AsyncIterator[Any]:
+    if not user_id:
+        yield memory_store
+        return
+    # opening a user's store may touch disk or the vector DB
+    store = await run_blocking(tenant_stores.acquire, user_id)
+    try:
+        yield store
+    finally:
+        await run_blocking(tenant_stores.release, user_id)
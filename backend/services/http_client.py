@@ -0,0 +1,64 @@
+import asyncio
+import weakref
+from typing import Any, Optional, Tuple
+
+import httpx
+
+from config import settings
+
+# HTTP/2 needs the optional `h2` package (pip install "httpx[http2]")
+try:
+    import h2  # type: ignore  # noqa: F401
+
+    HAVE_HTTP2 = True
+except Exception:
+    HAVE_HTTP2 = False
+
+
+class AsyncHTTPPool:
+    """Shared, pooled `httpx.AsyncClient` for the model and TTS backends.
+
+    One client is kept per running event loop (connections cannot cross loops),
+    with pool size and keep-alive from settings and HTTP/2 when `h2` is
+    installed. Per-backend timeouts are passed on each request.
+    """
+
+    def __init__(self):
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[httpx.AsyncClient, Any]]" = weakref.WeakKeyDictionary()
+        # tests may inject an httpx.MockTransport / ASGITransport here
+        self.transport: Optional[httpx.AsyncBaseTransport] = None
+
+    def client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client, transport = self._clients.get(loop, (None, None))
+        if client is None or client.is_closed or transport is not self.transport:
+            client = self._new_client()
+            self._clients[loop] = (client, self.transport)
+        return client
+
+    def _new_client(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        )
+        kwargs = {"limits": limits, "timeout": httpx.Timeout(60.0)}
+        if self.transport is not None:
+            kwargs["transport"] = self.transport
+        else:
+            kwargs["http2"] = settings.HTTP_HTTP2 and HAVE_HTTP2
+        return httpx.AsyncClient(**kwargs)
+
+    async def aclose(self) -> None:
+        """Close the client owned by the current loop (call on app shutdown)."""
+        client, _transport = self._clients.pop(asyncio.get_running_loop(), (None, None))
+        if client is not None:
+            await client.aclose()
+
+
+def backend_timeout(seconds: float) -> httpx.Timeout:
+    # connecting should fail fast even when generation is allowed to take long
+    return httpx.Timeout(seconds, connect=min(seconds, settings.HTTP_CONNECT_TIMEOUT))
+
+
+http_pool = AsyncHTTPPool()
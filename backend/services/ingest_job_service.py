@@ -0,0 +1,168 @@
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Dict, List, Optional
+
+from config import settings
+from services.ingestion_service import ingest_stream, iter_file_chunks, flush_memory_store
+
+
+class _CountingReader:
+    """File wrapper that reports every read to a callback, for byte-level progress."""
+
+    def __init__(self, f: BinaryIO, on_read):
+        self._f = f
+        self._on_read = on_read
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._f.read(size)
+        if data:
+            self._on_read(len(data))
+        return data
+
+
+class IngestJobService:
+    """Background ingestion jobs processed by a bounded worker pool.
+
+    Uploads are spooled to disk under `DATA_DIR/ingest_jobs/<job_id>` and each
+    file is ingested on a pool thread, so requests return immediately and the
+    event loop stays free for `/chat`.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers or settings.INGEST_WORKERS), thread_name_prefix="ingest")
+
+    def job_dir(self, job_id: str) -> str:
+        return os.path.join(settings.DATA_DIR, "ingest_jobs", job_id)
+
+    def create_job(self, source: Optional[str], tags: List[str], user_id: Optional[str] = None) -> str:
+        job_id = f"ing_{uuid.uuid4().hex}"
+        job_dir = self.job_dir(job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        with self._lock:
+            self.jobs[job_id] = {
+                "status": "queued",
+                "dir": job_dir,
+                "source": source,
+                "tags": tags,
+                "user_id": user_id,
+                "files": [],
+                "bytes_total": 0,
+                "bytes_done": 0,
+                "chunks_done": 0,
+                "files_done": 0,
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+            }
+        return job_id
+
+    def stage_file(self, job_id: str, fileobj: BinaryIO, filename: str) -> None:
+        """Copy an upload into the job directory before the request closes it."""
+        index = len(self.jobs[job_id]["files"])
+        path = os.path.join(self.jobs[job_id]["dir"], f"{index:05d}_{os.path.basename(filename or 'upload')}")
+        with open(path, "wb") as out:
+            shutil.copyfileobj(fileobj, out, settings.INGEST_READ_CHUNK_BYTES)
+        size = os.path.getsize(path)
+        with self._lock:
+            job = self.jobs[job_id]
+            job["files"].append({"filename": filename, "path": path, "size": size, "status": "queued", "kind": None, "chunks": 0})
+            job["bytes_total"] += size
+
+    def submit(self, job_id: str) -> None:
+        with self._lock:
+            job = self.jobs[job_id]
+            pending = len(job["files"])
+        if not pending:
+            self._finish(job_id)
+            return
+        for index in range(pending):
+            self._pool.submit(self._run_file, job_id, index)
+
+    def _run_file(self, job_id: str, index: int) -> None:
+        with self._lock:
+            job = self.jobs[job_id]
+            entry = job["files"][index]
+            if job["status"] == "queued":
+                job["status"] = "running"
+                job["started_at"] = time.time()
+            entry["status"] = "running"
+            source, tags, user_id = job["source"], list(job["tags"]), job["user_id"]
+
+        def on_read(n: int) -> None:
+            with self._lock:
+                job["bytes_done"] += n
+
+        def on_batch(ids: List[str]) -> None:
+            with self._lock:
+                job["chunks_done"] += len(ids)
+                entry["chunks"] += len(ids)
+
+        try:
+            with open(entry["path"], "rb") as f:
+                kind, _ids = ingest_stream(
+                    iter_file_chunks(_CountingReader(f, on_read)), entry["filename"], source, tags, on_batch, user_id
+                )
+            with self._lock:
+                entry["kind"] = kind
+                entry["status"] = "completed"
+        except Exception as e:
+            with self._lock:
+                entry["status"] = f"failed: {e}"
+        finally:
+            try:
+                os.remove(entry["path"])
+            except Exception:
+                pass
+            with self._lock:
+                job["files_done"] += 1
+                last = job["files_done"] == len(job["files"])
+            if last:
+                self._finish(job_id)
+
+    def _finish(self, job_id: str) -> None:
+        try:
+            flush_memory_store(self.jobs[job_id]["user_id"])
+            error = None
+        except Exception as e:
+            error = e
+        with self._lock:
+            job = self.jobs[job_id]
+            failed = [f for f in job["files"] if f["status"] != "completed"]
+            if error is not None:
+                job["status"] = f"failed: {error}"
+            elif failed and len(failed) == len(job["files"]):
+                job["status"] = "failed"
+            else:
+                job["status"] = "completed"
+            job["finished_at"] = time.time()
+            job_dir = job["dir"]
+        shutil.rmtree(job_dir, ignore_errors=True)
+
+    def status(self, job_id: str) -> Dict[str, Any]:
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return {"status": "not_found"}
+            snap = {k: v for k, v in job.items() if k != "dir"}
+            snap["files"] = [{k: v for k, v in f.items() if k != "path"} for f in job["files"]]
+        started = snap["started_at"]
+        end = snap["finished_at"] or time.time()
+        elapsed = (end - started) if started else 0.0
+        snap["elapsed_sec"] = round(elapsed, 3)
+        snap["chunks_per_sec"] = round(snap["chunks_done"] / elapsed, 2) if elapsed > 0 else 0.0
+        snap["eta_sec"] = None
+        if snap["finished_at"]:
+            snap["eta_sec"] = 0.0
+        elif elapsed > 0 and snap["bytes_done"] > 0:
+            rate = snap["bytes_done"] / elapsed
+            snap["eta_sec"] = round((snap["bytes_total"] - snap["bytes_done"]) / rate, 2)
+        return snap
+
+
+ingest_job_service = IngestJobService()
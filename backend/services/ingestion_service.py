@@ -1,12 +1,13 @@
 import io
-import json
 import os
-from typing import List, Tuple
+from typing import Any, BinaryIO, Callable, Iterable, Iterator, List, Tuple
 
 from config import settings
-from services.embedding_service import memory_store
+from services import embedding_service
 from services.whisper_service import whisper_service
-from utils.cleaning_utils import clean_text, chunk_text
+from utils.dedup import get_fingerprint_index
+from utils.cleaning_utils import clean_text, chunk_text, iter_clean_chunks
+from utils.stream_utils import iter_decoded, iter_json_items
 
 
 TEXT_EXTS = {".txt", ".md"}
@@ -14,86 +15,187 @@ JSON_EXTS = {".json"}
 AUDIO_EXTS = {".wav", ".mp3", ".m4a", ".ogg"}
 IMAGE_EXTS = {".png", ".jpg", ".jpeg", ".webp"}
 
+BatchCallback = Callable[[List[str]], None]
+
 
 def _ext(path: str) -> str:
     _, ext = os.path.splitext(path.lower())
     return ext
 
 
-def _ingest_text_content(raw: str, tags: List[str]) -> List[str]:
-    cleaned = clean_text(raw)
-    chunks = chunk_text(cleaned)
+def _chunk_content(raw: str) -> List[str]:
+    return [ch for ch in chunk_text(clean_text(raw)) if ch]
+
+
+def _fingerprint_path(user_id: str | None = None) -> str:
+    # one index per backend (and per user), next to the file store, so switching backends starts clean
+    backend = (settings.VECTOR_BACKEND or "file").lower()
+    root = os.path.dirname(embedding_service.tenant_memory_path(user_id) if user_id else settings.MEMORY_FILE)
+    return os.path.join(root, f"{backend}.fingerprints.bin")
+
+
+def _ingest_chunks(chunks: List[str], tags: List[str], user_id: str | None = None) -> List[str]:
+    # resolved at call time so a rebound memory_store (tests, reconfiguration) is honoured
+    if not chunks:
+        return []
+    with embedding_service.memory_store_for(user_id) as store:
+        return _store_unique(store, chunks, tags, user_id)
+
+
+def _store_unique(store, chunks: List[str], tags: List[str], user_id: str | None) -> List[str]:
+    if not settings.DEDUP_ENABLED:
+        return store.add_many(chunks, tags)
+    index = get_fingerprint_index(_fingerprint_path(user_id), settings.DEDUP_NEAR_DISTANCE, settings.TENANT_MAX_OPEN)
+    # scoped by tags (which carry the source): a known text under a new source is still stored
+    keep, prints = index.claim(chunks, tags)
+    if not keep:
+        return []
+    try:
+        ids = store.add_many([chunks[i] for i in keep], tags)
+    except Exception:
+        index.release(prints)
+        raise
+    index.commit(prints)
+    return ids
+
+
+def _ingest_text_content(raw: str, tags: List[str], user_id: str | None = None) -> List[str]:
+    return _ingest_chunks(_chunk_content(raw), tags, user_id)
+
+
+def _ingest_chunk_stream(
+    chunks: Iterable[str], tags: List[str], on_batch: BatchCallback | None = None, user_id: str | None = None
+) -> List[str]:
+    """Drain a chunk generator into the store, holding at most one embedding batch."""
     ids: List[str] = []
+    batch: List[str] = []
     for ch in chunks:
-        if ch:
-            mem_id = memory_store.add(ch, tags)
-            ids.append(mem_id)
+        batch.append(ch)
+        if len(batch) >= settings.EMBEDDING_BATCH_SIZE:
+            ids += _store_batch(batch, tags, on_batch, user_id)
+            batch = []
+    ids += _store_batch(batch, tags, on_batch, user_id)
     return ids
 
 
-def ingest_text_file(data: bytes, filename: str, source: str | None, tags: List[str]) -> List[str]:
-    try:
-        text = data.decode("utf-8", errors="ignore")
-    except Exception:
-        text = ""
+def _store_batch(batch: List[str], tags: List[str], on_batch: BatchCallback | None, user_id: str | None = None) -> List[str]:
+    ids = _ingest_chunks(batch, tags, user_id)
+    if on_batch is not None and ids:
+        on_batch(ids)
+    return ids
+
+
+def _item_text(it: Any) -> str:
+    # simple conventions: {messages:[{text:...}]}, or {chats:[{content:...}]}
+    if isinstance(it, str):
+        return it
+    if isinstance(it, dict):
+        t = it.get("text") or it.get("content") or ""
+        if isinstance(t, str):
+            return t
+        if isinstance(t, list):
+            # telegram exports sometimes have rich parts list
+            return " ".join(p for p in t if isinstance(p, str))
+    return ""
+
+
+def iter_file_chunks(fileobj: BinaryIO, size: int | None = None) -> Iterator[bytes]:
+    size = size or settings.INGEST_READ_CHUNK_BYTES
+    while True:
+        chunk = fileobj.read(size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def ingest_text_stream(
+    chunks: Iterable[bytes],
+    filename: str,
+    source: str | None,
+    tags: List[str],
+    on_batch: BatchCallback | None = None,
+    user_id: str | None = None,
+) -> List[str]:
     tags_all = tags + ([source] if source else [])
-    return _ingest_text_content(text, tags_all)
+    return _ingest_chunk_stream(iter_clean_chunks(iter_decoded(chunks)), tags_all, on_batch, user_id)
 
 
-def ingest_json_file(data: bytes, filename: str, source: str | None, tags: List[str]) -> List[str]:
+def ingest_json_stream(
+    chunks: Iterable[bytes],
+    filename: str,
+    source: str | None,
+    tags: List[str],
+    on_batch: BatchCallback | None = None,
+    user_id: str | None = None,
+) -> List[str]:
     tags_all = tags + ([source] if source else [])
-    try:
-        obj = json.loads(data.decode("utf-8", errors="ignore"))
-    except Exception:
-        return []
-    texts: List[str] = []
-    # simple conventions: {messages:[{text:...}]}, or {chats:[{content:...}]}
-    if isinstance(obj, dict):
-        arr = obj.get("messages") or obj.get("chats") or []
-        if isinstance(arr, list):
-            for it in arr:
-                if isinstance(it, dict):
-                    t = it.get("text") or it.get("content") or ""
-                    if isinstance(t, str):
-                        texts.append(t)
-                    elif isinstance(t, list):
-                        # telegram exports sometimes have rich parts list
-                        parts = [p for p in t if isinstance(p, str)]
-                        texts.append(" ".join(parts))
-    elif isinstance(obj, list):
-        for it in obj:
-            if isinstance(it, str):
-                texts.append(it)
-            elif isinstance(it, dict):
-                t = it.get("text") or it.get("content") or ""
-                if isinstance(t, str):
-                    texts.append(t)
-    ids: List[str] = []
-    for t in texts:
-        ids += _ingest_text_content(t, tags_all)
-    return ids
+    texts = (_item_text(it) for it in iter_json_items(chunks, keys=("messages", "chats")))
+    return _ingest_chunk_stream((ch for t in texts if t for ch in _chunk_content(t)), tags_all, on_batch, user_id)
+
+
+def ingest_text_file(data: bytes, filename: str, source: str | None, tags: List[str], user_id: str | None = None) -> List[str]:
+    return ingest_text_stream([data], filename, source, tags, user_id=user_id)
+
 
+def ingest_json_file(data: bytes, filename: str, source: str | None, tags: List[str], user_id: str | None = None) -> List[str]:
+    return ingest_json_stream([data], filename, source, tags, user_id=user_id)
 
-def ingest_audio_file(data: bytes, filename: str, source: str | None, tags: List[str]) -> List[str]:
-    transcript, _conf, _lang = whisper_service.transcribe.__wrapped__(whisper_service, data, filename)  # type: ignore
+
+def ingest_audio_file(data: bytes, filename: str, source: str | None, tags: List[str], user_id: str | None = None) -> List[str]:
+    transcript, _conf, _lang = whisper_service.transcribe_sync(data, filename)
     tags_all = tags + ([source] if source else [])
-    return _ingest_text_content(transcript, tags_all)
+    return _ingest_text_content(transcript, tags_all, user_id)
 
 
-def ingest_image_file(data: bytes, filename: str, source: str | None, tags: List[str]) -> List[str]:
+def ingest_image_file(data: bytes, filename: str, source: str | None, tags: List[str], user_id: str | None = None) -> List[str]:
     # For now, skip image OCR; placeholder returns empty list
     return []
 
 
-def ingest_any(data: bytes, filename: str, source: str | None, tags: List[str]) -> Tuple[str, List[str]]:
+def ingest_any(
+    data: bytes, filename: str, source: str | None, tags: List[str], user_id: str | None = None
+) -> Tuple[str, List[str]]:
     ext = _ext(filename)
     if ext in TEXT_EXTS:
-        return "text", ingest_text_file(data, filename, source, tags)
+        return "text", ingest_text_file(data, filename, source, tags, user_id)
     if ext in JSON_EXTS:
-        return "json", ingest_json_file(data, filename, source, tags)
+        return "json", ingest_json_file(data, filename, source, tags, user_id)
     if ext in AUDIO_EXTS:
-        return "audio", ingest_audio_file(data, filename, source, tags)
+        return "audio", ingest_audio_file(data, filename, source, tags, user_id)
     if ext in IMAGE_EXTS:
-        return "image", ingest_image_file(data, filename, source, tags)
+        return "image", ingest_image_file(data, filename, source, tags, user_id)
     # default: try text decode
-    return "unknown", ingest_text_file(data, filename, source, tags)
+    return "unknown", ingest_text_file(data, filename, source, tags, user_id)
+
+
+def ingest_stream(
+    chunks: Iterable[bytes],
+    filename: str,
+    source: str | None,
+    tags: List[str],
+    on_batch: BatchCallback | None = None,
+    user_id: str | None = None,
+) -> Tuple[str, List[str]]:
+    """Like `ingest_any`, but text and JSON uploads are parsed and embedded as they are read.
+
+    `on_batch` is called with the ids of every stored batch, e.g. to report progress.
+    With a `user_id` the chunks go to that user's memory store.
+    """
+    ext = _ext(filename)
+    if ext in TEXT_EXTS:
+        return "text", ingest_text_stream(chunks, filename, source, tags, on_batch, user_id)
+    if ext in JSON_EXTS:
+        return "json", ingest_json_stream(chunks, filename, source, tags, on_batch, user_id)
+    if ext in AUDIO_EXTS or ext in IMAGE_EXTS:
+        # whisper needs the whole clip
+        kind, ids = ingest_any(b"".join(chunks), filename, source, tags, user_id)
+        if on_batch is not None and ids:
+            on_batch(ids)
+        return kind, ids
+    return "unknown", ingest_text_stream(chunks, filename, source, tags, on_batch, user_id)
+
+
+def flush_memory_store(user_id: str | None = None) -> None:
+    """Make everything ingested so far durable; call once per ingest request."""
+    with embedding_service.memory_store_for(user_id) as store:
+        store.flush()
@@ -0,0 +1,234 @@
+import json
+import os
+import threading
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.append_writer import open_append, write_all
+
+_ASSIGN_BATCH = 65536
+
+
+def auto_nlist(count: int) -> int:
+    """Rule-of-thumb list count: about 4 * sqrt(n), clipped to [16, 65536]."""
+    return int(min(65536, max(16, 4 * np.sqrt(max(count, 1)))))
+
+
+def nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Closest centroid (max inner product on unit vectors) for every row."""
+    out = np.empty(len(vectors), dtype=np.uint32)
+    for start in range(0, len(vectors), _ASSIGN_BATCH):
+        block = np.asarray(vectors[start:start + _ASSIGN_BATCH], dtype=np.float32)
+        out[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def train_centroids(sample: np.ndarray, nlist: int, iters: int, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on unit vectors; empty clusters are re-seeded from the sample."""
+    rng = np.random.default_rng(seed)
+    nlist = min(nlist, len(sample))
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+    for _ in range(iters):
+        assign = nearest(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        counts = np.bincount(assign, minlength=nlist)
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()), replace=False)]
+        centroids = sums / (np.linalg.norm(sums, axis=1, keepdims=True) + 1e-8)
+    return centroids.astype(np.float32)
+
+
+Lists = List[List[np.ndarray]]
+
+
+def _build_lists(assign: np.ndarray, nlist: int) -> Lists:
+    order = np.argsort(assign, kind="stable")
+    bounds = np.searchsorted(assign[order], np.arange(nlist + 1))
+    return [[order[bounds[c]:bounds[c + 1]].astype(np.int64)] for c in range(nlist)]
+
+
+class IVFBuild:
+    """Centroids and lists trained on the first `rows` rows, not yet installed."""
+
+    def __init__(self, centroids: np.ndarray, lists: Lists, rows: int):
+        self.centroids = centroids
+        self.lists = lists
+        self.rows = rows
+
+
+class IVFIndex:
+    """Inverted-file (IVF-flat) index over the rows of a vector segment.
+
+    Rows are bucketed by their nearest centroid; a query scores the centroids,
+    probes the `nprobe` closest lists and returns their row ids as candidates
+    for exact scoring. Files next to the store's base path:
+
+    - ``<base>.ivf.json``: list count and the row count it was trained on
+    - ``<base>.ivf.centroids.f32``: unit-length centroids, replaced atomically
+    - ``<base>.ivf.assign.u32``: list id of every row, appended as rows arrive
+
+    Until `train_min` rows exist the index stays untrained and callers fall
+    back to an exact scan. It retrains once the store has grown
+    `retrain_factor` times past the size it was trained on.
+
+    Training is split so the expensive part can run off the writer thread:
+    `build` clusters and assigns a snapshot of the rows, `install` assigns the
+    rows appended since and publishes the new centroids and lists together.
+    Queries read one `(centroids, lists)` snapshot, so they never pair new
+    centroids with old lists.
+    """
+
+    def __init__(
+        self,
+        base: str,
+        nlist: int = 0,
+        nprobe: int = 8,
+        train_min: int = 4096,
+        train_sample: int = 65536,
+        train_iters: int = 10,
+        retrain_factor: float = 8.0,
+    ):
+        self.meta_path = base + ".ivf.json"
+        self.centroids_path = base + ".ivf.centroids.f32"
+        self.assign_path = base + ".ivf.assign.u32"
+        self.nlist = nlist
+        self.nprobe = max(1, nprobe)
+        self.train_min = train_min
+        self.train_sample = train_sample
+        self.train_iters = train_iters
+        self.retrain_factor = retrain_factor
+        self._lock = threading.Lock()
+        self._state: Optional[Tuple[np.ndarray, Lists]] = None
+        self.trained_rows = 0
+        self.rows = 0
+        self._fd: Optional[int] = None
+
+    @property
+    def centroids(self) -> Optional[np.ndarray]:
+        state = self._state
+        return state[0] if state is not None else None
+
+    @property
+    def trained(self) -> bool:
+        return self._state is not None
+
+    def open(self, count: int, vectors: Callable[[], np.ndarray]) -> None:
+        """Load persisted centroids and assignments, assigning rows added since."""
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            nlist = int(meta["nlist"])
+            centroids = np.fromfile(self.centroids_path, dtype=np.float32).reshape(nlist, -1)
+            trained_rows = int(meta.get("trained_rows", 0))
+        except Exception:
+            self._state = None
+            return
+        assign = np.fromfile(self.assign_path, dtype=np.uint32) if os.path.exists(self.assign_path) else np.zeros(0, np.uint32)
+        if len(assign) > count:
+            # rows lost in a torn append; their assignments go too
+            assign = assign[:count]
+            with open(self.assign_path, "r+b") as f:
+                f.truncate(count * 4)
+        with self._lock:
+            self._state = (centroids, _build_lists(assign, len(centroids)))
+            self.trained_rows = trained_rows
+            self.rows = len(assign)
+        if len(assign) < count:
+            self.add(vectors()[len(assign):count])
+
+    def build(self, vectors: np.ndarray) -> IVFBuild:
+        """Train centroids on (a sample of) `vectors` and assign every row; touches no live state."""
+        count = len(vectors)
+        rng = np.random.default_rng(count)
+        sample_idx = np.sort(rng.choice(count, size=min(count, self.train_sample), replace=False))
+        sample = np.asarray(vectors[sample_idx], dtype=np.float32)
+        nlist = self.nlist or auto_nlist(count)
+        centroids = train_centroids(sample, nlist, self.train_iters)
+        assign = nearest(vectors, centroids)
+        for path, data in ((self.centroids_path, centroids), (self.assign_path, assign)):
+            with open(path + ".tmp", "wb") as f:
+                f.write(data.tobytes())
+        return IVFBuild(centroids, _build_lists(assign, len(centroids)), count)
+
+    def install(self, build: IVFBuild, vectors: np.ndarray) -> None:
+        """Publish `build`, first assigning the rows of `vectors` appended after it was taken."""
+        count = len(vectors)
+        lists = build.lists
+        tail = nearest(vectors[build.rows:count], build.centroids) if count > build.rows else np.zeros(0, np.uint32)
+        if len(tail):
+            with open(self.assign_path + ".tmp", "ab") as f:
+                f.write(tail.tobytes())
+            _append_to_lists(lists, tail, build.rows)
+        # write the new files first, then publish the manifest that points at them
+        with self._lock:
+            self._close_fd()
+            for path in (self.centroids_path, self.assign_path):
+                os.replace(path + ".tmp", path)
+            tmp = self.meta_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"nlist": len(build.centroids), "trained_rows": build.rows}, f)
+            os.replace(tmp, self.meta_path)
+            self._state = (build.centroids, lists)
+            self.trained_rows = build.rows
+            self.rows = count
+
+    def train(self, vectors: np.ndarray) -> None:
+        """Build and install in one go (benchmarks, tools)."""
+        self.install(self.build(vectors), vectors)
+
+    def needs_training(self, count: int) -> bool:
+        if not self.trained:
+            return count >= self.train_min
+        return count >= self.trained_rows * self.retrain_factor
+
+    def add(self, vectors: np.ndarray) -> None:
+        """Assign freshly appended rows (in row order) to their lists."""
+        state = self._state
+        if state is None or len(vectors) == 0:
+            return
+        assign = nearest(vectors, state[0])
+        with self._lock:
+            if self._fd is None:
+                self._fd = open_append(self.assign_path)
+            write_all(self._fd, assign.tobytes())
+            _append_to_lists(state[1], assign, self.rows)
+            self.rows += len(assign)
+
+    def candidates(self, q: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """Row ids in the `nprobe` lists whose centroids are closest to `q`."""
+        centroids, lists = self._state
+        nprobe = min(nprobe or self.nprobe, len(centroids))
+        scores = centroids @ q
+        probe = np.argpartition(scores, -nprobe)[-nprobe:] if nprobe < len(scores) else np.arange(len(scores))
+        parts: List[np.ndarray] = []
+        for c in probe:
+            chunks = lists[int(c)]
+            if len(chunks) > 8:
+                # compact lists that grew through many small inserts
+                with self._lock:
+                    chunks = lists[int(c)]
+                    merged = np.concatenate(chunks)
+                    lists[int(c)] = chunks = [merged]
+            parts.extend(chunks)
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def _close_fd(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_fd()
+
+
+def _append_to_lists(lists: Lists, assign: np.ndarray, start: int) -> None:
+    ids = np.arange(start, start + len(assign), dtype=np.int64)
+    order = np.argsort(assign, kind="stable")
+    sorted_assign = assign[order]
+    for c in np.unique(sorted_assign):
+        lo, hi = np.searchsorted(sorted_assign, [c, c + 1])
+        lists[int(c)].append(ids[order[lo:hi]])
@@ -0,0 +1,82 @@
+import asyncio
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Generic, List, Optional, Set, Tuple, TypeVar
+
+I = TypeVar("I")
+O = TypeVar("O")
+
+
+class _Pending(Generic[I, O]):
+    def __init__(self):
+        self.items: List[Tuple[I, "asyncio.Future[O]"]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        # the loop only holds tasks weakly; keep in-flight batches alive until they finish
+        self.tasks: Set["asyncio.Task[None]"] = set()
+
+
+class MicroBatcher(Generic[I, O]):
+    """Collect concurrent single-item calls into batched calls.
+
+    Items wait at most `window_ms` for companions; a batch is sent as soon as
+    it reaches `max_batch`. `send_batch` receives the items in arrival order
+    and must return one result per item, which is fanned back out to the
+    callers. If the batch call fails, every caller in it gets the exception.
+    """
+
+    def __init__(self, send_batch: Callable[[List[I]], Awaitable[List[O]]], max_batch: int = 16, window_ms: float = 10.0):
+        self.send_batch = send_batch
+        self.max_batch = max(1, max_batch)
+        self.window = max(0.0, window_ms) / 1000.0
+        self._pending: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _Pending[I, O]]" = weakref.WeakKeyDictionary()
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, item: I) -> O:
+        loop = asyncio.get_running_loop()
+        pending = self._pending.get(loop)
+        if pending is None:
+            pending = self._pending[loop] = _Pending()
+        fut: "asyncio.Future[O]" = loop.create_future()
+        pending.items.append((item, fut))
+        if len(pending.items) >= self.max_batch:
+            self._dispatch(loop, pending)
+        elif pending.timer is None:
+            pending.timer = loop.call_later(self.window, self._dispatch, loop, pending)
+        return await fut
+
+    def _dispatch(self, loop: asyncio.AbstractEventLoop, pending: "_Pending[I, O]") -> None:
+        if pending.timer is not None:
+            pending.timer.cancel()
+            pending.timer = None
+        batch, pending.items = pending.items[: self.max_batch], pending.items[self.max_batch :]
+        if pending.items:
+            pending.timer = loop.call_later(self.window, self._dispatch, loop, pending)
+        # callers that gave up while waiting are dropped from the batch
+        batch = [(item, fut) for item, fut in batch if not fut.done()]
+        if batch:
+            task = loop.create_task(self._run(batch))
+            pending.tasks.add(task)
+            task.add_done_callback(pending.tasks.discard)
+
+    async def _run(self, batch: List[Tuple[I, "asyncio.Future[O]"]]) -> None:
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            results = await self.send_batch([item for item, _fut in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"batch returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            for _item, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_item, fut), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+        }
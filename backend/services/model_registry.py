@@ -0,0 +1,140 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+Loader = Callable[[], Any]
+
+
+def _rss_bytes() -> int:
+    """Resident set size of this process, 0 where it can't be read."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        pass
+    try:
+        import resource
+
+        # peak, not current, off Linux; still a usable upper bound per load
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except Exception:
+        return 0
+
+
+class _Entry:
+    def __init__(self, loader: Loader):
+        self.loader = loader
+        self.lock = threading.Lock()
+        self.model: Any = None
+        self.status = "unloaded"  # unloaded | loading | ready | failed
+        self.error: Optional[BaseException] = None
+        self.load_sec: Optional[float] = None
+        self.rss_delta: Optional[int] = None
+
+
+class ModelRegistry:
+    """Process-wide, lazily loaded models shared by every caller.
+
+    A model is loaded on the first `get`, exactly once even under concurrent
+    callers, and the same instance is handed to everyone afterwards. A failed
+    load is remembered and re-raised instead of retried on every request.
+    `warm_up` loads models on a background thread so the app can start
+    serving before they are ready; `snapshot` reports status, load time and
+    the RSS growth observed while each model loaded (approximate when loads
+    overlap).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _Entry] = {}
+        self._warmup: List[str] = []
+
+    def register(self, name: str, loader: Loader) -> None:
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = _Entry(loader)
+
+    def get(self, name: str) -> Any:
+        entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"model {name!r} is not registered")
+        if entry.status == "ready":
+            return entry.model
+        with entry.lock:
+            if entry.status == "ready":
+                return entry.model
+            if entry.status == "failed" and entry.error is not None:
+                raise entry.error
+            entry.status = "loading"
+            rss0, t0 = _rss_bytes(), time.perf_counter()
+            try:
+                entry.model = entry.loader()
+            except BaseException as e:
+                entry.status, entry.error = "failed", e
+                raise
+            entry.load_sec = round(time.perf_counter() - t0, 3)
+            entry.rss_delta = max(0, _rss_bytes() - rss0)
+            entry.status = "ready"
+            return entry.model
+
+    def is_loaded(self, name: str) -> bool:
+        entry = self._entries.get(name)
+        return entry is not None and entry.status == "ready"
+
+    def warm_up(self, names: Iterable[str], background: bool = True) -> Optional[threading.Thread]:
+        names = [n for n in names if n in self._entries]
+        self._warmup.extend(n for n in names if n not in self._warmup)
+
+        def run():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception:
+                    pass  # reported through snapshot()
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def ready(self) -> bool:
+        """True once every model requested for warm-up has finished loading (or failed)."""
+        return all(self._entries[n].status in ("ready", "failed") for n in self._warmup)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            name: {
+                "status": e.status,
+                "load_sec": e.load_sec,
+                "rss_mb": round(e.rss_delta / (1 << 20), 1) if e.rss_delta is not None else None,
+                "error": repr(e.error) if e.error is not None else None,
+            }
+            for name, e in list(self._entries.items())
+        }
+
+
+model_registry = ModelRegistry()
+
+
+def sentence_transformer_key(model_name: str) -> str:
+    return f"sentence-transformers:{model_name}"
+
+
+def register_sentence_transformer(model_name: str) -> str:
+    """Register a SentenceTransformer loader and return its registry key."""
+    key = sentence_transformer_key(model_name)
+
+    def load():
+        from sentence_transformers import SentenceTransformer  # type: ignore
+
+        return SentenceTransformer(model_name)
+
+    model_registry.register(key, load)
+    return key
+
+
+def get_sentence_transformer(model_name: str) -> Any:
+    return model_registry.get(register_sentence_transformer(model_name))
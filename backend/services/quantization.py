@@ -0,0 +1,263 @@
+import json
+import os
+import threading
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.append_writer import open_append, write_all
+
+_BLOCK = 65536
+_INT8_BLOCK = 4096  # small enough that the float32 copy stays in cache
+
+
+def _kmeans(x: np.ndarray, k: int, iters: int, rng: np.random.Generator) -> np.ndarray:
+    """Plain Euclidean Lloyd iterations; empty clusters are re-seeded from `x`."""
+    k = min(k, len(x))
+    centroids = x[rng.choice(len(x), size=k, replace=False)].copy()
+    for _ in range(iters):
+        d = (x * x).sum(1, keepdims=True) - 2 * x @ centroids.T + (centroids * centroids).sum(1)
+        assign = np.argmin(d, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, x)
+        counts = np.bincount(assign, minlength=k)
+        empty = counts == 0
+        centroids = sums / np.maximum(counts, 1)[:, None]
+        if empty.any():
+            centroids[empty] = x[rng.choice(len(x), size=int(empty.sum()), replace=False)]
+    return centroids.astype(np.float32)
+
+
+class Int8Quantizer:
+    """Per-dimension symmetric int8 scalar quantization (1 byte per dimension)."""
+
+    kind = "int8"
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.scale = np.ones(dim, dtype=np.float32)
+
+    @property
+    def code_size(self) -> int:
+        return self.dim
+
+    def train(self, sample: np.ndarray, rng: np.random.Generator) -> None:
+        # values outside the training range are clipped when encoded
+        self.scale = (np.abs(sample).max(axis=0) / 127.0 + 1e-12).astype(np.float32)
+
+    def encode(self, vecs: np.ndarray) -> np.ndarray:
+        q = np.clip(np.rint(vecs / self.scale), -127, 127).astype(np.int8)
+        return q.view(np.uint8)
+
+    def scores(self, codes: np.ndarray, q: np.ndarray) -> np.ndarray:
+        """Asymmetric inner products: float query against int8 codes."""
+        qs = (q * self.scale).astype(np.float32)
+        out = np.empty(len(codes), dtype=np.float32)
+        buf = np.empty((_INT8_BLOCK, self.dim), dtype=np.float32)
+        for start in range(0, len(codes), _INT8_BLOCK):
+            block = np.asarray(codes[start:start + _INT8_BLOCK]).view(np.int8)
+            n = len(block)
+            np.copyto(buf[:n], block, casting="unsafe")
+            out[start:start + n] = buf[:n] @ qs
+        return out
+
+    def state(self) -> np.ndarray:
+        return self.scale
+
+    def load(self, data: np.ndarray) -> None:
+        self.scale = data.reshape(self.dim).astype(np.float32)
+
+
+class PQQuantizer:
+    """Product quantization: `m` sub-vectors, 256 centroids each (1 byte per sub-vector)."""
+
+    kind = "pq"
+    KSUB = 256
+
+    def __init__(self, dim: int, m: int, iters: int = 10):
+        self.dim = dim
+        self.m = max(1, min(m, dim))
+        self.iters = iters
+        # uneven splits are fine: array_split gives the first dims one extra
+        self.splits = np.cumsum([len(p) for p in np.array_split(np.arange(dim), self.m)])[:-1]
+        self.books: List[np.ndarray] = []
+
+    @property
+    def code_size(self) -> int:
+        return self.m
+
+    def _parts(self, x: np.ndarray) -> List[np.ndarray]:
+        return np.split(x, self.splits, axis=-1)
+
+    def train(self, sample: np.ndarray, rng: np.random.Generator) -> None:
+        self.books = [_kmeans(part, self.KSUB, self.iters, rng) for part in self._parts(sample)]
+
+    def encode(self, vecs: np.ndarray) -> np.ndarray:
+        codes = np.empty((len(vecs), self.m), dtype=np.uint8)
+        for j, (part, book) in enumerate(zip(self._parts(vecs), self.books)):
+            d = -2 * part @ book.T + (book * book).sum(1)
+            codes[:, j] = np.argmin(d, axis=1)
+        return codes
+
+    def scores(self, codes: np.ndarray, q: np.ndarray) -> np.ndarray:
+        """Asymmetric distance: one lookup table per query, summed over sub-vectors."""
+        lut = np.zeros((self.m, self.KSUB), dtype=np.float32)
+        for j, (part, book) in enumerate(zip(self._parts(q), self.books)):
+            lut[j, : len(book)] = book @ part
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), _BLOCK):
+            # one contiguous 1-D gather per sub-vector beats a 2-D fancy index
+            block = np.ascontiguousarray(np.asarray(codes[start:start + _BLOCK]).T)
+            acc = np.take(lut[0], block[0])
+            for j in range(1, self.m):
+                acc += np.take(lut[j], block[j])
+            out[start:start + len(acc)] = acc
+        return out
+
+    def state(self) -> np.ndarray:
+        padded = np.zeros((self.KSUB, self.dim), dtype=np.float32)
+        col = 0
+        for book in self.books:
+            # short codebooks (tiny training sets) repeat their first centroid;
+            # argmin keeps picking the original index
+            padded[:, col:col + book.shape[1]] = book[0]
+            padded[: len(book), col:col + book.shape[1]] = book
+            col += book.shape[1]
+        return padded
+
+    def load(self, data: np.ndarray) -> None:
+        self.books = self._parts(data.reshape(self.KSUB, self.dim).astype(np.float32))
+
+
+class QuantizedCodes:
+    """Compact codes for every row of a vector segment, kept next to it.
+
+    - ``<base>.quant.json``: quantizer kind and parameters
+    - ``<base>.quant.codebook.f32``: int8 scales or PQ codebooks
+    - ``<base>.quant.codes.u8``: `code_size` bytes per row, appended in row order
+
+    Queries scan the codes (a fraction of the float32 segment) with asymmetric
+    distances, and only the best candidates are re-scored exactly against the
+    float vectors. The quantizer is trained once, after `train_min` rows;
+    `build` does the training off the writer thread and `install` encodes the
+    rows appended meanwhile and swaps the codes in.
+    """
+
+    def __init__(self, base: str, kind: str, pq_m: int = 8, train_min: int = 1024, train_sample: int = 65536):
+        self.meta_path = base + ".quant.json"
+        self.codebook_path = base + ".quant.codebook.f32"
+        self.codes_path = base + ".quant.codes.u8"
+        self.kind = kind
+        self.pq_m = pq_m
+        self.train_min = train_min
+        self.train_sample = train_sample
+        self.quantizer: Optional[object] = None
+        self.rows = 0
+        self._codes: Optional[np.ndarray] = None
+        self._fd: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def trained(self) -> bool:
+        return self.quantizer is not None
+
+    def _new_quantizer(self, kind: str, dim: int, pq_m: int):
+        return PQQuantizer(dim, pq_m) if kind == "pq" else Int8Quantizer(dim)
+
+    def open(self, count: int, dim: int, vectors: Callable[[], np.ndarray]) -> None:
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            quantizer = self._new_quantizer(meta["kind"], int(meta["dim"]), int(meta.get("m") or self.pq_m))
+            quantizer.load(np.fromfile(self.codebook_path, dtype=np.float32))
+        except Exception:
+            return
+        if meta["kind"] != self.kind or int(meta["dim"]) != dim:
+            return  # configuration changed; retrain on the next write
+        self.quantizer = quantizer
+        size = os.path.getsize(self.codes_path) if os.path.exists(self.codes_path) else 0
+        rows = size // quantizer.code_size
+        if rows > count or size % quantizer.code_size:
+            rows = min(rows, count)
+            with open(self.codes_path, "r+b") as f:
+                f.truncate(rows * quantizer.code_size)
+        self.rows = rows
+        if rows < count:
+            self.add(vectors()[rows:count])
+
+    def needs_training(self, count: int) -> bool:
+        return not self.trained and count >= self.train_min
+
+    def build(self, vectors: np.ndarray) -> Tuple[object, int]:
+        """Train a quantizer on (a sample of) `vectors` and encode them; touches no live state."""
+        count, dim = vectors.shape
+        rng = np.random.default_rng(count)
+        idx = np.sort(rng.choice(count, size=min(count, self.train_sample), replace=False))
+        quantizer = self._new_quantizer(self.kind, dim, self.pq_m)
+        quantizer.train(np.asarray(vectors[idx], dtype=np.float32), rng)
+        with open(self.codebook_path + ".tmp", "wb") as f:
+            f.write(quantizer.state().tobytes())
+        self._encode_to(self.codes_path + ".tmp", quantizer, vectors, "wb")
+        return quantizer, count
+
+    def install(self, build: Tuple[object, int], vectors: np.ndarray) -> None:
+        """Publish `build`, first encoding the rows of `vectors` appended after it was taken."""
+        quantizer, built_rows = build
+        count, dim = vectors.shape
+        self._encode_to(self.codes_path + ".tmp", quantizer, vectors[built_rows:count], "ab")
+        os.replace(self.codebook_path + ".tmp", self.codebook_path)
+        os.replace(self.codes_path + ".tmp", self.codes_path)
+        tmp = self.meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"kind": self.kind, "dim": dim, "m": getattr(quantizer, "m", None), "trained_rows": built_rows}, f)
+        os.replace(tmp, self.meta_path)
+        with self._lock:
+            self._close_fd()
+            self._codes = None
+            # rows before the quantizer: readers check `trained` first
+            self.rows = count
+            self.quantizer = quantizer
+
+    def train(self, vectors: np.ndarray) -> None:
+        """Build and install in one go (benchmarks, tools)."""
+        self.install(self.build(vectors), vectors)
+
+    @staticmethod
+    def _encode_to(path: str, quantizer, vectors: np.ndarray, mode: str) -> None:
+        with open(path, mode) as f:
+            for start in range(0, len(vectors), _BLOCK):
+                f.write(quantizer.encode(np.asarray(vectors[start:start + _BLOCK], dtype=np.float32)).tobytes())
+
+    def add(self, vectors: np.ndarray) -> None:
+        if not self.trained or len(vectors) == 0:
+            return
+        codes = self.quantizer.encode(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            if self._fd is None:
+                self._fd = open_append(self.codes_path)
+            write_all(self._fd, codes.tobytes())
+            self.rows += len(codes)
+
+    def codes(self) -> np.ndarray:
+        """Memory-map the code segment, remapping after appends."""
+        rows = self.rows
+        codes = self._codes
+        if codes is None or codes.shape[0] != rows:
+            codes = self._codes = np.memmap(self.codes_path, dtype=np.uint8, mode="r", shape=(rows, self.quantizer.code_size))
+        return codes
+
+    def scores(self, q: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        codes = self.codes()
+        return self.quantizer.scores(codes if rows is None else codes[rows], q)
+
+    def bytes_per_row(self) -> int:
+        return self.quantizer.code_size if self.trained else 0
+
+    def _close_fd(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_fd()
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+Entry = Tuple[str, Optional[str]]  # (reply_text, sentiment)
+
+
+def cache_key(backend: str, model: str, prompt: str, params: Dict[str, Any]) -> str:
+    """Stable fingerprint of everything that determines a backend's reply."""
+    raw = json.dumps([backend, model, prompt, params], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """LRU + TTL cache of model replies with an optional SQLite disk tier.
+
+    The memory tier holds at most `max_entries` replies. When `disk_path` is
+    set, replies are also written to SQLite so they survive restarts; a disk
+    hit is promoted back into memory. Disk methods block and are meant to run
+    off the event loop.
+    """
+
+    _PRUNE_EVERY = 256
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 300.0,
+        disk_path: Optional[str] = None,
+        disk_max_entries: int = 100_000,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_entries = max(0, max_entries)
+        self.ttl = ttl
+        self.disk_path = disk_path
+        self.disk_max_entries = disk_max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._mem: "OrderedDict[str, Tuple[float, Entry]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_writes = 0
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expired": 0, "stores": 0}
+
+    # memory tier
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            item = self._mem.get(key)
+            if item is None:
+                return None
+            expires, entry = item
+            if expires <= self._clock():
+                del self._mem[key]
+                self.stats["expired"] += 1
+                return None
+            self._mem.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry
+
+    def put(self, key: str, entry: Entry, expires: Optional[float] = None) -> None:
+        if self.max_entries == 0:
+            return
+        with self._lock:
+            self._mem[key] = (expires if expires is not None else self._clock() + self.ttl, entry)
+            self._mem.move_to_end(key)
+            self.stats["stores"] += 1
+            while len(self._mem) > self.max_entries:
+                self._mem.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self.stats["misses"] += 1
+
+    # disk tier
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.disk_path) or ".", exist_ok=True)
+            db = sqlite3.connect(self.disk_path, check_same_thread=False)
+            db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, reply TEXT, sentiment TEXT, expires REAL)")
+            db.execute("CREATE INDEX IF NOT EXISTS responses_expires ON responses (expires)")
+            self._db = db
+        return self._db
+
+    def disk_get(self, key: str) -> Optional[Entry]:
+        if not self.disk_path:
+            return None
+        with self._lock:
+            row = self._conn().execute("SELECT reply, sentiment, expires FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None or row[2] <= self._clock():
+            return None
+        entry = (row[0], row[1])
+        self.put(key, entry, expires=row[2])
+        with self._lock:
+            self.stats["disk_hits"] += 1
+        return entry
+
+    def disk_put(self, key: str, entry: Entry) -> None:
+        if not self.disk_path:
+            return
+        now = self._clock()
+        with self._lock:
+            db = self._conn()
+            db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", (key, entry[0], entry[1], now + self.ttl))
+            self._disk_writes += 1
+            if self._disk_writes % self._PRUNE_EVERY == 0:
+                db.execute("DELETE FROM responses WHERE expires <= ?", (now,))
+                # keep the newest disk_max_entries rows
+                db.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+                    (self.disk_max_entries,),
+                )
+            db.commit()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "size": len(self._mem), "disk": bool(self.disk_path)}
@@ -0,0 +1,49 @@
+import asyncio
+import weakref
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one in-flight task.
+
+    The first caller (the leader) starts the work as a task; callers arriving
+    while it runs await the same task instead of starting their own. The task
+    is shielded, so a leader that disconnects does not cancel it for the
+    others. Results are not kept once the task finishes; that is the response
+    cache's job.
+    """
+
+    def __init__(self):
+        self._inflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Task]]" = weakref.WeakKeyDictionary()
+        self.leaders = 0
+        self.saved = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        loop = asyncio.get_running_loop()
+        tasks = self._inflight.setdefault(loop, {})
+        task = tasks.get(key)
+        if task is None:
+            self.leaders += 1
+            task = loop.create_task(fn())
+            tasks[key] = task
+            task.add_done_callback(lambda t, k=key: self._done(tasks, k, t))
+        else:
+            self.saved += 1
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _done(tasks: Dict[str, asyncio.Task], key: str, task: asyncio.Task) -> None:
+        if tasks.get(key) is task:
+            del tasks[key]
+        if not task.cancelled():
+            # mark the exception retrieved even if every waiter has gone away
+            task.exception()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "leaders": self.leaders,
+            "saved": self.saved,
+            "in_flight": sum(len(t) for t in self._inflight.values()),
+        }
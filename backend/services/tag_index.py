@@ -0,0 +1,123 @@
+import json
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.append_writer import open_append, write_all
+
+Run = Tuple[int, int, List[str]]  # [start, end) rows sharing one tag list
+
+
+def tag_runs(start: int, tags_per_row: Sequence[List[str]]) -> List[Run]:
+    """Collapse consecutive rows with identical tags into `(start, end, tags)` runs."""
+    runs: List[Run] = []
+    for i, tags in enumerate(tags_per_row):
+        row = start + i
+        tags = sorted(set(tags or []))
+        if runs and runs[-1][1] == row and runs[-1][2] == tags:
+            runs[-1] = (runs[-1][0], row + 1, tags)
+        else:
+            runs.append((row, row + 1, tags))
+    return runs
+
+
+class TagIndex:
+    """Inverted tag -> row ids index over a file store's rows.
+
+    Persisted as ``<base>.tags.jsonl``, one ``{"start", "end", "tags"}`` line
+    per run of consecutive rows written with the same tags (an ingest batch is
+    one line however many chunks it has). Postings are rebuilt in memory on
+    open; a query intersects the postings of every requested tag, so filtered
+    retrieval only scores the rows that can match.
+    """
+
+    def __init__(self, base: str):
+        self.path = base + ".tags.jsonl"
+        self.rows = 0
+        self._lock = threading.Lock()
+        self._postings: Dict[str, List[np.ndarray]] = {}
+        self._fd: Optional[int] = None
+
+    def open(self, count: int, read_tags: Callable[[int, int], List[List[str]]]) -> None:
+        """Load the runs covering the first `count` rows; rows not covered yet are read back."""
+        runs: List[Run] = []
+        covered = 0
+        valid = 0
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                for line in f:
+                    try:
+                        obj = json.loads(line)
+                        run = (int(obj["start"]), int(obj["end"]), list(obj["tags"]))
+                    except Exception:
+                        break  # torn tail
+                    if run[1] > count:
+                        break  # rows lost in a torn segment append
+                    runs.append(run)
+                    covered = max(covered, run[1])
+                    valid += len(line)
+            if valid < os.path.getsize(self.path):
+                with open(self.path, "r+b") as f:
+                    f.truncate(valid)
+        with self._lock:
+            self._postings = {}
+            self._index(runs)
+            self.rows = covered
+        if covered < count:
+            # rows written before tags were indexed (or before a crash): one pass over them
+            self.add(covered, read_tags(covered, count))
+
+    @staticmethod
+    def _encode(runs: List[Run]) -> bytes:
+        return b"".join((json.dumps({"start": s, "end": e, "tags": t}) + "\n").encode("utf-8") for s, e, t in runs)
+
+    def _index(self, runs: List[Run]) -> None:
+        for start, end, tags in runs:
+            ids = np.arange(start, end, dtype=np.int64)
+            for tag in tags:  # untagged runs only record coverage
+                self._postings.setdefault(tag, []).append(ids)
+
+    def add(self, start: int, tags_per_row: Sequence[List[str]]) -> None:
+        """Index rows `start ..` (in row order) with their tags."""
+        if not tags_per_row:
+            return
+        runs = tag_runs(start, tags_per_row)
+        with self._lock:
+            if self._fd is None:
+                self._fd = open_append(self.path)
+            write_all(self._fd, self._encode(runs))
+            self._index(runs)
+            self.rows = start + len(tags_per_row)
+
+    def _posting(self, tag: str) -> np.ndarray:
+        chunks = self._postings.get(tag)
+        if not chunks:
+            return np.zeros(0, dtype=np.int64)
+        if len(chunks) > 1:
+            # compact postings that grew through many small inserts
+            with self._lock:
+                chunks = self._postings[tag]
+                merged = np.concatenate(chunks)
+                self._postings[tag] = [merged]
+            return merged
+        return chunks[0]
+
+    def candidates(self, tags: Sequence[str]) -> np.ndarray:
+        """Sorted row ids carrying every tag in `tags`."""
+        postings = sorted((self._posting(t) for t in set(tags)), key=len)
+        if not postings:
+            return np.zeros(0, dtype=np.int64)
+        rows = postings[0]
+        for other in postings[1:]:
+            if len(rows) == 0:
+                break
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        return rows
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
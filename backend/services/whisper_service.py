@@ -3,24 +3,42 @@ import asyncio
 from typing import Tuple, Optional
 
 from config import settings
+from services.model_registry import model_registry
 
 
 class WhisperService:
     """Whisper STT with mock and optional local mode."""
 
+    MODEL_KEY = "whisper:base"
+
     def __init__(self):
-        self._local_model = None
-        if settings.WHISPER_MODE == "local":
-            try:
-                import whisper  # type: ignore
+        # loaded through the model registry on the first local transcription
+        model_registry.register(self.MODEL_KEY, self._load_model)
 
-                self._local_model = whisper.load_model("base")
-            except Exception:
-                self._local_model = None
+    @staticmethod
+    def _load_model():
+        import whisper  # type: ignore
+
+        return whisper.load_model("base")
+
+    @property
+    def _local_model(self):
+        if settings.WHISPER_MODE != "local":
+            return None
+        try:
+            return model_registry.get(self.MODEL_KEY)
+        except Exception:
+            return None
 
     async def transcribe(self, audio_bytes: bytes, filename: Optional[str] = None) -> Tuple[str, Optional[float], Optional[str]]:
+        if settings.WHISPER_MODE == "local":
+            # the first call also loads the model, so keep it off the event loop
+            return await asyncio.to_thread(self.transcribe_sync, audio_bytes, filename)
+        return self.transcribe_sync(audio_bytes, filename)
+
+    def transcribe_sync(self, audio_bytes: bytes, filename: Optional[str] = None) -> Tuple[str, Optional[float], Optional[str]]:
         if settings.WHISPER_MODE == "local" and self._local_model is not None:
-            return await asyncio.to_thread(self._local_transcribe, audio_bytes)
+            return self._local_transcribe(audio_bytes)
         # mock fallback
         return "I still miss our late-night calls.", 0.97, "en"
 
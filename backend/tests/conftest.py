@@ -31,6 +31,7 @@ def client(tmp_path):
     try:
         from services import embedding_service
         embedding_service.memory_store = embedding_service._FileMemoryStore(settings.MEMORY_FILE)
+        embedding_service.tenant_stores.close()
     except Exception:
         pass
     os.environ.pop("ELEVEN_API_KEY", None)
@@ -0,0 +1,296 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from config import settings
+from services.ai_service import AIService
+from services.http_client import AsyncHTTPPool
+
+
+@pytest.fixture
+def no_backends(monkeypatch):
+    for name in ("OPENAI_BASE_URL", "OPENAI_MODEL", "OPENAI_API_KEY", "OLLAMA_BASE_URL", "OLLAMA_MODEL", "MODEL_BASE_URL"):
+        monkeypatch.setattr(settings, name, None)
+
+
+def _service(handler):
+    pool = AsyncHTTPPool()
+    pool.transport = httpx.MockTransport(handler)
+    return AIService(pool=pool)
+
+
+def test_ollama_reply_uses_pooled_client_and_backend_timeout(no_backends, monkeypatch):
+    monkeypatch.setattr(settings, "OLLAMA_BASE_URL", "http://ollama.test")
+    monkeypatch.setattr(settings, "OLLAMA_MODEL", "llama")
+    monkeypatch.setattr(settings, "OLLAMA_TIMEOUT", 7.0)
+    seen = []
+
+    def handler(request):
+        seen.append(request.extensions["timeout"])
+        assert json.loads(request.content)["stream"] is False
+        return httpx.Response(200, json={"message": {"content": "hello from ollama"}})
+
+    svc = _service(handler)
+
+    async def scenario():
+        first = await svc.generate_reply("hi")
+        second = await svc.generate_reply("hi again")
+        return first, second, svc.pool.client() is svc.pool.client()
+
+    first, second, shared = asyncio.run(scenario())
+    assert first == ("hello from ollama", "neutral")
+    assert second == first
+    assert shared
+    assert seen[0]["read"] == 7.0
+
+
+def test_failed_backend_falls_back_to_mock(no_backends, monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_BASE_URL", "http://model.test")
+    svc = _service(lambda request: httpx.Response(503))
+    text, sentiment = asyncio.run(svc.generate_reply("System\nUser: hello"))
+    assert sentiment == "calm"
+    assert text.endswith("User: hello")
+
+
+def test_circuit_opens_after_threshold_and_probes_with_backoff():
+    from services.backend_health import BackendHealth
+
+    now = [0.0]
+    h = BackendHealth("openai", failure_threshold=2, backoff_base=1.0, backoff_max=4.0, clock=lambda: now[0])
+    h.record_failure()
+    assert h.state == "closed"
+    h.record_failure()
+    assert h.state == "open" and not h.available()
+
+    now[0] = 1.0
+    assert h.allow() and h.state == "half_open"
+    assert not h.allow()  # only one probe at a time
+    h.record_failure()
+    assert h.state == "open" and h.open_until == 3.0  # back-off doubled
+
+    now[0] = 3.0
+    assert h.allow()
+    h.record_success(50.0)
+    assert h.state == "closed" and h.backoff == 1.0 and h.latency_ms == 50.0
+
+
+def test_dead_backend_is_skipped_after_failures(no_backends, monkeypatch):
+    monkeypatch.setattr(settings, "OPENAI_BASE_URL", "http://vllm.test/v1")
+    monkeypatch.setattr(settings, "OPENAI_MODEL", "m")
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "k")
+    monkeypatch.setattr(settings, "OLLAMA_BASE_URL", "http://ollama.test")
+    monkeypatch.setattr(settings, "OLLAMA_MODEL", "llama")
+    hits = {"vllm.test": 0, "ollama.test": 0}
+
+    def handler(request):
+        hits[request.url.host] += 1
+        if request.url.host == "vllm.test":
+            raise httpx.ConnectError("down", request=request)
+        return httpx.Response(200, json={"message": {"content": "ollama says hi"}})
+
+    svc = _service(handler)
+    svc.health = type(svc.health)(failure_threshold=3, backoff_base=60.0)
+
+    async def scenario():
+        return [await svc.generate_reply("hi", use_cache=False) for _ in range(10)]
+
+    replies = asyncio.run(scenario())
+    assert all(r == ("ollama says hi", "neutral") for r in replies)
+    assert hits["vllm.test"] == 3
+    assert hits["ollama.test"] == 10
+    snap = svc.health.snapshot()
+    assert snap["openai"]["state"] == "open"
+    assert snap["ollama"]["state"] == "closed"
+
+
+def test_order_prefers_fastest_healthy_backend():
+    from services.backend_health import BackendRegistry
+
+    reg = BackendRegistry()
+    reg.get("openai").record_success(900.0)
+    reg.get("ollama").record_success(120.0)
+    assert reg.order(["openai", "ollama", "generic"]) == ["generic", "ollama", "openai"]
+
+
+def test_identical_prompts_are_served_from_cache(no_backends, monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_BASE_URL", "http://model.test")
+    calls = []
+
+    def handler(request):
+        calls.append(json.loads(request.content)["prompt"])
+        return httpx.Response(200, json={"text": f"reply {len(calls)}"})
+
+    svc = _service(handler)
+
+    async def scenario():
+        first = await svc.generate_reply("same prompt")
+        again = await svc.generate_reply("same prompt")
+        bypass = await svc.generate_reply("same prompt", use_cache=False)
+        other = await svc.generate_reply("different prompt")
+        return first, again, bypass, other
+
+    first, again, bypass, other = asyncio.run(scenario())
+    assert first == again == ("reply 1", "neutral")
+    assert bypass == ("reply 2", "neutral")
+    assert other == ("reply 3", "neutral")
+    stats = svc.cache.snapshot()
+    assert stats["hits"] == 1 and stats["misses"] == 2
+
+
+def test_response_cache_lru_ttl_and_disk_tier(tmp_path):
+    from services.response_cache import ResponseCache
+
+    now = [100.0]
+    path = str(tmp_path / "responses.sqlite")
+    cache = ResponseCache(max_entries=2, ttl=10.0, disk_path=path, clock=lambda: now[0])
+    cache.put("a", ("A", None))
+    cache.put("b", ("B", None))
+    cache.get("a")
+    cache.put("c", ("C", None))
+    assert cache.get("b") is None  # least recently used was evicted
+    assert cache.get("a") == ("A", None)
+    cache.disk_put("c", ("C", "calm"))
+
+    restarted = ResponseCache(max_entries=2, ttl=10.0, disk_path=path, clock=lambda: now[0])
+    assert restarted.disk_get("c") == ("C", "calm")
+    assert restarted.get("c") == ("C", "calm")  # promoted into memory
+    now[0] = 111.0
+    assert restarted.get("c") is None
+    assert restarted.disk_get("c") is None
+
+
+def test_concurrent_identical_prompts_share_one_backend_call(no_backends, monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_BASE_URL", "http://model.test")
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"text": "shared reply"})
+
+    svc = _service(handler)
+    svc.cache = None
+
+    async def scenario():
+        same = [svc.generate_reply("double tap") for _ in range(5)]
+        fresh = svc.generate_reply("double tap", use_cache=False)
+        return await asyncio.gather(*same, fresh)
+
+    replies = asyncio.run(scenario())
+    assert all(r == ("shared reply", "neutral") for r in replies)
+    assert len(calls) == 2  # one coalesced call plus the opted-out one
+    snap = svc.coalescer.snapshot()
+    assert snap["saved"] == 4 and snap["leaders"] == 1 and snap["in_flight"] == 0
+
+
+def test_coalesced_leader_cancellation_does_not_cancel_followers():
+    from services.single_flight import SingleFlight
+
+    sf = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def scenario():
+        leader = asyncio.ensure_future(sf.do("k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(sf.do("k", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(scenario()) == "done"
+
+
+def test_generic_backend_micro_batches_concurrent_prompts(no_backends, monkeypatch):
+    from tools.stub_model_server import app as stub_app
+
+    monkeypatch.setattr(settings, "MODEL_BASE_URL", "http://stub")
+    monkeypatch.setattr(settings, "MODEL_BATCH_ENABLED", True)
+    monkeypatch.setattr(settings, "MODEL_BATCH_MAX_SIZE", 8)
+    monkeypatch.setattr(settings, "MODEL_BATCH_WINDOW_MS", 20)
+    stub_app.state.calls = 0
+    stub_app.state.batch_sizes = []
+
+    pool = AsyncHTTPPool()
+    pool.transport = httpx.ASGITransport(app=stub_app)
+    svc = AIService(pool=pool)
+    svc.cache = None
+
+    async def scenario():
+        return await asyncio.gather(*(svc.generate_reply(f"User: prompt {i}") for i in range(20)))
+
+    replies = asyncio.run(scenario())
+    assert [r[0] for r in replies] == [f"stub reply to: User: prompt {i}" for i in range(20)]
+    # concurrent batches may reach the server in any order
+    assert sorted(stub_app.state.batch_sizes) == [4, 8, 8]
+    assert svc.batcher.snapshot()["batches"] == 3
+
+
+def test_micro_batcher_keeps_in_flight_batches_referenced():
+    import gc
+    from services.micro_batcher import MicroBatcher
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def send(items):
+            await release.wait()
+            return [i * 2 for i in items]
+
+        batcher = MicroBatcher(send, max_batch=2, window_ms=1000)
+        callers = [asyncio.ensure_future(batcher.submit(i)) for i in (1, 2)]
+        await asyncio.sleep(0.01)
+        pending = batcher._pending[asyncio.get_running_loop()]
+        # the loop holds tasks only weakly; the batcher keeps the in-flight one alive
+        assert len(pending.tasks) == 1
+        gc.collect()
+        release.set()
+        results = await asyncio.gather(*callers)
+        await asyncio.sleep(0)
+        return results, len(pending.tasks)
+
+    assert asyncio.run(scenario()) == ([2, 4], 0)
+
+
+def test_cancelled_probe_releases_half_open_slot(no_backends, monkeypatch):
+    monkeypatch.setattr(settings, "OLLAMA_BASE_URL", "http://ollama.test")
+    monkeypatch.setattr(settings, "OLLAMA_MODEL", "llama")
+    svc = _service(lambda request: httpx.Response(200, json={"message": {"content": "hi"}}))
+    health = svc.health.get("ollama")
+    health.state, health.open_until = "open", 0.0
+
+    async def hang(prompt):
+        await asyncio.sleep(10)
+
+    async def blocking_stream(prompt):
+        await asyncio.sleep(10)
+        yield "never"
+
+    async def scenario():
+        # a cancelled request (client gone) must not leave the probe claimed
+        monkeypatch.setattr(svc, "_ollama_chat", hang)
+        task = asyncio.ensure_future(svc.generate_reply("hi", use_cache=False))
+        await asyncio.sleep(0.01)
+        assert health.state == "half_open" and health.probe_in_flight
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert health.available()
+
+        # same for a stream the client stops reading
+        monkeypatch.setattr(svc, "_ollama_stream", blocking_stream)
+        gen = svc.stream_reply("hi", use_cache=False)
+        task = asyncio.ensure_future(gen.__anext__())
+        await asyncio.sleep(0.01)
+        assert health.probe_in_flight
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await gen.aclose()
+        assert health.available() and svc.health.order(["ollama"]) == ["ollama"]
+
+    asyncio.run(scenario())
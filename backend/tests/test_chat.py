@@ -26,3 +26,149 @@ def test_chat_with_tts(client):
     # In mock mode TTS produces a dummy wav path
     if data.get("audio_url"):
         assert data["audio_url"].startswith("/static/audio/")
+
+
+def test_chat_reports_stage_timings(client):
+    r = client.post("/chat", json={"message": "Do you remember the lake?", "tts": True})
+    assert r.status_code == 200
+    timings = r.json()["timings"]
+    for stage in ("retrieval", "history", "prompt", "generate", "persist_reply", "tts", "total"):
+        assert stage in timings
+    assert "generate;dur=" in r.headers["server-timing"]
+
+
+def test_chat_history_includes_current_message(client):
+    from utils.text_utils import get_recent_messages
+
+    client.post("/chat", json={"message": "first"})
+    client.post("/chat", json={"message": "second"})
+    contents = [m["content"] for m in get_recent_messages(10, session_id="default")]
+    assert contents[0] == "first"
+    assert contents[2] == "second"
+    assert len(contents) == 4
+
+
+def test_default_session_keeps_legacy_messages_file_history(client):
+    from config import settings
+    from utils.text_utils import close_message_log, get_recent_messages
+
+    close_message_log()
+    with open(settings.MESSAGES_FILE, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"role": "user", "content": "from before sessions"}) + "\n")
+
+    client.post("/chat", json={"message": "after the upgrade"})
+    contents = [m["content"] for m in get_recent_messages(10)]
+    assert contents[:2] == ["from before sessions", "after the upgrade"]
+    assert get_recent_messages(10, session_id="default") == get_recent_messages(10)
+
+
+def test_chat_answers_without_memories_when_the_embedding_model_fails_to_load(client, monkeypatch):
+    from config import settings
+    from services import embedding_service
+    from services.model_registry import model_registry, sentence_transformer_key
+
+    loads = []
+
+    def broken_loader():
+        loads.append(1)
+        raise OSError("model weights not found")
+
+    model_registry.register(sentence_transformer_key("broken-test-model"), broken_loader)
+
+    class _LazyModelStore(embedding_service._AsyncStoreMixin):
+        def retrieve(self, query, top_k=5, tags=None, source=None):
+            return embedding_service._cached_encode("broken-test-model", [query])
+
+    monkeypatch.setattr(embedding_service, "memory_store", _LazyModelStore())
+    monkeypatch.setattr(settings, "RETRIEVAL_ENABLED", True)
+    for message in ("first", "second"):
+        r = client.post("/chat", json={"message": message})
+        assert r.status_code == 200
+        assert r.json()["reply_text"]
+    assert loads == [1]  # the failed load is remembered, not retried per request
+
+
+def test_chat_history_is_kept_per_session(client):
+    from utils.text_utils import get_recent_messages
+
+    client.post("/chat", json={"message": "hello from a", "session_id": "a"})
+    client.post("/chat", json={"message": "hello from b", "session_id": "b"})
+    client.post("/chat", json={"message": "again from a", "session_id": "a"})
+    a = [m["content"] for m in get_recent_messages(10, session_id="a") if m["role"] == "user"]
+    b = [m["content"] for m in get_recent_messages(10, session_id="b") if m["role"] == "user"]
+    assert a == ["hello from a", "again from a"]
+    assert b == ["hello from b"]
+    assert get_recent_messages(10, session_id="missing") == []
+
+
+def _parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        event, data = "message", None
+        for line in block.splitlines():
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data = json.loads(line[len("data:"):].strip())
+        events.append((event, data))
+    return events
+
+
+def test_chat_stream_mock_tokens_and_persists_reply(client):
+    from utils.text_utils import get_recent_messages
+
+    r = client.post("/chat/stream", json={"message": "Tell me about the lake."})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = _parse_sse(r.text)
+    tokens = [d["token"] for e, d in events if e == "message"]
+    done = [d for e, d in events if e == "done"]
+    assert len(tokens) > 1
+    assert len(done) == 1
+    assert done[0]["reply_text"] == "".join(tokens)
+    assert "first_token" in done[0]["timings"]
+    history = get_recent_messages(2, session_id="default")
+    assert history[-1] == {"role": "assistant", "content": done[0]["reply_text"]}
+
+
+def test_chat_stream_reports_backend_failure_and_persists_partial_reply(client, monkeypatch):
+    from services.ai_service import ai_service
+    from utils.text_utils import get_recent_messages
+
+    async def failing(prompt, use_cache=True):
+        yield "Hel", "neutral"
+        yield "lo", "neutral"
+        raise RuntimeError("backend dropped the connection")
+
+    monkeypatch.setattr(ai_service, "stream_reply", failing)
+    r = client.post("/chat/stream", json={"message": "hi", "session_id": "broken"})
+    assert r.status_code == 200
+    events = _parse_sse(r.text)
+    assert [d["token"] for e, d in events if e == "message"] == ["Hel", "lo"]
+    assert events[-1] == ("error", {"detail": "reply generation failed", "reply_text": "Hello", "persisted": True})
+    assert not [e for e, _ in events if e == "done"]
+    assert get_recent_messages(1, session_id="broken") == [{"role": "assistant", "content": "Hello"}]
+
+
+def test_chat_stream_forwards_openai_deltas(client, monkeypatch):
+    import httpx
+    from config import settings
+
+    chunks = ["Hel", "lo ", "there"]
+
+    def handler(request):
+        assert json.loads(request.content)["stream"] is True
+        body = "".join(f"data: {json.dumps({'choices': [{'delta': {'content': c}}]})}\n\n" for c in chunks)
+        return httpx.Response(200, text=body + "data: [DONE]\n\n", headers={"content-type": "text/event-stream"})
+
+    from services.http_client import http_pool
+
+    monkeypatch.setattr(http_pool, "transport", httpx.MockTransport(handler))
+    monkeypatch.setattr(settings, "OPENAI_BASE_URL", "http://vllm.test/v1")
+    monkeypatch.setattr(settings, "OPENAI_MODEL", "test-model")
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "sk-test")
+
+    r = client.post("/chat/stream", json={"message": "hi"})
+    events = _parse_sse(r.text)
+    assert [d["token"] for e, d in events if e == "message"] == chunks
+    assert events[-1][1]["reply_text"] == "Hello there"
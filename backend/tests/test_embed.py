@@ -0,0 +1,29 @@
+import numpy as np
+
+from utils import text_utils
+from utils.text_utils import embed_many, simple_embed
+
+SAMPLES = [
+    "",
+    "Hello, World!",
+    "ÀÉÎõü çà et là — İstanbul KELVIN K",
+    "emoji 🙂 and tabs\tand\nnewlines",
+    "x" * 250,
+    "lone surrogate \ud800 kept",
+]
+
+
+def test_embed_many_matches_simple_embed_exactly():
+    got = embed_many(SAMPLES)
+    assert got.dtype == np.float32
+    assert got.shape == (len(SAMPLES), 27)
+    want = np.asarray([simple_embed(t) for t in SAMPLES], dtype=np.float32)
+    assert np.array_equal(got, want)
+
+
+def test_embed_many_slices_large_inputs(monkeypatch):
+    monkeypatch.setattr(text_utils, "_EMBED_CHUNK_BYTES", 16)
+    texts = [f"chunk {i} " * (i % 5 + 1) for i in range(40)] + SAMPLES
+    want = np.asarray([simple_embed(t) for t in texts], dtype=np.float32)
+    assert np.array_equal(embed_many(texts), want)
+    assert embed_many([]).shape == (0, 27)
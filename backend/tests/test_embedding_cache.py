@@ -0,0 +1,51 @@
+import numpy as np
+
+from services.embedding_cache import EmbeddingCache
+
+
+class _Model:
+    def __init__(self):
+        self.seen = []
+
+    def encode(self, texts):
+        self.seen.append(list(texts))
+        return np.asarray([[len(t), t.count("a"), 1.0] for t in texts], dtype=np.float32)
+
+
+def test_repeats_skip_the_model(tmp_path):
+    cache = EmbeddingCache(size=100)
+    model = _Model()
+    first = cache.encode("m", ["alpha", "beta", "alpha"], model.encode)
+    assert model.seen == [["alpha", "beta"]]  # in-batch duplicate encoded once
+    again = cache.encode("m", ["beta", "alpha"], model.encode)
+    assert model.seen == [["alpha", "beta"]]
+    assert np.array_equal(again, first[[1, 0]])
+    # a different model name is a different key
+    cache.encode("other", ["alpha"], model.encode)
+    assert model.seen[-1] == ["alpha"]
+    assert cache.snapshot()["hits"] == 2
+
+
+def test_lru_evicts_oldest():
+    cache = EmbeddingCache(size=2)
+    model = _Model()
+    cache.encode("m", ["a", "b"], model.encode)
+    cache.encode("m", ["a"], model.encode)  # refresh a
+    cache.encode("m", ["c"], model.encode)  # evicts b
+    cache.encode("m", ["a", "b"], model.encode)
+    assert model.seen[-1] == ["b"]
+
+
+def test_disk_tier_survives_restart_and_torn_rows(tmp_path):
+    model = _Model()
+    cache = EmbeddingCache(size=10, disk_dir=str(tmp_path))
+    expected = cache.encode("m", ["one", "two", "three"], model.encode)
+    tier = cache._disk["m"]
+    with open(tier.vectors_path, "ab") as f:
+        f.write(b"\0" * 7)  # partial row from an interrupted append
+
+    restarted = EmbeddingCache(size=10, disk_dir=str(tmp_path))
+    got = restarted.encode("m", ["three", "one", "two"], model.encode)
+    assert len(model.seen) == 1
+    assert np.array_equal(got, expected[[2, 0, 1]])
+    assert restarted.snapshot()["disk_hits"] == 3
@@ -0,0 +1,255 @@
+import json
+import os
+
+import numpy as np
+
+from services.embedding_service import _FileMemoryStore
+from utils.text_utils import simple_embed
+
+
+def test_file_store_retrieve_ranks_by_cosine(tmp_path):
+    store = _FileMemoryStore(os.path.join(str(tmp_path), "memory.jsonl"))
+    store.add("zzzz zzzz zzzz", tags=[])
+    store.add("we walked along the beach at sunset", tags=["trip"])
+    store.add("qqqq xxxx", tags=[])
+
+    results = store.retrieve("the beach at sunset", top_k=2)
+    assert len(results) == 2
+    assert results[0] == "we walked along the beach at sunset"
+
+
+def test_file_store_reopens_from_segments(tmp_path):
+    path = os.path.join(str(tmp_path), "memory.jsonl")
+    store = _FileMemoryStore(path)
+    for i in range(10):
+        store.add(f"memory number {i} " + "a" * i, tags=[])
+    assert os.path.getsize(store.vectors_path) == 10 * 27 * 4
+    assert os.path.getsize(store.offsets_path) == 10 * 8
+
+    reloaded = _FileMemoryStore(path)
+    assert reloaded.retrieve("memory number 9 aaaaaaaaa", top_k=1) == store.retrieve("memory number 9 aaaaaaaaa", top_k=1)
+    assert len(reloaded.retrieve("anything", top_k=50)) == 10
+    assert isinstance(reloaded._vectors(), np.memmap)
+
+
+def test_file_store_migrates_legacy_jsonl(tmp_path):
+    path = os.path.join(str(tmp_path), "memory.jsonl")
+    texts = ["the old lighthouse", "coffee on sunday mornings", "zzz"]
+    with open(path, "w", encoding="utf-8") as f:
+        for i, t in enumerate(texts):
+            f.write(json.dumps({"id": f"mem_{i}", "text": t, "vector": simple_embed(t), "tags": ["legacy"]}) + "\n")
+
+    store = _FileMemoryStore(path)
+    assert store.retrieve("lighthouse", top_k=1) == ["the old lighthouse"]
+    assert os.path.exists(store.manifest_path)
+    with open(path, "r", encoding="utf-8") as f:
+        records = [json.loads(ln) for ln in f]
+    assert [r["text"] for r in records] == texts
+    assert all("vector" not in r and r["tags"] == ["legacy"] for r in records)
+
+
+def test_file_store_drops_torn_append(tmp_path):
+    path = os.path.join(str(tmp_path), "memory.jsonl")
+    store = _FileMemoryStore(path)
+    store.add("first memory", tags=[])
+    store.add("second memory", tags=[])
+    with open(store.vectors_path, "ab") as f:
+        f.write(b"\x00" * 10)
+
+    reloaded = _FileMemoryStore(path)
+    assert len(reloaded.retrieve("memory", top_k=10)) == 2
+    assert os.path.getsize(reloaded.vectors_path) == 2 * 27 * 4
+
+
+def test_file_store_add_many_batches(tmp_path, monkeypatch):
+    from config import settings
+
+    monkeypatch.setattr(settings, "EMBEDDING_BATCH_SIZE", 3)
+    store = _FileMemoryStore(os.path.join(str(tmp_path), "memory.jsonl"))
+    ids = store.add_many([f"chunk {i}" for i in range(7)], tags=["bulk"])
+    assert len(ids) == len(set(ids)) == 7
+    assert os.path.getsize(store.offsets_path) == 7 * 8
+    assert len(store.retrieve("chunk", top_k=10)) == 7
+
+
+def test_file_store_async_api_runs_on_store_executor(tmp_path):
+    import asyncio
+    import threading
+
+    store = _FileMemoryStore(os.path.join(str(tmp_path), "memory.jsonl"))
+    threads = []
+    original = store.retrieve
+
+    def retrieve(query, top_k=5):
+        threads.append(threading.current_thread().name)
+        return original(query, top_k)
+
+    store.retrieve = retrieve
+
+    async def scenario():
+        await store.add_many_async(["the red bicycle", "a quiet library"], tags=[])
+        return await store.retrieve_async("bicycle", top_k=1)
+
+    assert asyncio.run(scenario()) == ["the red bicycle"]
+    assert threads and threads[0].startswith("store")
+
+
+def test_concurrent_adds_share_commits_and_stay_aligned(tmp_path):
+    import threading
+
+    store = _FileMemoryStore(str(tmp_path / "memory.jsonl"))
+    texts = [f"note {i} about topic {chr(97 + i % 26) * 5}" for i in range(200)]
+
+    def worker(chunk):
+        for t in chunk:
+            store.add(t, tags=[])
+
+    threads = [threading.Thread(target=worker, args=(texts[i::8],)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    store.close()
+
+    reopened = _FileMemoryStore(str(tmp_path / "memory.jsonl"))
+    assert reopened.retrieve("note 7 about topic hhhhh", top_k=1) == ["note 7 about topic hhhhh"]
+    reopened._load()
+    assert reopened._count == 200
+    assert sorted(reopened._read_texts(np.arange(200))) == sorted(texts)
+
+
+def _clustered(n, dim=16, clusters=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    return (centers[rng.integers(0, clusters, n)] + 0.1 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def test_ann_store_trains_persists_and_indexes_inserts(tmp_path, monkeypatch):
+    from config import settings
+    from services.embedding_service import _IVFMemoryStore
+
+    monkeypatch.setattr(settings, "ANN_TRAIN_MIN", 500)
+    monkeypatch.setattr(settings, "ANN_NLIST", 16)
+    monkeypatch.setattr(settings, "ANN_NPROBE", 4)
+    path = str(tmp_path / "memory.jsonl")
+    vecs = _clustered(2000)
+    store = _IVFMemoryStore(path)
+    store._load()
+    store._append_rows([(f"m{i}", f"text {i}", []) for i in range(2000)], vecs)
+    store.wait_for_builds()
+    assert store.index.trained and store.index.trained_rows >= 500 and store.index.rows == 2000
+    store.close()
+
+    reopened = _IVFMemoryStore(path)
+    reopened._load()
+    assert reopened.index.trained and reopened.index.rows == 2000
+    # incremental insert lands in a list and is found
+    extra = _clustered(1, seed=7)
+    reopened._append_rows([("new", "fresh memory", [])], extra)
+    assert reopened.index.rows == 2001
+    assert reopened._read_texts(reopened._top_k(extra[0], 1)) == ["fresh memory"]
+
+    # probing a few lists still matches the exact scan on clustered data
+    queries = _clustered(50, seed=3)
+    hits = 0
+    for q in queries:
+        approx = set(reopened._top_k(q, 10).tolist())
+        exact = set(reopened._score_rows(reopened._unit(q), 10).tolist())
+        hits += len(approx & exact)
+    assert hits / 500 >= 0.9
+    reopened.close()
+
+
+def test_quantized_store_reranks_exactly_and_survives_reopen(tmp_path, monkeypatch):
+    from config import settings
+
+    monkeypatch.setattr(settings, "QUANT_TRAIN_MIN", 500)
+    monkeypatch.setattr(settings, "QUANT_RERANK", 40)
+    monkeypatch.setattr(settings, "PQ_SUBVECTORS", 4)
+    vecs = _clustered(3000)
+    queries = _clustered(30, seed=5)
+    for kind, min_recall in (("int8", 0.95), ("pq", 0.8)):
+        monkeypatch.setattr(settings, "MEMORY_QUANTIZATION", kind)
+        path = str(tmp_path / f"{kind}.jsonl")
+        store = _FileMemoryStore(path)
+        store._load()
+        store._append_rows([(f"m{i}", f"text {i}", []) for i in range(1000)], vecs[:1000])
+        store._append_rows([(f"m{i}", f"text {i}", []) for i in range(1000, 3000)], vecs[1000:])
+        store.wait_for_builds()
+        assert store.quant.trained and store.quant.rows == 3000
+        store.close()
+
+        reopened = _FileMemoryStore(path)
+        reopened._load()
+        assert reopened.quant.trained and reopened.quant.rows == 3000
+        hits = 0
+        for q in queries:
+            unit = reopened._unit(q)
+            approx = reopened._top_k(q, 10)
+            exact = np.argsort(reopened._vectors() @ unit)[::-1][:10]
+            hits += len(set(approx.tolist()) & set(exact.tolist()))
+            # re-ranked scores are the exact ones, best first
+            scores = reopened._vectors()[approx] @ unit
+            assert np.all(np.diff(scores) <= 1e-6)
+        assert hits / 300 >= min_recall, kind
+        reopened.close()
+
+
+def test_filtered_retrieve_scores_only_tagged_rows(tmp_path):
+    path = str(tmp_path / "memory.jsonl")
+    store = _FileMemoryStore(path)
+    store.add_many(["the beach at sunset", "beach volleyball"], tags=["trip", "telegram"])
+    store.add_many(["the beach at sunset with friends"], tags=["trip", "whatsapp"])
+    store.add("a quiet day at the beach", tags=[])
+
+    assert store.retrieve("the beach at sunset", top_k=5, tags=["trip"], source="telegram") == [
+        "the beach at sunset",
+        "beach volleyball",
+    ]
+    assert store.retrieve("the beach at sunset", top_k=5, source="whatsapp") == ["the beach at sunset with friends"]
+    assert store.retrieve("beach", top_k=5, tags=["nope"]) == []
+    assert len(store.retrieve("beach", top_k=5)) == 4
+    store.close()
+
+    # postings come back from the tag runs, and are rebuilt when the file is gone
+    assert _FileMemoryStore(path).retrieve("beach", top_k=5, tags=["trip"]) == store.retrieve("beach", top_k=5, tags=["trip"])
+    os.remove(store.tag_index.path)
+    rebuilt = _FileMemoryStore(path)
+    assert len(rebuilt.retrieve("beach", top_k=5, tags=["trip"])) == 3
+    assert rebuilt.tag_index.rows == 4
+
+
+def test_ann_training_does_not_block_the_append_writer(tmp_path, monkeypatch):
+    import threading
+
+    from config import settings
+    from services import ivf_index
+    from services.embedding_service import _IVFMemoryStore
+    from utils.append_writer import append_writer
+
+    monkeypatch.setattr(settings, "ANN_TRAIN_MIN", 500)
+    monkeypatch.setattr(settings, "ANN_NLIST", 16)
+    release = threading.Event()
+    original = ivf_index.train_centroids
+
+    def slow_train(*args, **kwargs):
+        release.wait(10)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(ivf_index, "train_centroids", slow_train)
+    store = _IVFMemoryStore(str(tmp_path / "memory.jsonl"))
+    store._load()
+    vecs = _clustered(800)
+    store._append_rows([(f"m{i}", f"text {i}", []) for i in range(600)], vecs[:600])
+    # training is parked; the writer still commits other work and queries still scan exactly
+    append_writer.call(lambda: None)
+    store._append_rows([(f"m{i}", f"text {i}", []) for i in range(600, 800)], vecs[600:])
+    assert not store.index.trained
+    assert len(store._top_k(vecs[0], 5)) == 5
+
+    release.set()
+    store.wait_for_builds()
+    # rows committed during training were assigned when the index was installed
+    assert store.index.trained and store.index.trained_rows == 600 and store.index.rows == 800
+    assert sum(len(c) for chunks in store.index._state[1] for c in chunks) == 800
+    store.close()
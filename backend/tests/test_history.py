@@ -20,3 +20,98 @@ def test_get_recent_messages_returns_last_n(tmp_path):
     assert msgs[1]["content"] == "m7"
     assert msgs[2]["content"] == "m8"
     assert msgs[3]["content"] == "m9"
+
+
+def test_recent_messages_served_from_window_without_rereading(tmp_path, monkeypatch):
+    from utils.message_log import MessageLog
+
+    path = str(tmp_path / "messages.jsonl")
+    log = MessageLog(path, capacity=8, fsync="never")
+    for i in range(20):
+        log.append({"role": "user", "content": f"m{i}"})
+
+    # reads come from memory, not the file
+    monkeypatch.setattr("builtins.open", None)
+    assert [m["content"] for m in log.recent(3)] == ["m17", "m18", "m19"]
+    monkeypatch.undo()
+    log.close()
+
+    # a fresh log warms its window from the tail of the file
+    reopened = MessageLog(path, capacity=8, fsync="always")
+    assert [m["content"] for m in reopened.recent(8)] == [f"m{i}" for i in range(12, 20)]
+    # larger requests than the window fall back to a tail read
+    assert [m["content"] for m in reopened.recent(15)] == [f"m{i}" for i in range(5, 20)]
+    reopened.close()
+
+
+def test_message_log_drops_torn_last_line(tmp_path):
+    from utils.message_log import MessageLog, read_tail
+
+    path = tmp_path / "messages.jsonl"
+    path.write_text('{"role": "user", "content": "a"}\n{"role": "user", "con', encoding="utf-8")
+    log = MessageLog(str(path), capacity=4)
+    log.append({"role": "assistant", "content": "b"})
+    log.close()
+    assert [m["content"] for m in read_tail(str(path), 10)] == ["a", "b"]
+
+
+def test_session_store_evicts_and_rewarms(tmp_path):
+    from utils.session_store import SessionStore, session_path
+
+    store = SessionStore(str(tmp_path / "sessions"), capacity=4, max_open=2)
+    for i in range(6):
+        for sid in ("s1", "s2", "s3"):
+            store.append(sid, {"role": "user", "content": f"{sid}-{i}"})
+    assert store.open_sessions() == 2
+    # s1 was evicted; its window is rebuilt from the tail of its segment
+    assert [m["content"] for m in store.recent("s1", 3)] == ["s1-3", "s1-4", "s1-5"]
+    assert os.path.dirname(session_path(store.root, "s1")) != store.root
+    store.close()
+
+
+def test_session_store_never_evicts_a_log_in_use(tmp_path):
+    from utils.session_store import SessionStore
+
+    store = SessionStore(str(tmp_path / "sessions"), capacity=4, max_open=1)
+    with store._log("a") as a:
+        # "b" pushes the store over max_open while "a" is still held
+        store.append("b", {"role": "user", "content": "b-0"})
+        a.append({"role": "user", "content": "a-0"})
+        with store._log("a") as again:
+            assert again is a
+    assert store.open_sessions() == 1
+    assert [m["content"] for m in store.recent("a", 1)] == ["a-0"]
+    store.close()
+    assert a._file._fd is None and store.open_sessions() == 0
+
+
+def test_concurrent_appends_are_group_committed_as_whole_lines(tmp_path):
+    import json
+    import threading
+    from utils.append_writer import append_writer
+    from utils.message_log import MessageLog
+
+    path = tmp_path / "messages.jsonl"
+    log = MessageLog(str(path), capacity=1000, fsync="always")
+    before = append_writer.snapshot()
+    barrier = threading.Barrier(16)
+
+    def worker(w):
+        barrier.wait()
+        for i in range(25):
+            log.append({"role": "user", "content": f"w{w}-{i}" + "x" * 500})
+
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    log.close()
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 400
+    on_disk = [json.loads(ln)["content"] for ln in lines]
+    assert on_disk == [m["content"] for m in log.recent(400)]
+    after = append_writer.snapshot()
+    # 400 records needed fewer than 400 write+fsync rounds
+    assert after["groups"] - before["groups"] < after["records"] - before["records"]
@@ -0,0 +1,39 @@
+import io
+import json
+import time
+
+
+def _wait_for(client, job_id, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        st = client.get(f"/ingest/jobs/{job_id}").json()
+        if st["status"] not in ("queued", "running"):
+            return st
+        time.sleep(0.05)
+    raise AssertionError("ingest job did not finish")
+
+
+def test_ingest_job_processes_files_in_background(client):
+    export = {"messages": [{"text": f"message {i}"} for i in range(30)]}
+    files = [
+        ("files", ("export.json", io.BytesIO(json.dumps(export).encode("utf-8")), "application/json")),
+        ("files", ("notes.txt", io.BytesIO(b"Hello there. A second memory."), "text/plain")),
+    ]
+    r = client.post("/ingest/jobs", files=files, data={"source": "whatsapp", "tags": "trip"})
+    assert r.status_code == 200
+    job = r.json()
+    assert job["total_files"] == 2
+    assert job["bytes_total"] > 0
+
+    st = _wait_for(client, job["job_id"])
+    assert st["status"] == "completed"
+    assert st["files_done"] == 2
+    assert st["chunks_done"] == 31
+    assert st["bytes_done"] == st["bytes_total"]
+    assert st["eta_sec"] == 0.0
+    assert sorted(f["kind"] for f in st["files"]) == ["json", "text"]
+
+
+def test_ingest_job_status_not_found(client):
+    r = client.get("/ingest/jobs/ing_missing")
+    assert r.status_code == 404
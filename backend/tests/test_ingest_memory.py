@@ -17,3 +17,196 @@ def test_ingest_text_writes_embeddings(client):
     with open(settings.MEMORY_FILE, "r", encoding="utf-8") as f:
         lines = [ln for ln in f.readlines() if ln.strip()]
     assert len(lines) >= 1
+
+
+class _RecordingStore:
+    def __init__(self):
+        self.batches = []
+        self.flushes = 0
+
+    def add_many(self, texts, tags):
+        self.batches.append((list(texts), list(tags)))
+        return [f"mem_{len(self.batches)}_{i}" for i in range(len(texts))]
+
+    def flush(self):
+        self.flushes += 1
+
+
+def test_ingest_json_uses_bulk_insert_and_single_flush(client, monkeypatch):
+    import json
+    from services import embedding_service
+
+    store = _RecordingStore()
+    monkeypatch.setattr(embedding_service, "memory_store", store)
+    export = {"messages": [{"text": f"message {i}"} for i in range(50)]}
+    files = [
+        ("files", ("export.json", io.BytesIO(json.dumps(export).encode("utf-8")), "application/json")),
+        ("files", ("notes.txt", io.BytesIO(b"one more memory"), "text/plain")),
+    ]
+    r = client.post("/ingest/upload", files=files, data={"source": "telegram"})
+    assert r.status_code == 200
+    assert r.json()["total_embeddings"] == 51
+    assert [len(texts) for texts, _tags in store.batches] == [50, 1]
+    assert store.batches[0][1] == ["telegram"]
+    assert store.flushes == 1
+
+
+def test_reingesting_overlapping_exports_stores_unique_chunks_only(client, monkeypatch):
+    import json
+    from services import embedding_service
+
+    store = _RecordingStore()
+    monkeypatch.setattr(embedding_service, "memory_store", store)
+    long_text = (
+        "we spent the whole weekend at the cabin by the lake, cooking pasta, playing cards late into the night, "
+        "walking the dog along the shore every morning and talking about where we wanted to live in five years, "
+        "whether we should finally get a bigger place, and how much we both missed the city sometimes even though "
+        "the quiet was exactly what we needed"
+    )
+    first = {"messages": [{"text": f"message number {i} about the trip we took to the mountains last summer"} for i in range(4)]}
+    first["messages"].append({"text": long_text})
+    # overlapping export: same messages, one re-cased and re-spaced, one lightly edited, plus two new ones
+    second = {"messages": [
+        {"text": "MESSAGE number 0  about the trip we took to the mountains last summer"},
+        {"text": "message number 1 about the trip we took to the mountains last summer!"},
+        {"text": long_text.replace("pasta", "risotto")},
+        {"text": "a completely different note on groceries, bills and the car service appointment"},
+        {"text": "another new entry describing the concert downtown with loud music and friends"},
+    ]}
+    for payload in (first, second):
+        files = {"files": ("chats.json", io.BytesIO(json.dumps(payload).encode()), "application/json")}
+        assert client.post("/ingest/upload", files=files).status_code == 200
+
+    stored = [t for texts, _tags in store.batches for t in texts]
+    assert len(stored) == 7
+    assert stored[-2].startswith("a completely different note")
+
+    # the fingerprint index persists: a fresh process still skips known content
+    from config import settings
+    from services.ingestion_service import _fingerprint_path
+    from utils.dedup import FingerprintIndex
+
+    keep, _ = FingerprintIndex(_fingerprint_path(), settings.DEDUP_NEAR_DISTANCE).claim(
+        stored[:1] + ["brand new text"], store.batches[0][1]
+    )
+    assert keep == [1]
+
+
+def test_failed_store_write_releases_fingerprints(client, monkeypatch):
+    from services import embedding_service
+    from services.ingestion_service import _ingest_text_content
+
+    class _Failing(_RecordingStore):
+        def add_many(self, texts, tags):
+            raise RuntimeError("store down")
+
+    monkeypatch.setattr(embedding_service, "memory_store", _Failing())
+    try:
+        _ingest_text_content("remember the lighthouse", [])
+    except RuntimeError:
+        pass
+    store = _RecordingStore()
+    monkeypatch.setattr(embedding_service, "memory_store", store)
+    assert len(_ingest_text_content("remember the lighthouse", [])) == 1
+
+
+def test_memory_search_filters_by_source(client, monkeypatch, tmp_path):
+    from services import embedding_service
+
+    store = embedding_service._FileMemoryStore(str(tmp_path / "memory.jsonl"))
+    monkeypatch.setattr(embedding_service, "memory_store", store)
+    for source in ("telegram", "whatsapp"):
+        files = [("files", ("notes.txt", io.BytesIO(f"dinner plans from {source}".encode("utf-8")), "text/plain"))]
+        assert client.post("/ingest/upload", files=files, data={"source": source}).status_code == 200
+
+    r = client.post("/memory/search", json={"query": "dinner plans", "source": "whatsapp"})
+    assert r.status_code == 200
+    assert r.json()["results"] == ["dinner plans from whatsapp"]
+    assert len(client.post("/memory/search", json={"query": "dinner plans"}).json()["results"]) == 2
+
+    # the same text under another source is not a duplicate: it is stored and found by that source
+    files = [("files", ("notes.txt", io.BytesIO(b"dinner plans from telegram"), "text/plain"))]
+    assert client.post("/ingest/upload", files=files, data={"source": "signal"}).status_code == 200
+    r = client.post("/memory/search", json={"query": "dinner plans", "source": "signal"})
+    assert r.json()["results"] == ["dinner plans from telegram"]
+
+
+def test_user_memories_are_partitioned(client, monkeypatch, tmp_path):
+    from services import embedding_service
+
+    for user in ("alice", "bob"):
+        files = [("files", ("notes.txt", io.BytesIO(f"weekend plans with {user} and the same shared line".encode("utf-8")), "text/plain"))]
+        r = client.post("/ingest/upload", files=files, data={"source": "telegram", "user_id": user})
+        # dedup is per user too, so bob's copy of a shared line is kept
+        assert r.json()["total_embeddings"] == 1
+    client.post("/memory/upload", json={"text": "global weekend note"})
+
+    def search(user=None):
+        return client.post("/memory/search", json={"query": "weekend plans", "user_id": user}).json()["results"]
+
+    assert search("alice") == ["weekend plans with alice and the same shared line"]
+    assert search("bob") == ["weekend plans with bob and the same shared line"]
+    assert search() == ["global weekend note"]
+    assert search("carol") == []
+    assert os.path.exists(embedding_service.tenant_memory_path("alice"))
+
+
+def test_tenant_stores_are_bounded_lru_and_never_close_a_store_in_use(tmp_path):
+    from services import embedding_service
+
+    closed = []
+
+    class _Store:
+        def __init__(self, user):
+            self.user = user
+
+        def close(self):
+            closed.append(self.user)
+
+    stores = embedding_service._TenantStores(_Store, max_open=2)
+    a = stores.acquire("a")
+    stores.release("a")
+    stores.acquire("b")
+    stores.release("b")
+    assert stores.acquire("a") is a  # refreshes "a"
+    stores.release("a")
+    stores.acquire("c")
+    stores.release("c")
+    assert closed == ["b"] and stores.open_tenants() == 2
+
+    # a store someone is still using is not evicted, and its user gets the same instance back
+    held = stores.acquire("a")
+    for user in ("d", "e"):
+        stores.acquire(user)
+        stores.release(user)
+    assert "a" not in closed and stores.acquire("a") is held
+    assert closed == ["b", "c", "d"]
+    stores.release("a")
+    stores.release("a")
+    stores.close()
+    assert "a" in closed and stores.open_tenants() == 0
+
+
+def test_opening_a_tenant_store_does_not_block_other_users(tmp_path):
+    import threading
+    from services import embedding_service
+
+    opening, slow_open = threading.Event(), threading.Event()
+
+    def factory(user):
+        if user == "slow":
+            opening.set()
+            assert slow_open.wait(5)
+        return user
+
+    stores = embedding_service._TenantStores(factory, max_open=4)
+    opener = threading.Thread(target=lambda: stores.release(stores.acquire("slow")))
+    opener.start()
+    assert opening.wait(5)
+    # "slow" is still opening; other users are served meanwhile
+    assert stores.acquire("fast") == "fast"
+    stores.release("fast")
+    slow_open.set()
+    opener.join(5)
+    assert not opener.is_alive() and stores.open_tenants() == 2
+    stores.close()
@@ -0,0 +1,67 @@
+import threading
+import time
+
+import pytest
+
+from services.model_registry import ModelRegistry
+
+
+def test_models_load_lazily_and_once():
+    reg = ModelRegistry()
+    calls = []
+
+    def load():
+        calls.append(1)
+        time.sleep(0.05)
+        return object()
+
+    reg.register("m", load)
+    assert calls == []
+    assert reg.snapshot()["m"]["status"] == "unloaded"
+
+    got = []
+    threads = [threading.Thread(target=lambda: got.append(reg.get("m"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert all(g is got[0] for g in got)
+    snap = reg.snapshot()["m"]
+    assert snap["status"] == "ready"
+    assert snap["load_sec"] >= 0.05
+
+
+def test_failed_load_is_reported_not_retried():
+    reg = ModelRegistry()
+    calls = []
+
+    def load():
+        calls.append(1)
+        raise RuntimeError("no weights")
+
+    reg.register("broken", load)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            reg.get("broken")
+    assert len(calls) == 1
+    assert "no weights" in reg.snapshot()["broken"]["error"]
+
+
+def test_background_warmup_flips_readiness():
+    reg = ModelRegistry()
+    release = threading.Event()
+    reg.register("slow", lambda: release.wait(5) and "model")
+    thread = reg.warm_up(["slow"])
+    assert not reg.ready()
+    release.set()
+    thread.join(5)
+    assert reg.ready()
+    assert reg.get("slow") == "model"
+
+
+def test_health_ready_endpoint(client):
+    r = client.get("/health/ready")
+    assert r.status_code == 200
+    assert r.json()["ready"] is True
+    assert "models" in client.get("/health").json()
@@ -0,0 +1,78 @@
+import io
+import json
+
+from utils.cleaning_utils import chunk_text, clean_text, iter_clean_chunks
+from utils.stream_utils import iter_json_items
+
+
+def _pieces(data, size):
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+def test_iter_json_items_streams_messages_across_chunks():
+    doc = {
+        "name": "Alex",
+        "meta": {"count": 3, "tags": ["a", "b"]},
+        "messages": [{"text": "héllo ✓"}, {"text": ["rich ", {"type": "bold"}, "parts"]}, 12.5, "plain"],
+    }
+    data = json.dumps(doc, ensure_ascii=False).encode("utf-8")
+    for size in (1, 3, 7, 64):
+        assert list(iter_json_items(_pieces(data, size))) == doc["messages"]
+
+
+def test_iter_json_items_root_array_and_truncated_input():
+    assert list(iter_json_items(_pieces(b'[1, "two", {"text": "x"}]', 2))) == [1, "two", {"text": "x"}]
+    assert list(iter_json_items([b'{"messages": [{"text": "a"}, {"te'])) == [{"text": "a"}]
+    assert list(iter_json_items([b"not json"])) == []
+
+
+def test_iter_json_items_prefers_messages_over_chats_in_any_order():
+    both = [{"chats": [1, 2], "messages": [3]}, {"messages": [3], "chats": [1, 2]}]
+    for doc in both:
+        assert list(iter_json_items(_pieces(json.dumps(doc).encode(), 5))) == [3]
+    assert list(iter_json_items([b'{"chats": [1, 2], "messages": []}'])) == [1, 2]
+    assert list(iter_json_items([b'{"chats": [1, 2], "other": {"messages": [9]}}'])) == [1, 2]
+
+
+def test_iter_json_items_skips_large_values_in_linear_time():
+    import time
+
+    def doc(n):
+        # a Telegram-style export: the wanted array sits after one huge non-array value
+        skipped = {"list": [{"text": 'say "hi" \\ [not a bracket] {', "id": i, "ok": True} for i in range(n)]}
+        return json.dumps({"chats": skipped, "note": "x" * 1000, "messages": [{"text": "kept"}]}).encode()
+
+    def parse_time(data):
+        best = float("inf")
+        for _ in range(3):
+            t0 = time.perf_counter()
+            assert list(iter_json_items(_pieces(data, 8192))) == [{"text": "kept"}]
+            best = min(best, time.perf_counter() - t0)
+        return best
+
+    small, large = doc(10_000), doc(80_000)  # ~0.6 MB and ~4.8 MB
+    # decoding each skipped value whole would grow ~64x here
+    assert parse_time(large) < 24 * parse_time(small)
+    assert list(iter_json_items([b'{"chats": "a\\"b", "messages": [1]}'])) == [1]
+    assert list(iter_json_items([b'{"n": -1.5e3, "messages": [2]}'])) == [2]
+
+
+def test_iter_clean_chunks_matches_one_shot_chunking():
+    raw = ("We went to the lake.\n\tIt was cold   but lovely. " * 60) + "\x01The end"
+    expected = [c for c in chunk_text(clean_text(raw)) if c]
+    for size in (5, 97, 1000):
+        assert list(iter_clean_chunks(_pieces(raw, size))) == expected
+
+
+def test_ingest_upload_streams_large_json(client, monkeypatch):
+    from config import settings
+
+    monkeypatch.setattr(settings, "INGEST_READ_CHUNK_BYTES", 256)
+    monkeypatch.setattr(settings, "EMBEDDING_BATCH_SIZE", 16)
+    export = {"name": "chat", "messages": [{"text": f"message number {i}"} for i in range(200)]}
+    files = {"files": ("result.json", io.BytesIO(json.dumps(export).encode("utf-8")), "application/json")}
+    r = client.post("/ingest/upload", files=files, data={"source": "telegram"})
+    assert r.status_code == 200
+    data = r.json()
+    assert data["items"][0]["kind"] == "json"
+    assert data["total_embeddings"] == 200
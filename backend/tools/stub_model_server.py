@@ -0,0 +1,62 @@
+"""Local stand-in for the self-hosted model server, for testing the generic backend.
+
+Serves the single-prompt endpoint (`/model/infer`) and the batched one
+(`/model/infer_batch`). Each call sleeps for a fixed overhead plus a small
+per-prompt cost, so batching pays off the same way it does on a GPU server.
+
+    uvicorn tools.stub_model_server:app --port 9000
+    MODEL_BASE_URL=http://localhost:9000 MODEL_BATCH_ENABLED=true uvicorn main:app
+"""
+import asyncio
+import os
+from typing import List, Optional
+
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+CALL_OVERHEAD_MS = float(os.getenv("STUB_CALL_OVERHEAD_MS", "50"))
+PER_PROMPT_MS = float(os.getenv("STUB_PER_PROMPT_MS", "2"))
+
+app = FastAPI(title="helloEx stub model server")
+app.state.calls = 0
+app.state.batch_sizes = []
+
+
+class InferRequest(BaseModel):
+    prompt: str
+    max_tokens: Optional[int] = 200
+
+
+class BatchInferRequest(BaseModel):
+    prompts: List[str]
+    max_tokens: Optional[int] = 200
+
+
+def _reply(prompt: str) -> str:
+    tail = prompt.strip().split("\n")[-1]
+    return f"stub reply to: {tail[:120]}"
+
+
+async def _work(n: int) -> None:
+    # recorded on arrival, so the log follows dispatch order rather than completion
+    app.state.calls += 1
+    app.state.batch_sizes.append(n)
+    await asyncio.sleep((CALL_OVERHEAD_MS + PER_PROMPT_MS * n) / 1000.0)
+
+
+@app.post("/model/infer")
+async def infer(req: InferRequest):
+    await _work(1)
+    return {"text": _reply(req.prompt)}
+
+
+@app.post("/model/infer_batch")
+async def infer_batch(req: BatchInferRequest):
+    await _work(len(req.prompts))
+    return {"results": [{"text": _reply(p)} for p in req.prompts]}
+
+
+@app.get("/stats")
+async def stats():
+    sizes = app.state.batch_sizes
+    return {"calls": app.state.calls, "prompts": sum(sizes), "batch_sizes": sizes[-100:]}
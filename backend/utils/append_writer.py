@@ -0,0 +1,165 @@
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Protocol, Tuple
+
+FSYNC_POLICIES = ("always", "interval", "never")
+
+
+class CommitTarget(Protocol):
+    def commit(self, payloads: List[Any]) -> None: ...
+
+
+class _Ticket:
+    __slots__ = ("done", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+    def wait(self) -> None:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+
+
+class AppendWriter:
+    """Single writer thread that group-commits appends from concurrent callers.
+
+    Callers enqueue `(target, payload)` and block until it is durable per the
+    target's policy. The writer drains everything queued since its last pass,
+    groups it by target in arrival order and calls `target.commit(payloads)`
+    once per target, so N concurrent appends cost one write (and at most one
+    fsync) instead of N. Because only this thread writes, records never
+    interleave and each commit lands as whole lines.
+    """
+
+    def __init__(self):
+        self._queue: "queue.Queue[Tuple[CommitTarget, Any, _Ticket]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.groups = 0
+        self.records = 0
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="append-writer", daemon=True)
+                self._thread.start()
+
+    def enqueue(self, target: CommitTarget, payload: Any) -> _Ticket:
+        """Queue a payload without waiting; call `.wait()` on the result."""
+        self._ensure_started()
+        ticket = _Ticket()
+        self._queue.put((target, payload, ticket))
+        return ticket
+
+    def submit(self, target: CommitTarget, payload: Any) -> None:
+        self.enqueue(target, payload).wait()
+
+    def call(self, fn: Callable[[], None]) -> None:
+        """Run `fn` on the writer thread, after everything queued before it."""
+        self.submit(_Call(fn), None)
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            groups: Dict[int, Tuple[CommitTarget, List[Any], List[_Ticket]]] = {}
+            for target, payload, ticket in batch:
+                entry = groups.setdefault(id(target), (target, [], []))
+                entry[1].append(payload)
+                entry[2].append(ticket)
+            for target, payloads, tickets in groups.values():
+                error: Optional[BaseException] = None
+                try:
+                    target.commit(payloads)
+                except BaseException as e:  # handed to the waiting callers
+                    error = e
+                self.groups += 1
+                self.records += len(payloads)
+                for ticket in tickets:
+                    ticket.error = error
+                    ticket.done.set()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "groups": self.groups,
+            "records": self.records,
+            "avg_group_size": round(self.records / self.groups, 2) if self.groups else 0.0,
+        }
+
+
+class SyncPolicy:
+    """Decide when an append file descriptor gets fsync'd."""
+
+    def __init__(self, fsync: str = "interval", interval: float = 1.0):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.fsync = fsync
+        self.interval = interval
+        self._last = time.monotonic()
+
+    def after_write(self, *fds: int) -> None:
+        if self.fsync == "never":
+            return
+        now = time.monotonic()
+        if self.fsync == "always" or now - self._last >= self.interval:
+            for fd in fds:
+                os.fsync(fd)
+            self._last = now
+
+
+def write_all(fd: int, data: bytes) -> None:
+    view = memoryview(data)
+    while view:
+        n = os.write(fd, view)
+        view = view[n:]
+
+
+def open_append(path: str) -> int:
+    return os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+
+class LineFile:
+    """Commit target for an append-only line file: one write per group."""
+
+    def __init__(self, path: str, fsync: str = "interval", fsync_interval: float = 1.0):
+        self.path = path
+        self.sync = SyncPolicy(fsync, fsync_interval)
+        self._fd: Optional[int] = None
+
+    def commit(self, payloads: List[bytes]) -> None:
+        if self._fd is None:
+            self._fd = open_append(self.path)
+        write_all(self._fd, b"".join(payloads))
+        self.sync.after_write(self._fd)
+
+    def close(self) -> None:
+        # only the writer thread touches the fd, so close it there too
+        append_writer.call(self._close_fd)
+
+    def _close_fd(self) -> None:
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            if self.sync.fsync != "never":
+                os.fsync(fd)
+            os.close(fd)
+
+
+class _Call:
+    def __init__(self, fn: Callable[[], None]):
+        self.fn = fn
+
+    def commit(self, payloads: List[Any]) -> None:
+        self.fn()
+
+
+append_writer = AppendWriter()
@@ -0,0 +1,42 @@
+import asyncio
+import functools
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from config import settings
+
+T = TypeVar("T")
+
+_executor: Optional[Executor] = None
+
+
+def get_executor() -> Executor:
+    """Dedicated pool for blocking store I/O (vector stores, message log).
+
+    Kept separate from the default executor so slow storage calls cannot
+    starve `asyncio.to_thread` users such as the model and TTS backends.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=max(1, settings.STORE_EXECUTOR_WORKERS), thread_name_prefix="store")
+    return _executor
+
+
+_build_executor: Optional[Executor] = None
+
+
+def get_build_executor() -> Executor:
+    """Single background thread for index training (IVF centroids, quantizer codebooks).
+
+    Training can take seconds on large stores; running it here keeps it off
+    the append writer, which also commits the chat message log.
+    """
+    global _build_executor
+    if _build_executor is None:
+        _build_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="index-build")
+    return _build_executor
+
+
+async def run_blocking(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(fn, *args, **kwargs))
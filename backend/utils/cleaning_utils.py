@@ -1,5 +1,5 @@
 import re
-from typing import List
+from typing import Iterable, Iterator, List, Tuple
 
 
 def normalize_whitespace(text: str) -> str:
@@ -14,6 +14,16 @@ def clean_text(text: str) -> str:
     return normalize_whitespace(strip_control_chars(text))
 
 
+def _split_chunk(text: str, start: int, max_chars: int) -> Tuple[str, int]:
+    end = min(len(text), start + max_chars)
+    # try split on sentence boundary
+    slice_ = text[start:end]
+    last_dot = slice_.rfind(".")
+    if last_dot > 200:  # arbitrary
+        end = start + last_dot + 1
+    return text[start:end].strip(), end
+
+
 def chunk_text(text: str, max_chars: int = 800) -> List[str]:
     text = text or ""
     if len(text) <= max_chars:
@@ -21,12 +31,47 @@ def chunk_text(text: str, max_chars: int = 800) -> List[str]:
     chunks: List[str] = []
     start = 0
     while start < len(text):
-        end = min(len(text), start + max_chars)
-        # try split on sentence boundary
-        slice_ = text[start:end]
-        last_dot = slice_.rfind(".")
-        if last_dot > 200:  # arbitrary
-            end = start + last_dot + 1
-        chunks.append(text[start:end].strip())
-        start = end
+        chunk, start = _split_chunk(text, start, max_chars)
+        chunks.append(chunk)
     return [c for c in chunks if c]
+
+
+def iter_clean_chunks(pieces: Iterable[str], max_chars: int = 800) -> Iterator[str]:
+    """Streaming `chunk_text(clean_text(...))` over text arriving in pieces.
+
+    Yields the same chunks as the one-shot version while holding at most a few
+    `max_chars` of text, so arbitrarily large inputs use bounded memory.
+    """
+    buf = ""
+    pending_space = False
+    emitted = False
+    for piece in pieces:
+        piece = strip_control_chars(piece)
+        if not piece:
+            continue
+        core = normalize_whitespace(piece)
+        if core:
+            if buf and (pending_space or piece[0].isspace()):
+                buf += " "
+            buf += core
+            pending_space = piece[-1].isspace()
+        else:
+            pending_space = True
+        # a full window is only final once more text is known to follow it
+        start = 0
+        while len(buf) - start > max_chars:
+            emitted = True
+            chunk, start = _split_chunk(buf, start, max_chars)
+            if chunk:
+                yield chunk
+        buf = buf[start:]
+    if not emitted:
+        # short inputs are kept whole, as in chunk_text
+        if buf:
+            yield buf
+        return
+    start = 0
+    while start < len(buf):
+        chunk, start = _split_chunk(buf, start, max_chars)
+        if chunk:
+            yield chunk
@@ -0,0 +1,190 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Sequence, Set, Tuple
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"\w+")
+_SHINGLE = 3
+_NEAR_MIN_TOKENS = 8  # shorter texts are matched exactly only
+_RECORD = np.dtype([("digest", "S16"), ("simhash", "<u8")])
+
+Fingerprint = Tuple[bytes, int]
+
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def _scope_key(scope: Sequence[str]) -> bytes:
+    return "\x1f".join(sorted(set(scope or []))).encode("utf-8")
+
+
+def exact_digest(text: str, scope: Sequence[str] = ()) -> bytes:
+    """Hash of the normalized token stream, so case and spacing don't matter."""
+    h = hashlib.blake2b(" ".join(_tokens(text)).encode("utf-8"), digest_size=16)
+    if scope:
+        h.update(b"\x00" + _scope_key(scope))
+    return h.digest()
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over word 3-shingles; similar texts differ in few bits."""
+    tokens = _tokens(text)
+    if len(tokens) < _NEAR_MIN_TOKENS:
+        return 0
+    shingles = {" ".join(tokens[i:i + _SHINGLE]) for i in range(len(tokens) - _SHINGLE + 1)}
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+    bits = (hashes[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(hashes)
+    return int(np.packbits((votes > 0).astype(np.uint8), bitorder="little").view("<u8")[0])
+
+
+def fingerprint(text: str, scope: Sequence[str] = ()) -> Fingerprint:
+    """Digest and SimHash of `text` within `scope` (a tag set, e.g. the ingest source).
+
+    The SimHash is XORed with a per-scope mask: distances inside one scope are
+    unchanged, while hashes from different scopes land ~32 bits apart and
+    never match.
+    """
+    sh = simhash(text)
+    if sh and scope:
+        sh ^= int.from_bytes(hashlib.blake2b(_scope_key(scope), digest_size=8).digest(), "little") or 1
+    return exact_digest(text, scope), sh
+
+
+class FingerprintIndex:
+    """Persistent exact + near-duplicate index of ingested chunks.
+
+    Each stored chunk is one fixed-width record (16-byte digest, 64-bit
+    SimHash) appended to `path`. Near-duplicate lookup splits the SimHash into
+    `max_distance + 1` bands: two hashes within `max_distance` bits of each
+    other agree exactly on at least one band, so only texts in matching band
+    buckets are compared, as one vectorized popcount per bucket.
+    `max_distance=0` disables near matching. Fingerprints are scoped by the
+    chunk's tags, so the same text under another source is not a duplicate.
+    `claim` reserves fingerprints in memory before the store write; `commit`
+    persists them once the write succeeds and `release` drops them if it
+    fails.
+    """
+
+    def __init__(self, path: str, max_distance: int = 5):
+        self.path = path
+        self.max_distance = max(0, min(max_distance, 15))
+        n = self.max_distance + 1
+        widths = [64 // n + (1 if i < 64 % n else 0) for i in range(n)]
+        starts = np.cumsum([0] + widths[:-1]).tolist()
+        self._band_spec = [(start, (1 << width) - 1) for start, width in zip(starts, widths)]
+        self._lock = threading.Lock()
+        self._exact: Set[bytes] = set()
+        self._bands: List[Dict[int, np.ndarray]] = [{} for _ in self._band_spec]
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        size = os.path.getsize(self.path)
+        if size % _RECORD.itemsize:
+            # drop a record torn by an interrupted append
+            with open(self.path, "r+b") as f:
+                f.truncate(size - size % _RECORD.itemsize)
+        records = np.fromfile(self.path, dtype=_RECORD, count=size // _RECORD.itemsize)
+        self._exact.update(records["digest"].tolist())
+        hashes = records["simhash"][records["simhash"] != 0]
+        if not self.max_distance or not len(hashes):
+            return
+        for (start, mask), table in zip(self._band_spec, self._bands):
+            # group by band key in one sort instead of one dict insert per record
+            keys = (hashes >> np.uint64(start)) & np.uint64(mask)
+            order = np.argsort(keys, kind="stable")
+            keys, grouped = keys[order], hashes[order]
+            bounds = np.flatnonzero(np.diff(keys)) + 1
+            firsts = np.concatenate(([0], bounds))
+            table.update(zip(keys[firsts].tolist(), np.split(grouped, bounds)))
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    def _keys(self, sh: int) -> List[int]:
+        return [(sh >> start) & mask for start, mask in self._band_spec]
+
+    def _add(self, digest: bytes, sh: int) -> None:
+        self._exact.add(digest)
+        if sh and self.max_distance:
+            value = np.array([sh], dtype=np.uint64)
+            for key, table in zip(self._keys(sh), self._bands):
+                bucket = table.get(key)
+                table[key] = value if bucket is None else np.concatenate((bucket, value))
+
+    def _remove(self, digest: bytes, sh: int) -> None:
+        self._exact.discard(digest)
+        if sh and self.max_distance:
+            for key, table in zip(self._keys(sh), self._bands):
+                bucket = table.get(key)
+                if bucket is None:
+                    continue
+                hits = np.flatnonzero(bucket == np.uint64(sh))
+                if len(hits):
+                    table[key] = np.delete(bucket, hits[0])
+
+    def _near(self, sh: int) -> bool:
+        if not sh or self.max_distance == 0:
+            return False
+        target = np.uint64(sh)
+        for key, table in zip(self._keys(sh), self._bands):
+            bucket = table.get(key)
+            if bucket is not None and len(bucket) and np.bitwise_count(bucket ^ target).min() <= self.max_distance:
+                return True
+        return False
+
+    def claim(self, texts: List[str], scope: Sequence[str] = ()) -> Tuple[List[int], List[Fingerprint]]:
+        """Return the positions of texts that are new within `scope`, reserving their fingerprints."""
+        prints = [fingerprint(t, scope) for t in texts]
+        keep: List[int] = []
+        claimed: List[Fingerprint] = []
+        with self._lock:
+            for i, (digest, sh) in enumerate(prints):
+                if digest in self._exact or self._near(sh):
+                    continue
+                self._add(digest, sh)
+                keep.append(i)
+                claimed.append((digest, sh))
+        return keep, claimed
+
+    def commit(self, prints: List[Fingerprint]) -> None:
+        if not prints:
+            return
+        records = np.array(prints, dtype=_RECORD)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._lock:
+            with open(self.path, "ab") as f:
+                f.write(records.tobytes())
+
+    def release(self, prints: List[Fingerprint]) -> None:
+        with self._lock:
+            for digest, sh in prints:
+                self._remove(digest, sh)
+
+
+_index_lock = threading.Lock()
+_indexes: "OrderedDict[str, FingerprintIndex]" = OrderedDict()
+
+
+def get_fingerprint_index(path: str, max_distance: int, max_open: int = 64) -> FingerprintIndex:
+    """Process-wide index for `path`; the `max_open` most recently used paths stay loaded."""
+    max_distance = max(0, min(max_distance, 15))
+    with _index_lock:
+        index = _indexes.get(path)
+        if index is None or index.max_distance != max_distance:
+            index = _indexes[path] = FingerprintIndex(path, max_distance)
+        _indexes.move_to_end(path)
+        while len(_indexes) > max(1, max_open):
+            _indexes.popitem(last=False)
+        return index
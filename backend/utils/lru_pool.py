@@ -0,0 +1,112 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Generic, List, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class _Entry(Generic[T]):
+    __slots__ = ("value", "refs")
+
+    def __init__(self, value: T):
+        self.value = value
+        self.refs = 0
+
+
+class RefCountedLRU(Generic[T]):
+    """Keyed pool of open resources, reference-counted, with a bounded LRU of idle ones.
+
+    `acquire(key)` returns the open resource for `key`, opening it with
+    `opener(key)` outside the pool lock so a slow open never blocks other
+    keys; concurrent callers for the same key wait for that one open. Every
+    `acquire` is paired with a `release`. Only idle resources are evicted
+    (closed with `closer`), so a resource is never closed while in use and
+    there is never more than one open instance per key. At most `max_open`
+    idle resources stay open; resources in use may push the count above it
+    for a while.
+    """
+
+    def __init__(self, opener: Callable[[str], T], closer: Callable[[T], None], max_open: int):
+        self.opener = opener
+        self.closer = closer
+        self.max_open = max(1, max_open)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry[T]]" = OrderedDict()
+        # keys being opened or closed; callers wait for these instead of racing them
+        self._pending: Dict[str, threading.Event] = {}
+
+    def acquire(self, key: str) -> T:
+        while True:
+            with self._lock:
+                pending = self._pending.get(key)
+                if pending is None:
+                    entry = self._entries.get(key)
+                    if entry is not None:
+                        self._entries.move_to_end(key)
+                        entry.refs += 1
+                        return entry.value
+                    opening = self._pending[key] = threading.Event()
+                    break
+            pending.wait()
+        try:
+            value = self.opener(key)
+        except BaseException:
+            with self._lock:
+                self._pending.pop(key).set()
+            raise
+        with self._lock:
+            entry = self._entries[key] = _Entry(value)
+            entry.refs = 1
+            self._pending.pop(key)
+        opening.set()
+        return value
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.refs -= 1
+            evicted = self._evict_idle()
+        self._close(evicted)
+
+    def _evict_idle(self) -> List[Tuple[str, T]]:
+        evicted = []
+        excess = len(self._entries) - self.max_open
+        for key in list(self._entries):
+            if excess <= 0:
+                break
+            entry = self._entries[key]
+            if entry.refs <= 0:
+                del self._entries[key]
+                self._pending[key] = threading.Event()
+                evicted.append((key, entry.value))
+                excess -= 1
+        return evicted
+
+    def _close(self, evicted: List[Tuple[str, T]]) -> None:
+        errors: List[Exception] = []
+        for key, value in evicted:
+            try:
+                self.closer(value)
+            except Exception as exc:
+                # keep closing the rest: each key's waiters must be woken
+                errors.append(exc)
+            finally:
+                with self._lock:
+                    self._pending.pop(key).set()
+        if errors:
+            raise errors[0]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def close(self) -> None:
+        with self._lock:
+            evicted = [(key, e.value) for key, e in self._entries.items()]
+            self._entries.clear()
+            for key, _value in evicted:
+                self._pending[key] = threading.Event()
+        self._close(evicted)
@@ -0,0 +1,109 @@
+import json
+import os
+import threading
+from collections import deque
+from typing import Deque, List, Optional
+
+from utils.append_writer import LineFile, append_writer
+
+_TAIL_BLOCK = 64 * 1024
+
+
+def _parse(line: bytes) -> Optional[dict]:
+    try:
+        obj = json.loads(line)
+    except Exception:
+        return None
+    if isinstance(obj, dict) and "role" in obj and "content" in obj:
+        return obj
+    return None
+
+
+def read_tail(path: str, n: int) -> List[dict]:
+    """Return the last n messages of a JSONL log, reading backwards from EOF.
+
+    Only the blocks covering those lines are read, so the cost follows n and
+    not the size of the file.
+    """
+    if n <= 0 or not os.path.exists(path):
+        return []
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        buf = b""
+        # n complete lines need n + 1 newlines unless we reach the start
+        while pos > 0 and buf.count(b"\n") <= n:
+            step = min(_TAIL_BLOCK, pos)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+    lines = buf.split(b"\n")
+    if pos > 0:
+        lines = lines[1:]  # first piece may start mid-line
+    msgs = [m for m in (_parse(ln) for ln in lines if ln.strip()) if m is not None]
+    return msgs[-n:]
+
+
+class MessageLog:
+    """Append-only JSONL message log with an in-memory window of recent messages.
+
+    The window is warmed once from the tail of the file; afterwards reads are
+    served from memory. Writes go through the shared append writer, which
+    group-commits lines from concurrent callers into one write and applies the
+    `fsync` policy: "always" (every commit), "interval" (at most every
+    `fsync_interval` seconds) or "never" (leave it to the OS).
+    """
+
+    def __init__(self, path: str, capacity: int = 256, fsync: str = "interval", fsync_interval: float = 1.0):
+        self.path = path
+        self.capacity = max(1, capacity)
+        self._file = LineFile(path, fsync, fsync_interval)
+        self._lock = threading.Lock()
+        self._recent: Deque[dict] = deque(maxlen=self.capacity)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._drop_torn_tail()
+        self._recent.extend(read_tail(self.path, self.capacity))
+
+    def _drop_torn_tail(self) -> None:
+        # a crash mid-write leaves a line without its newline; the next
+        # append would be glued onto it, so cut it off first
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+            pos = size
+            while pos > 0:
+                step = min(_TAIL_BLOCK, pos)
+                pos -= step
+                f.seek(pos)
+                idx = f.read(step).rfind(b"\n")
+                if idx >= 0:
+                    f.truncate(pos + idx + 1)
+                    return
+            f.truncate(0)
+
+    def append(self, rec: dict) -> None:
+        line = (json.dumps(rec) + "\n").encode("utf-8")
+        # queue under the lock so file order matches window order, but wait
+        # for the commit outside it so concurrent appends share one write
+        with self._lock:
+            ticket = append_writer.enqueue(self._file, line)
+            self._recent.append(rec)
+        ticket.wait()
+
+    def recent(self, n: int) -> List[dict]:
+        if n <= 0:
+            return []
+        if n > self.capacity:
+            return read_tail(self.path, n)
+        with self._lock:
+            items = list(self._recent)
+        return items[-n:]
+
+    def close(self) -> None:
+        self._file.close()
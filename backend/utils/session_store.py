@@ -0,0 +1,75 @@
+import hashlib
+import os
+from contextlib import contextmanager
+from typing import Iterator, List
+
+from utils.lru_pool import RefCountedLRU
+from utils.message_log import MessageLog
+
+DEFAULT_SESSION = "default"
+
+
+def session_path(root: str, session_id: str) -> str:
+    """Segment file for a session: root/<2 hex>/<sha1>.jsonl.
+
+    Hashing keeps arbitrary ids filesystem-safe and spreads sessions over 256
+    shard directories so none of them grows huge.
+    """
+    digest = hashlib.sha1(session_id.encode("utf-8")).hexdigest()
+    return os.path.join(root, digest[:2], digest + ".jsonl")
+
+
+class SessionStore:
+    """Per-session message logs, one append-only segment per conversation.
+
+    Each session has its own file, lock and in-memory window, so concurrent
+    conversations never contend on a shared file. Open logs live in a
+    reference-counted LRU: every append/read holds its log for the call, and
+    only idle logs beyond `max_open` are closed, so a request never writes
+    through a closed log and a session never has two instances. An evicted
+    session is re-warmed from the tail of its segment on next use, which
+    costs O(window) reads.
+    """
+
+    def __init__(self, root: str, capacity: int = 32, max_open: int = 1024, fsync: str = "interval", fsync_interval: float = 1.0):
+        self.root = root
+        self.capacity = capacity
+        self.max_open = max(1, max_open)
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._logs: RefCountedLRU[MessageLog] = RefCountedLRU(self._open, MessageLog.close, self.max_open)
+
+    def _open(self, session_id: str) -> MessageLog:
+        # warming reads the segment tail; the pool runs this outside its lock
+        return MessageLog(
+            session_path(self.root, session_id),
+            capacity=self.capacity,
+            fsync=self.fsync,
+            fsync_interval=self.fsync_interval,
+        )
+
+    @contextmanager
+    def _log(self, session_id: str) -> Iterator[MessageLog]:
+        log = self._logs.acquire(session_id)
+        try:
+            yield log
+        finally:
+            self._logs.release(session_id)
+
+    def append(self, session_id: str, rec: dict) -> None:
+        with self._log(session_id) as log:
+            log.append(rec)
+
+    def recent(self, session_id: str, n: int) -> List[dict]:
+        if n <= 0:
+            return []
+        if session_id not in self._logs and not os.path.exists(session_path(self.root, session_id)):
+            return []
+        with self._log(session_id) as log:
+            return log.recent(n)
+
+    def open_sessions(self) -> int:
+        return len(self._logs)
+
+    def close(self) -> None:
+        self._logs.close()
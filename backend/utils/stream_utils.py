@@ -0,0 +1,220 @@
+import codecs
+import json
+import re
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+_WS = " \t\n\r"
+_JSON = json.JSONDecoder()
+# compact the text buffer once this many characters have been consumed
+_COMPACT_AT = 1 << 16
+_STRING = re.compile(r'"(?:[^"\\]++|\\.)*+"')
+_STRING_BODY = re.compile(r'(?:[^"\\]++|\\.)*+')
+_STRING_REST = re.compile(r'(?:[^"\\]++|\\.)*+"')
+# everything up to the first string that is not closed within the buffer
+_BALANCED = re.compile(r'(?:[^"]++|"(?:[^"\\]++|\\.)*+")*+')
+_BRACKET = re.compile(r"[\[\]{}]")
+_SKIP_TOKEN = re.compile(r'"(?:[^"\\]++|\\.)*+"|[\[\]{}]')
+_SCALAR_END = re.compile(r"[\s,\]}]")
+
+
+def iter_decoded(chunks: Iterable[bytes], encoding: str = "utf-8") -> Iterator[str]:
+    """Decode a byte stream incrementally; multi-byte characters may span chunks."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="ignore")
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+class _Reader:
+    """Pull-based text buffer over a chunk iterator for incremental JSON decoding."""
+
+    def __init__(self, pieces: Iterator[str]):
+        self._pieces = pieces
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        piece = next(self._pieces, None)
+        if piece is None:
+            self.eof = True
+            return False
+        if self.pos >= _COMPACT_AT:
+            self.buf, self.pos = self.buf[self.pos :], 0
+        self.buf += piece
+        return True
+
+    def peek(self) -> Optional[str]:
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WS:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return None
+
+    def take(self) -> Optional[str]:
+        ch = self.peek()
+        if ch is not None:
+            self.pos += 1
+        return ch
+
+    def value(self) -> Any:
+        """Decode one complete JSON value, reading more input until it is whole."""
+        self.peek()
+        while True:
+            try:
+                obj, end = _JSON.raw_decode(self.buf, self.pos)
+                # a number cut by the chunk boundary ("12" | "3.5") may continue in the next chunk
+                complete = end < len(self.buf) and (
+                    not isinstance(obj, (int, float)) or self.buf[end] in _WS + ",]}"
+                )
+                if complete or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            if not self._fill():
+                obj, end = _JSON.raw_decode(self.buf, self.pos)
+                self.pos = end
+                return obj
+
+
+    def skip(self) -> None:
+        """Consume one JSON value without decoding it, dropping the buffer as it goes.
+
+        Complete strings are stepped over by regex and only the brackets left
+        outside them are counted, so skipping is linear in the value's size
+        and holds about one read chunk of it.
+        """
+        ch = self.peek()
+        if ch is None:
+            return
+        if ch not in '"[{':
+            while True:
+                m = _SCALAR_END.search(self.buf, self.pos)
+                if m is not None:
+                    self.pos = m.start()
+                    return
+                self.pos = len(self.buf)
+                if not self._fill():
+                    return
+        depth = 0
+        in_string = False
+        while True:
+            if in_string:
+                m = _STRING_REST.match(self.buf, self.pos)
+                if m is None:
+                    # still inside the string: drop its body, keep a trailing backslash
+                    self.pos = _STRING_BODY.match(self.buf, self.pos).end()
+                    if not self._fill():
+                        raise ValueError("truncated JSON value")
+                    continue
+                self.pos = m.end()
+                in_string = False
+                if depth == 0:
+                    return
+            end = _BALANCED.match(self.buf, self.pos).end()
+            running = depth
+            for m in _BRACKET.finditer(_STRING.sub("", self.buf[self.pos:end])):
+                running += 1 if m.group() in "[{" else -1
+                if running == 0:
+                    break
+            if running == 0 or depth == 0:
+                # the value ends in this stretch: find exactly where
+                for m in _SKIP_TOKEN.finditer(self.buf, self.pos, end):
+                    tok = m.group()
+                    if tok[0] != '"':
+                        depth += 1 if tok in "[{" else -1
+                    if depth == 0:
+                        self.pos = m.end()
+                        return
+            else:
+                depth = running
+            self.pos = end
+            if end < len(self.buf):
+                # a string is cut by the end of the buffer
+                self.pos += 1
+                in_string = True
+                continue
+            if not self._fill():
+                raise ValueError("truncated JSON value")
+
+
+def _iter_array(reader: _Reader) -> Iterator[Any]:
+    # the opening "[" has already been consumed
+    if reader.peek() == "]":
+        reader.take()
+        return
+    while True:
+        yield reader.value()
+        sep = reader.take()
+        if sep == "]" or sep is None:
+            return
+        if sep != ",":
+            raise ValueError(f"unexpected {sep!r} in JSON array")
+
+
+def iter_json_items(chunks: Iterable[bytes], keys: Sequence[str] = ("messages", "chats")) -> Iterator[Any]:
+    """Yield array elements from a JSON document without loading it whole.
+
+    A top-level array is streamed directly. For a top-level object, the
+    earliest of `keys` holding a non-empty array wins, wherever it appears in
+    the document; other values are skipped. The preferred key's array is
+    streamed one element at a time. A lower-priority array met before it is
+    held in memory as the fallback: the chunks are read once and cannot be
+    rewound, so that (uncommon) layout costs memory proportional to the
+    array. Malformed input stops the iteration quietly.
+    """
+    reader = _Reader(iter_decoded(chunks))
+    try:
+        first = reader.take()
+        if first == "[":
+            yield from _iter_array(reader)
+            return
+        if first != "{":
+            return
+        seen = set()
+        fallback: Optional[Tuple[int, List[Any]]] = None
+        while True:
+            if reader.peek() == "}":
+                break
+            key = reader.value()
+            if reader.take() != ":":
+                return
+            rank = keys.index(key) if key in keys else -1
+            if rank >= 0 and reader.peek() == "[" and (fallback is None or rank < fallback[0]):
+                reader.take()
+                if all(k in seen for k in keys[:rank]):
+                    # no better key can follow: stream it
+                    streamed = False
+                    for item in _iter_array(reader):
+                        streamed = True
+                        yield item
+                    if streamed:
+                        return
+                else:
+                    items = list(_iter_array(reader))
+                    if items:
+                        fallback = (rank, items)
+            else:
+                reader.skip()
+            seen.add(key)
+            sep = reader.take()
+            if sep == "}":
+                break
+            if sep != ",":
+                return
+        if fallback is not None:
+            yield from fallback[1]
+    except ValueError:
+        # json.JSONDecodeError is a ValueError; keep whatever was yielded so far
+        return
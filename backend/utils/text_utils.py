@@ -1,8 +1,13 @@
-import json
 import os
-from typing import List
+import threading
+from typing import List, Optional
+
+import numpy as np
 
 from config import settings
+from utils.async_utils import run_blocking
+from utils.message_log import MessageLog
+from utils.session_store import DEFAULT_SESSION, SessionStore
 
 
 def sanitize_text(text: str) -> str:
@@ -36,29 +41,124 @@ def simple_embed(text: str) -> List[float]:
     return [float(x) for x in vec]
 
 
-def append_message(role: str, content: str) -> None:
-    os.makedirs(os.path.dirname(settings.MESSAGES_FILE), exist_ok=True)
-    rec = {"role": role, "content": content}
-    with open(settings.MESSAGES_FILE, "a", encoding="utf-8") as f:
-        f.write(json.dumps(rec) + "\n")
+_EMBED_CHUNK_BYTES = 1 << 22
+
+
+def embed_many(texts: List[str]) -> np.ndarray:
+    """Vectorized `simple_embed` for many texts: an (n, 27) float32 matrix.
+
+    Texts are lowercased with `str.lower` (so results match `simple_embed`
+    exactly) and UTF-8 encoded; every byte of a multi-byte character is >= 0x80,
+    so ASCII a-z bytes are exactly the a-z characters. Bytes are mapped to a
+    letter code (26 for anything else) and counted with one `np.bincount` over
+    (text, code) cells, a few MB of text at a time.
+    """
+    n = len(texts)
+    out = np.zeros((n, 27), dtype=np.float32)
+    if n == 0:
+        return out
+    lowered = [(t or "").lower() for t in texts]
+    out[:, 26] = np.minimum(np.fromiter((len(t) for t in lowered), dtype=np.float32, count=n) / 100.0, 1.0)
+    encoded = [t.encode("utf-8", "surrogatepass") for t in lowered]
+    start = 0
+    while start < n:
+        # group texts into slices of roughly _EMBED_CHUNK_BYTES to bound the temporaries
+        end, size = start, 0
+        while end < n and (end == start or size + len(encoded[end]) <= _EMBED_CHUNK_BYTES):
+            size += len(encoded[end])
+            end += 1
+        count = end - start
+        lengths = np.fromiter((len(b) for b in encoded[start:end]), dtype=np.int64, count=count)
+        data = np.frombuffer(b"".join(encoded[start:end]), dtype=np.uint8)
+        # a-z -> 0..25, every other byte -> 26 (uint8 wrap-around does the range check)
+        codes = np.minimum(data - np.uint8(97), np.uint8(26))
+        cells = np.repeat(np.arange(0, count * 27, 27, dtype=np.int64), lengths)
+        cells += codes
+        out[start:end, :26] = np.bincount(cells, minlength=count * 27).reshape(count, 27)[:, :26]
+        start = end
+    return out
+
 
+_log_lock = threading.Lock()
+_log: Optional[MessageLog] = None
+_sessions: Optional[SessionStore] = None
 
-def get_recent_messages(n: int) -> List[dict]:
-    """Read the last n JSONL messages from the messages file."""
+
+def get_message_log() -> MessageLog:
+    """Return the open log for settings.MESSAGES_FILE, reopening if the path changed."""
+    global _log
     path = settings.MESSAGES_FILE
-    if not os.path.exists(path) or n <= 0:
+    with _log_lock:
+        if _log is None or _log.path != path:
+            if _log is not None:
+                _log.close()
+            _log = MessageLog(
+                path,
+                capacity=max(settings.HISTORY_CACHE_SIZE, settings.HISTORY_MESSAGES),
+                fsync=settings.MESSAGES_FSYNC,
+                fsync_interval=settings.MESSAGES_FSYNC_INTERVAL,
+            )
+        return _log
+
+
+def get_session_store() -> SessionStore:
+    """Return the per-session store under <dir of MESSAGES_FILE>/sessions."""
+    global _sessions
+    root = os.path.join(os.path.dirname(settings.MESSAGES_FILE), "sessions")
+    with _log_lock:
+        if _sessions is None or _sessions.root != root:
+            if _sessions is not None:
+                _sessions.close()
+            _sessions = SessionStore(
+                root,
+                capacity=max(settings.SESSION_CACHE_SIZE, settings.HISTORY_MESSAGES),
+                max_open=settings.SESSION_MAX_OPEN,
+                fsync=settings.MESSAGES_FSYNC,
+                fsync_interval=settings.MESSAGES_FSYNC_INTERVAL,
+            )
+        return _sessions
+
+
+def close_message_log() -> None:
+    global _log, _sessions
+    with _log_lock:
+        if _log is not None:
+            _log.close()
+            _log = None
+        if _sessions is not None:
+            _sessions.close()
+            _sessions = None
+
+
+def _uses_messages_file(session_id: Optional[str]) -> bool:
+    # the default session is the pre-sessions MESSAGES_FILE, so existing history carries over
+    return session_id is None or session_id == DEFAULT_SESSION
+
+
+def append_message(role: str, content: str, session_id: Optional[str] = None) -> None:
+    """Append to the session's log, or to the global messages file for the default session."""
+    rec = {"role": role, "content": content}
+    if _uses_messages_file(session_id):
+        get_message_log().append(rec)
+    else:
+        get_session_store().append(session_id, rec)
+
+
+def get_recent_messages(n: int, session_id: Optional[str] = None) -> List[dict]:
+    """Return the last n messages, served from the in-memory window."""
+    if n <= 0:
         return []
-    msgs: List[dict] = []
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            lines = f.readlines()[-n:]
-        for ln in lines:
-            try:
-                obj = json.loads(ln)
-                if isinstance(obj, dict) and "role" in obj and "content" in obj:
-                    msgs.append(obj)
-            except Exception:
-                continue
+        if _uses_messages_file(session_id):
+            return get_message_log().recent(n)
+        return get_session_store().recent(session_id, n)
     except Exception:
         return []
-    return msgs
+
+
+async def append_message_async(role: str, content: str, session_id: Optional[str] = None) -> None:
+    await run_blocking(append_message, role, content, session_id)
+
+
+async def get_recent_messages_async(n: int, session_id: Optional[str] = None) -> List[dict]:
+    return await run_blocking(get_recent_messages, n, session_id)